@@ -48,7 +48,10 @@ class UnityEnv(gym.Env):
         :param allow_multiple_visual_obs: If True, return a list of visual observations instead of only one.
         """
         self._env = UnityEnvironment(
-            environment_filename, worker_id, no_graphics=no_graphics
+            environment_filename,
+            worker_id,
+            no_graphics=no_graphics,
+            uint8_visual=use_visual and uint8_visual,
         )
         self.name = self._env.academy_name
         self.visual_obs = None
@@ -218,8 +221,6 @@ class UnityEnv(gym.Env):
     def _single_step(self, info):
         if self.use_visual:
             visual_obs = info.visual_observations
-            if isinstance(visual_obs, list):
-                visual_obs = np.array(visual_obs)
 
             if self._allow_multiple_visual_obs:
                 visual_obs_list = []
@@ -241,14 +242,16 @@ class UnityEnv(gym.Env):
         )
 
     def _preprocess_single(self, single_visual_obs):
-        if self.uint8_visual:
+        if self.uint8_visual and single_visual_obs.dtype != np.uint8:
             return (255.0 * single_visual_obs).astype(np.uint8)
         else:
             return single_visual_obs
 
     def _multi_step(self, info):
         if self.use_visual:
-            self.visual_obs = self._preprocess_multi(info.visual_observations)
+            self.visual_obs = self._preprocess_multi(
+                [np.asarray(obs) for obs in info.visual_observations]
+            )
             default_observation = self.visual_obs
         else:
             default_observation = info.vector_observations
@@ -262,7 +265,7 @@ class UnityEnv(gym.Env):
     def _preprocess_multi(self, multiple_visual_obs):
         if self.uint8_visual:
             return [
-                (255.0 * _visual_obs).astype(np.uint8)
+                self._preprocess_single(_visual_obs)
                 for _visual_obs in multiple_visual_obs
             ]
         else:
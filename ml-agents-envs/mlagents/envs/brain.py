@@ -2,6 +2,8 @@ import logging
 import numpy as np
 import io
 
+from concurrent.futures import Executor
+from itertools import chain, repeat
 from typing import Dict, List, Optional
 from PIL import Image
 
@@ -39,113 +41,214 @@ class BrainInfo:
         self.previous_text_actions = text_action
         self.action_masks = action_mask
         self.custom_observations = custom_observations
+        self._agent_index = None
+        self._indexed_agents = None
+
+    @property
+    def agent_index(self) -> Dict[int, int]:
+        """
+        Maps the id of each agent to its row in the fields of the BrainInfo. It is
+        built on first use, and again if agents is replaced.
+        """
+        if self._agent_index is None or self._indexed_agents is not self.agents:
+            self._agent_index = {
+                agent_id: i for i, agent_id in enumerate(self.agents or [])
+            }
+            self._indexed_agents = self.agents
+        return self._agent_index
 
     def merge(self, other):
-        for i in range(len(self.visual_observations)):
-            self.visual_observations[i].extend(other.visual_observations[i])
-        self.vector_observations = np.append(
-            self.vector_observations, other.vector_observations, axis=0
-        )
-        self.text_observations.extend(other.text_observations)
-        self.memories = self.merge_memories(
-            self.memories, other.memories, self.agents, other.agents
-        )
-        self.rewards = safe_concat_lists(self.rewards, other.rewards)
-        self.local_done = safe_concat_lists(self.local_done, other.local_done)
-        self.max_reached = safe_concat_lists(self.max_reached, other.max_reached)
-        self.agents = safe_concat_lists(self.agents, other.agents)
-        self.previous_vector_actions = safe_concat_np_ndarray(
-            self.previous_vector_actions, other.previous_vector_actions
-        )
-        self.previous_text_actions = safe_concat_lists(
-            self.previous_text_actions, other.previous_text_actions
-        )
-        self.action_masks = safe_concat_np_ndarray(
-            self.action_masks, other.action_masks
-        )
-        self.custom_observations = safe_concat_lists(
-            self.custom_observations, other.custom_observations
+        merged = BrainInfo.merge_all([self, other])
+        self.__dict__.update(merged.__dict__)
+
+    @staticmethod
+    def merge_all(brain_infos: List["BrainInfo"]) -> "BrainInfo":
+        """
+        Concatenates the experiences of several BrainInfos of the same brain,
+        e.g. one per environment, into a new BrainInfo. Each field is
+        allocated once and filled from all BrainInfos in a single pass. The
+        BrainInfos passed are left unchanged.
+        :param brain_infos: The BrainInfos to concatenate, in order.
+        :return: A BrainInfo with the agents of all brain_infos.
+        """
+        visual_observations = []
+        for i in range(len(brain_infos[0].visual_observations)):
+            camera_obs = [x.visual_observations[i] for x in brain_infos]
+            if all(isinstance(x, LazyVisualObservations) for x in camera_obs):
+                visual_observations.append(
+                    LazyVisualObservations.concatenate_all(camera_obs)
+                )
+            else:
+                visual_observations.append(
+                    np.concatenate([np.asarray(x) for x in camera_obs], axis=0)
+                )
+        return BrainInfo(
+            visual_observation=visual_observations,
+            vector_observation=np.concatenate(
+                [x.vector_observations for x in brain_infos], axis=0
+            ),
+            text_observations=concat_lists([x.text_observations for x in brain_infos]),
+            memory=BrainInfo.merge_memories(brain_infos),
+            reward=concat_lists([x.rewards for x in brain_infos]),
+            agents=concat_lists([x.agents for x in brain_infos]),
+            local_done=concat_lists([x.local_done for x in brain_infos]),
+            vector_action=concat_np_ndarrays(
+                [x.previous_vector_actions for x in brain_infos]
+            ),
+            text_action=concat_lists([x.previous_text_actions for x in brain_infos]),
+            max_reached=concat_lists([x.max_reached for x in brain_infos]),
+            action_mask=concat_np_ndarrays([x.action_masks for x in brain_infos]),
+            custom_observations=concat_lists(
+                [x.custom_observations for x in brain_infos]
+            ),
         )
 
     @staticmethod
-    def merge_memories(m1, m2, agents1, agents2):
-        if len(m1) == 0 and len(m2) != 0:
-            m1 = np.zeros((len(agents1), m2.shape[1]))
-        elif len(m2) == 0 and len(m1) != 0:
-            m2 = np.zeros((len(agents2), m1.shape[1]))
-        elif m2.shape[1] > m1.shape[1]:
-            new_m1 = np.zeros((m1.shape[0], m2.shape[1]))
-            new_m1[0 : m1.shape[0], 0 : m1.shape[1]] = m1
-            return np.append(new_m1, m2, axis=0)
-        elif m1.shape[1] > m2.shape[1]:
-            new_m2 = np.zeros((m2.shape[0], m1.shape[1]))
-            new_m2[0 : m2.shape[0], 0 : m2.shape[1]] = m2
-            return np.append(m1, new_m2, axis=0)
-        return np.append(m1, m2, axis=0)
+    def merge_memories(brain_infos: List["BrainInfo"]) -> np.ndarray:
+        """
+        Concatenates the memories of brain_infos, padding them with zeros to
+        the largest memory size. Agents without memories get zeros.
+        """
+        memories = [x.memories for x in brain_infos]
+        memory_size = max(
+            [m.shape[1] for m in memories if m is not None and len(m) > 0] or [0]
+        )
+        if memory_size == 0:
+            return np.zeros((0, 0))
+        merged = np.zeros((sum(len(x.agents) for x in brain_infos), memory_size))
+        start = 0
+        for brain_info, m in zip(brain_infos, memories):
+            if m is not None and len(m) > 0:
+                merged[start : start + m.shape[0], : m.shape[1]] = m
+            start += len(brain_info.agents)
+        return merged
 
     @staticmethod
-    def process_pixels(image_bytes, gray_scale):
+    def process_pixels(image_bytes, gray_scale, uint8_visual=False):
         """
         Converts byte array observation image into numpy array, re-sizes it,
         and optionally converts it to grey scale
         :param gray_scale: Whether to convert the image to grayscale.
         :param image_bytes: input byte array corresponding to image
+        :param uint8_visual: Whether to keep the pixels as uint8 in [0, 255]
+        instead of converting them to floats in [0, 1].
         :return: processed numpy array of observation from environment
         """
         s = bytearray(image_bytes)
         image = Image.open(io.BytesIO(s))
-        s = np.array(image) / 255.0
+        s = np.array(image)
+        if not uint8_visual:
+            s = s / 255.0
         if gray_scale:
             s = np.mean(s, axis=2)
+            if uint8_visual:
+                s = np.around(s).astype(np.uint8)
             s = np.reshape(s, [s.shape[0], s.shape[1], 1])
         return s
 
     @staticmethod
-    def from_agent_proto(agent_info_list, brain_params):
+    def process_visual_observations(
+        images: List[bytes],
+        camera_resolution: Dict,
+        executor: Executor = None,
+        uint8_visual: bool = False,
+    ) -> np.ndarray:
+        """
+        Decodes the images of all agents for one camera into a single array.
+        :param images: Byte arrays of the images, one per agent.
+        :param camera_resolution: Resolution of the camera, from BrainParameters.
+        :param executor: Optional executor used to decode the images in parallel.
+        :param uint8_visual: Whether to keep the pixels as uint8 in [0, 255].
+        :return: Array of shape (number of agents, height, width, channels).
+        """
+        gray_scale = camera_resolution["blackAndWhite"]
+        if len(images) == 0:
+            return np.zeros(
+                (
+                    0,
+                    camera_resolution["height"],
+                    camera_resolution["width"],
+                    1 if gray_scale else 3,
+                ),
+                dtype=np.uint8 if uint8_visual else np.float64,
+            )
+        if executor is None:
+            decoded = (
+                BrainInfo.process_pixels(x, gray_scale, uint8_visual) for x in images
+            )
+        else:
+            decoded = executor.map(
+                BrainInfo.process_pixels,
+                images,
+                repeat(gray_scale),
+                repeat(uint8_visual),
+            )
+        batch = None
+        for i, image in enumerate(decoded):
+            if batch is None:
+                batch = np.empty((len(images),) + image.shape, dtype=image.dtype)
+            batch[i] = image
+        return batch
+
+    @staticmethod
+    def from_agent_proto(
+        agent_info_list,
+        brain_params,
+        executor: Executor = None,
+        uint8_visual: bool = False,
+    ):
         """
         Converts list of agent infos to BrainInfo.
+        Numeric fields are gathered in a single pass over agent_info_list and
+        converted to NumPy arrays in bulk, rather than building one array per
+        agent and field.
+        :param executor: Optional executor used to decode visual observations.
+        :param uint8_visual: Whether to keep visual observations as uint8 in
+        [0, 255] rather than floats in [0, 1].
+        Visual observations are kept compressed and only decoded when read,
+        see LazyVisualObservations.
         """
         vis_obs = []
         for i in range(brain_params.number_visual_observations):
-            obs = [
-                BrainInfo.process_pixels(
-                    x.visual_observations[i],
-                    brain_params.camera_resolutions[i]["blackAndWhite"],
-                )
-                for x in agent_info_list
-            ]
+            obs = LazyVisualObservations(
+                [x.visual_observations[i] for x in agent_info_list],
+                brain_params.camera_resolutions[i],
+                executor,
+                uint8_visual,
+            )
             vis_obs += [obs]
-        if len(agent_info_list) == 0:
-            memory_size = 0
-        else:
-            memory_size = max([len(x.memories) for x in agent_info_list])
-        if memory_size == 0:
-            memory = np.zeros((0, 0))
-        else:
-            [
-                x.memories.extend([0] * (memory_size - len(x.memories)))
-                for x in agent_info_list
-            ]
-            memory = np.array([list(x.memories) for x in agent_info_list])
+        n_agents = len(agent_info_list)
         total_num_actions = sum(brain_params.vector_action_space_size)
-        mask_actions = np.ones((len(agent_info_list), total_num_actions))
+        vector_obs = []
+        vector_actions = []
+        memories = []
+        memory_sizes = []
+        action_masks = []
+        masked_agents = []
+        rewards = []
+        agents = []
+        local_done = []
+        max_reached = []
+        text_observations = []
+        text_actions = []
+        custom_observations = []
         for agent_index, agent_info in enumerate(agent_info_list):
-            if agent_info.action_mask is not None:
-                if len(agent_info.action_mask) == total_num_actions:
-                    mask_actions[agent_index, :] = [
-                        0 if agent_info.action_mask[k] else 1
-                        for k in range(total_num_actions)
-                    ]
-        if any([np.isnan(x.reward) for x in agent_info_list]):
-            logger.warning(
-                "An agent had a NaN reward for brain " + brain_params.brain_name
-            )
-        if any([np.isnan(x.stacked_vector_observation).any() for x in agent_info_list]):
-            logger.warning(
-                "An agent had a NaN observation for brain " + brain_params.brain_name
-            )
+            vector_obs.extend(agent_info.stacked_vector_observation)
+            vector_actions.extend(agent_info.stored_vector_actions)
+            memories.extend(agent_info.memories)
+            memory_sizes.append(len(agent_info.memories))
+            if len(agent_info.action_mask) == total_num_actions:
+                action_masks.extend(agent_info.action_mask)
+                masked_agents.append(agent_index)
+            rewards.append(agent_info.reward)
+            agents.append(agent_info.id)
+            local_done.append(agent_info.done)
+            max_reached.append(agent_info.max_step_reached)
+            text_observations.append(agent_info.text_observation)
+            text_actions.append(list(agent_info.stored_text_actions))
+            custom_observations.append(agent_info.custom_observation)
 
-        if len(agent_info_list) == 0:
+        if n_agents == 0:
             vector_obs = np.zeros(
                 (
                     0,
@@ -153,51 +256,225 @@ class BrainInfo:
                     * brain_params.num_stacked_vector_observations,
                 )
             )
+            vector_actions = np.array(vector_actions)
         else:
-            vector_obs = np.nan_to_num(
-                np.array([x.stacked_vector_observation for x in agent_info_list])
+            vector_obs = np.array(vector_obs, dtype=np.float64).reshape(n_agents, -1)
+            vector_actions = np.array(vector_actions, dtype=np.float64).reshape(
+                n_agents, -1
+            )
+        if not np.isfinite(vector_obs).all():
+            if np.isnan(vector_obs).any():
+                logger.warning(
+                    "An agent had a NaN observation for brain "
+                    + brain_params.brain_name
+                )
+            np.nan_to_num(vector_obs, copy=False)
+
+        reward_array = np.array(rewards, dtype=np.float64)
+        nan_rewards = np.isnan(reward_array)
+        if nan_rewards.any():
+            logger.warning(
+                "An agent had a NaN reward for brain " + brain_params.brain_name
+            )
+            reward_array[nan_rewards] = 0
+            rewards = reward_array.tolist()
+
+        memory_size = max(memory_sizes, default=0)
+        memory = np.zeros((n_agents, memory_size) if memory_size > 0 else (0, 0))
+        if memory_size > 0:
+            # Agents with shorter memories are padded with zeros at the end.
+            filled = np.arange(memory_size) < np.array(memory_sizes)[:, None]
+            memory[filled] = memories
+
+        mask_actions = np.ones((n_agents, total_num_actions))
+        if masked_agents:
+            mask_actions[masked_agents] = np.logical_not(
+                np.array(action_masks, dtype=bool).reshape(-1, total_num_actions)
             )
+
         brain_info = BrainInfo(
             visual_observation=vis_obs,
             vector_observation=vector_obs,
-            text_observations=[x.text_observation for x in agent_info_list],
+            text_observations=text_observations,
             memory=memory,
-            reward=[x.reward if not np.isnan(x.reward) else 0 for x in agent_info_list],
-            agents=[x.id for x in agent_info_list],
-            local_done=[x.done for x in agent_info_list],
-            vector_action=np.array([x.stored_vector_actions for x in agent_info_list]),
-            text_action=[list(x.stored_text_actions) for x in agent_info_list],
-            max_reached=[x.max_step_reached for x in agent_info_list],
-            custom_observations=[x.custom_observation for x in agent_info_list],
+            reward=rewards,
+            agents=agents,
+            local_done=local_done,
+            vector_action=vector_actions,
+            text_action=text_actions,
+            max_reached=max_reached,
+            custom_observations=custom_observations,
             action_mask=mask_actions,
         )
         return brain_info
 
 
-def safe_concat_lists(l1: Optional[List], l2: Optional[List]):
-    if l1 is None and l2 is None:
+def concat_lists(lists: List[Optional[List]]) -> Optional[List]:
+    """
+    Concatenates lists, treating None as an empty list. Returns None if all
+    the lists are None.
+    """
+    if all(x is None for x in lists):
         return None
-    if l1 is None and l2 is not None:
-        return l2.copy()
-    if l1 is not None and l2 is None:
-        return l1.copy()
-    else:
-        copy = l1.copy()
-        copy.extend(l2)
-        return copy
-
-
-def safe_concat_np_ndarray(a1: Optional[np.ndarray], a2: Optional[np.ndarray]):
-    if a1 is not None and a1.size != 0:
-        if a2 is not None and a2.size != 0:
-            return np.append(a1, a2, axis=0)
-        else:
-            return a1.copy()
-    elif a2 is not None and a2.size != 0:
-        return a2.copy()
+    return list(chain.from_iterable(x for x in lists if x is not None))
+
+
+def concat_np_ndarrays(arrays: List[Optional[np.ndarray]]) -> Optional[np.ndarray]:
+    """
+    Concatenates arrays along their first axis, skipping None and empty
+    arrays. Returns None if all the arrays are None.
+    """
+    non_empty = [x for x in arrays if x is not None and x.size != 0]
+    if len(non_empty) > 0:
+        return np.concatenate(non_empty, axis=0)
+    for x in arrays:
+        if x is not None:
+            return x.copy()
     return None
 
 
+class LazyVisualObservations:
+    """
+    The visual observations of all agents for one camera, kept as the
+    compressed images sent by the environment. Images are decoded the first
+    time they are read, either one agent at a time through indexing, or all
+    at once when converted to a NumPy array (e.g. when fed to a model).
+    Frames that are never read are never decoded.
+    """
+
+    def __init__(
+        self,
+        images: List[bytes],
+        camera_resolution: Dict,
+        executor: Executor = None,
+        uint8_visual: bool = False,
+    ):
+        """
+        :param images: Byte arrays of the images, one per agent.
+        :param camera_resolution: Resolution of the camera, from BrainParameters.
+        :param executor: Optional executor used to decode batches in parallel.
+        :param uint8_visual: Whether to decode the pixels as uint8 in [0, 255].
+        """
+        self.images = images
+        self.camera_resolution = camera_resolution
+        self.executor = executor
+        self.uint8_visual = uint8_visual
+        self._frames = [None] * len(images)
+        self._decoded = None
+
+    @property
+    def shape(self):
+        return (
+            len(self.images),
+            self.camera_resolution["height"],
+            self.camera_resolution["width"],
+            1 if self.camera_resolution["blackAndWhite"] else 3,
+        )
+
+    @property
+    def ndim(self):
+        return 4
+
+    @property
+    def dtype(self):
+        return np.dtype(np.uint8 if self.uint8_visual else np.float64)
+
+    def __len__(self):
+        return len(self.images)
+
+    def __iter__(self):
+        for i in range(len(self.images)):
+            yield self[i]
+
+    def __getitem__(self, key):
+        if self._decoded is not None:
+            return self._decoded[key]
+        if (
+            isinstance(key, tuple)
+            and len(key) > 0
+            and isinstance(key[0], (int, np.integer))
+        ):
+            return self[key[0]][key[1:]]
+        if not isinstance(key, (int, np.integer)):
+            return self.__array__()[key]
+        if self._frames[key] is None:
+            self._frames[key] = BrainInfo.process_pixels(
+                self.images[key],
+                self.camera_resolution["blackAndWhite"],
+                self.uint8_visual,
+            )
+        return self._frames[key]
+
+    def __array__(self, dtype=None):
+        if self._decoded is None:
+            missing = [i for i, frame in enumerate(self._frames) if frame is None]
+            if len(missing) == len(self._frames):
+                self._decoded = BrainInfo.process_visual_observations(
+                    self.images,
+                    self.camera_resolution,
+                    self.executor,
+                    self.uint8_visual,
+                )
+            else:
+                # Only decode the frames that have not been read yet.
+                batch = np.empty(self.shape, dtype=self.dtype)
+                for i, frame in enumerate(self._frames):
+                    if frame is not None:
+                        batch[i] = frame
+                if len(missing) > 0:
+                    batch[missing] = BrainInfo.process_visual_observations(
+                        [self.images[i] for i in missing],
+                        self.camera_resolution,
+                        self.executor,
+                        self.uint8_visual,
+                    )
+                self._decoded = batch
+            self._frames = [None] * len(self.images)
+        if dtype is not None:
+            return self._decoded.astype(dtype, copy=False)
+        return self._decoded
+
+    def concatenate(self, other: "LazyVisualObservations"):
+        """
+        Returns the observations of both self and other, without decoding them.
+        """
+        return LazyVisualObservations.concatenate_all([self, other])
+
+    @staticmethod
+    def concatenate_all(
+        visual_observations: List["LazyVisualObservations"]
+    ) -> "LazyVisualObservations":
+        """
+        Returns the observations of all visual_observations, without decoding
+        them. Frames which were already decoded are kept.
+        """
+        first = visual_observations[0]
+        result = LazyVisualObservations(
+            list(chain.from_iterable(x.images for x in visual_observations)),
+            first.camera_resolution,
+            first.executor,
+            first.uint8_visual,
+        )
+        result._frames = list(
+            chain.from_iterable(x._frames_or_decoded() for x in visual_observations)
+        )
+        return result
+
+    def _frames_or_decoded(self):
+        if self._decoded is not None:
+            return list(self._decoded)
+        return list(self._frames)
+
+    def __getstate__(self):
+        # Executors can not be pickled, and decoded frames are cheaper to
+        # send compressed.
+        state = self.__dict__.copy()
+        state["executor"] = None
+        state["_frames"] = [None] * len(self.images)
+        state["_decoded"] = None
+        return state
+
+
 # Renaming of dictionary of brain name to BrainInfo for clarity
 AllBrainInfo = Dict[str, BrainInfo]
 
@@ -4,6 +4,7 @@ import logging
 import numpy as np
 import os
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from typing import *
 
 from mlagents.envs.base_unity_environment import BaseUnityEnvironment
@@ -17,7 +18,6 @@ from .exception import (
 from .communicator_objects import (
     UnityRLInput,
     UnityRLOutput,
-    AgentActionProto,
     EnvironmentParametersProto,
     UnityRLInitializationInput,
     UnityRLInitializationOutput,
@@ -48,6 +48,8 @@ class UnityEnvironment(BaseUnityEnvironment):
         docker_training: bool = False,
         no_graphics: bool = False,
         timeout_wait: int = 30,
+        num_decode_workers: int = 0,
+        uint8_visual: bool = False,
     ):
         """
         Starts a new unity environment and establishes a connection with the environment.
@@ -61,6 +63,10 @@ class UnityEnvironment(BaseUnityEnvironment):
         :bool no_graphics: Whether to run the Unity simulator in no-graphics mode
         :int timeout_wait: Time (in seconds) to wait for connection from environment.
         :bool train_mode: Whether to run in training mode, speeding up the simulation, by default.
+        :int num_decode_workers: Number of threads used to decode visual observations. If 0, they are
+        decoded on the calling thread.
+        :bool uint8_visual: Whether to return visual observations as uint8 arrays in [0, 255] instead of
+        float arrays in [0, 1].
         """
 
         atexit.register(self._close)
@@ -73,6 +79,8 @@ class UnityEnvironment(BaseUnityEnvironment):
         self.proc1 = (
             None
         )  # The process that is started. If None, no process was started
+        self._decode_executor = None
+        self._uint8_visual = uint8_visual
         self.communicator = self.get_communicator(worker_id, base_port, timeout_wait)
 
         # If the environment name is None, a new environment will not be launched
@@ -90,6 +98,8 @@ class UnityEnvironment(BaseUnityEnvironment):
                 "Start training by pressing the Play button in the Unity Editor."
             )
         self._loaded = True
+        if num_decode_workers > 0:
+            self._decode_executor = ThreadPoolExecutor(max_workers=num_decode_workers)
 
         rl_init_parameters_in = UnityRLInitializationInput(seed=seed)
         try:
@@ -122,6 +132,14 @@ class UnityEnvironment(BaseUnityEnvironment):
                 self._external_brain_names += [brain_param.brain_name]
         self._num_brains = len(self._brain_names)
         self._num_external_brains = len(self._external_brain_names)
+        # Number of vector actions each Agent of an external brain takes.
+        self._action_sizes = {}
+        for brain_name in self._external_brain_names:
+            brain = self._brains[brain_name]
+            if brain.vector_action_space_type == "discrete":
+                self._action_sizes[brain_name] = len(brain.vector_action_space_size)
+            else:
+                self._action_sizes[brain_name] = brain.vector_action_space_size[0]
         self._resetParameters = dict(aca_params.environment_parameters.float_parameters)
         logger.info(
             "\n'{0}' started successfully!\n{1}".format(self._academy_name, str(self))
@@ -459,28 +477,15 @@ class UnityEnvironment(BaseUnityEnvironment):
 
             for brain_name in self._external_brain_names:
                 n_agent = self._n_agents[brain_name]
+                expected_size = n_agent * self._action_sizes[brain_name]
                 if brain_name not in vector_action:
-                    if self._brains[brain_name].vector_action_space_type == "discrete":
-                        vector_action[brain_name] = (
-                            [0.0]
-                            * n_agent
-                            * len(self._brains[brain_name].vector_action_space_size)
-                        )
-                    else:
-                        vector_action[brain_name] = (
-                            [0.0]
-                            * n_agent
-                            * self._brains[brain_name].vector_action_space_size[0]
-                        )
+                    vector_action[brain_name] = np.zeros(expected_size, np.float32)
                 else:
                     vector_action[brain_name] = self._flatten(vector_action[brain_name])
-                if brain_name not in memory:
-                    memory[brain_name] = []
+                if brain_name not in memory or memory[brain_name] is None:
+                    memory[brain_name] = np.zeros(0, np.float32)
                 else:
-                    if memory[brain_name] is None:
-                        memory[brain_name] = []
-                    else:
-                        memory[brain_name] = self._flatten(memory[brain_name])
+                    memory[brain_name] = self._flatten(memory[brain_name])
                 if brain_name not in text_action:
                     text_action[brain_name] = [""] * n_agent
                 else:
@@ -508,42 +513,15 @@ class UnityEnvironment(BaseUnityEnvironment):
                         )
                     )
 
-                discrete_check = (
-                    self._brains[brain_name].vector_action_space_type == "discrete"
-                )
-
-                expected_discrete_size = n_agent * len(
-                    self._brains[brain_name].vector_action_space_size
-                )
-
-                continuous_check = (
-                    self._brains[brain_name].vector_action_space_type == "continuous"
-                )
-
-                expected_continuous_size = (
-                    self._brains[brain_name].vector_action_space_size[0] * n_agent
-                )
-
-                if not (
-                    (
-                        discrete_check
-                        and len(vector_action[brain_name]) == expected_discrete_size
-                    )
-                    or (
-                        continuous_check
-                        and len(vector_action[brain_name]) == expected_continuous_size
-                    )
-                ):
+                if len(vector_action[brain_name]) != expected_size:
                     raise UnityActionException(
                         "There was a mismatch between the provided action and "
                         "the environment's expectation: "
                         "The brain {0} expected {1} {2} action(s), but was provided: {3}".format(
                             brain_name,
-                            str(expected_discrete_size)
-                            if discrete_check
-                            else str(expected_continuous_size),
+                            str(expected_size),
                             self._brains[brain_name].vector_action_space_type,
-                            str(vector_action[brain_name]),
+                            str(vector_action[brain_name].tolist()),
                         )
                     )
 
@@ -584,28 +562,29 @@ class UnityEnvironment(BaseUnityEnvironment):
     def _close(self):
         self._loaded = False
         self.communicator.close()
+        if self._decode_executor is not None:
+            self._decode_executor.shutdown(wait=False)
+            self._decode_executor = None
         if self.proc1 is not None:
             self.proc1.kill()
 
     @classmethod
-    def _flatten(cls, arr) -> List[float]:
+    def _flatten(cls, arr) -> np.ndarray:
         """
-        Converts arrays to list.
-        :param arr: numpy vector.
-        :return: flattened list.
+        Converts actions or memories to a flat array.
+        :param arr: A scalar, a numpy array, or a list of scalars, lists or arrays.
+        :return: flattened float32 array, the precision of the protobuf fields.
         """
         if isinstance(arr, cls.SCALAR_ACTION_TYPES):
-            arr = [float(arr)]
+            return np.array([arr], np.float32)
         if isinstance(arr, np.ndarray):
-            arr = arr.tolist()
+            return arr.astype(np.float32, copy=False).ravel()
         if len(arr) == 0:
-            return arr
-        if isinstance(arr[0], np.ndarray):
-            arr = [item for sublist in arr for item in sublist.tolist()]
-        if isinstance(arr[0], list):
-            arr = [item for sublist in arr for item in sublist]
-        arr = [float(x) for x in arr]
-        return arr
+            return np.zeros(0, np.float32)
+        if isinstance(arr[0], (list, np.ndarray)):
+            # The rows of the list may not have the same length.
+            return np.concatenate([np.ravel(x) for x in arr]).astype(np.float32)
+        return np.array(arr, np.float32)
 
     def _get_state(self, output: UnityRLOutput) -> (AllBrainInfo, bool):
         """
@@ -617,33 +596,49 @@ class UnityEnvironment(BaseUnityEnvironment):
         for brain_name in output.agentInfos:
             agent_info_list = output.agentInfos[brain_name].value
             _data[brain_name] = BrainInfo.from_agent_proto(
-                agent_info_list, self.brains[brain_name]
+                agent_info_list,
+                self.brains[brain_name],
+                self._decode_executor,
+                self._uint8_visual,
             )
         return _data, global_done
 
     def _generate_step_input(
         self, vector_action, memory, text_action, value, custom_action
-    ) -> UnityRLInput:
-        rl_in = UnityRLInput()
+    ) -> UnityInput:
+        # Filled in place rather than through wrap_unity_input, since copying
+        # the actions of every agent is as slow as building them.
+        inputs = UnityInput()
+        rl_in = inputs.rl_input
+        rl_in.SetInParent()
         for b in vector_action:
             n_agents = self._n_agents[b]
             if n_agents == 0:
                 continue
             _a_s = len(vector_action[b]) // n_agents
             _m_s = len(memory[b]) // n_agents
+            # Convert the rows to lists once, rather than one slice per agent.
+            agent_vector_actions = (
+                vector_action[b][: n_agents * _a_s].reshape(n_agents, _a_s).tolist()
+            )
+            agent_memories = memory[b][: n_agents * _m_s].reshape(n_agents, _m_s)
+            agent_memories = agent_memories.tolist()
+            agent_values = None
+            if value.get(b) is not None:
+                agent_values = np.ravel(value[b]).astype(np.float64).tolist()
+            agent_actions = rl_in.agent_actions[b].value
             for i in range(n_agents):
-                action = AgentActionProto(
-                    vector_actions=vector_action[b][i * _a_s : (i + 1) * _a_s],
-                    memories=memory[b][i * _m_s : (i + 1) * _m_s],
-                    text_actions=text_action[b][i],
-                    custom_action=custom_action[b][i],
-                )
-                if b in value:
-                    if value[b] is not None:
-                        action.value = float(value[b][i])
-                rl_in.agent_actions[b].value.extend([action])
-                rl_in.command = 0
-        return self.wrap_unity_input(rl_in)
+                # Filling the messages in place avoids copying each of them.
+                action = agent_actions.add()
+                action.vector_actions.extend(agent_vector_actions[i])
+                action.memories.extend(agent_memories[i])
+                action.text_actions = text_action[b][i]
+                if custom_action[b][i] is not None:
+                    action.custom_action.CopyFrom(custom_action[b][i])
+                if agent_values is not None:
+                    action.value = agent_values[i]
+            rl_in.command = 0
+        return inputs
 
     def _generate_reset_input(
         self, training, config, custom_reset_parameters
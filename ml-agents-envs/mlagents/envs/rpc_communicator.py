@@ -1,8 +1,8 @@
 import logging
 import grpc
 
+import queue
 import socket
-from multiprocessing import Pipe
 from concurrent.futures import ThreadPoolExecutor
 
 from .communicator import Communicator
@@ -17,16 +17,23 @@ logger = logging.getLogger("mlagents.envs")
 
 
 class UnityToExternalServicerImplementation(UnityToExternalServicer):
+    """
+    Hands the messages received by the grpc handler threads over to the
+    RpcCommunicator, and returns its replies. Both live in the same process,
+    so the messages are passed through queues without being serialized.
+    """
+
     def __init__(self):
-        self.parent_conn, self.child_conn = Pipe()
+        self.requests = queue.Queue()
+        self.replies = queue.Queue()
 
     def Initialize(self, request, context):
-        self.child_conn.send(request)
-        return self.child_conn.recv()
+        self.requests.put(request)
+        return self.replies.get()
 
     def Exchange(self, request, context):
-        self.child_conn.send(request)
-        return self.child_conn.recv()
+        self.requests.put(request)
+        return self.replies.get()
 
 
 class RpcCommunicator(Communicator):
@@ -78,7 +85,11 @@ class RpcCommunicator(Communicator):
             s.close()
 
     def initialize(self, inputs: UnityInput) -> UnityOutput:
-        if not self.unity_to_external.parent_conn.poll(self.timeout_wait):
+        try:
+            aca_param = self.unity_to_external.requests.get(
+                timeout=self.timeout_wait
+            ).unity_output
+        except queue.Empty:
             raise UnityTimeOutException(
                 "The Unity environment took too long to respond. Make sure that :\n"
                 "\t The environment does not need user interaction to launch\n"
@@ -86,20 +97,19 @@ class RpcCommunicator(Communicator):
                 "\t The Agents are linked to the appropriate Brains\n"
                 "\t The environment and the Python interface have compatible versions."
             )
-        aca_param = self.unity_to_external.parent_conn.recv().unity_output
         message = UnityMessage()
         message.header.status = 200
         message.unity_input.CopyFrom(inputs)
-        self.unity_to_external.parent_conn.send(message)
-        self.unity_to_external.parent_conn.recv()
+        self.unity_to_external.replies.put(message)
+        self.unity_to_external.requests.get()
         return aca_param
 
     def exchange(self, inputs: UnityInput) -> UnityOutput:
         message = UnityMessage()
         message.header.status = 200
         message.unity_input.CopyFrom(inputs)
-        self.unity_to_external.parent_conn.send(message)
-        output = self.unity_to_external.parent_conn.recv()
+        self.unity_to_external.replies.put(message)
+        output = self.unity_to_external.requests.get()
         if output.header.status != 200:
             return None
         return output.unity_output
@@ -111,7 +121,6 @@ class RpcCommunicator(Communicator):
         if self.is_open:
             message_input = UnityMessage()
             message_input.header.status = 400
-            self.unity_to_external.parent_conn.send(message_input)
-            self.unity_to_external.parent_conn.close()
+            self.unity_to_external.replies.put(message_input)
             self.server.stop(False)
             self.is_open = False
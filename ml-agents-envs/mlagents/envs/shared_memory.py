@@ -0,0 +1,230 @@
+import mmap
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from mlagents.envs.brain import AllBrainInfo, BrainInfo, LazyVisualObservations
+
+# Offsets of the arrays in the buffer are aligned to this many bytes.
+ALIGNMENT = 64
+INITIAL_CAPACITY = 1 << 20
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class SharedBrainInfoBuffer:
+    """
+    A memory-mapped file through which an environment worker sends its
+    BrainInfos to the parent process without pickling the arrays.
+
+    The worker writes the numeric fields and the compressed images into the
+    buffer with pack(), and only sends back the small metadata it returns.
+    The parent calls unpack() on that metadata to get BrainInfos whose arrays
+    are views on the buffer. These views are only valid until the worker
+    writes its next step, so they must be copied (e.g. by merging them)
+    before the next step is sent.
+    """
+
+    ARRAY_FIELDS = [
+        "vector_observations",
+        "memories",
+        "previous_vector_actions",
+        "action_masks",
+    ]
+    LIST_FIELDS = ["rewards", "local_done", "max_reached", "agents"]
+    OBJECT_FIELDS = [
+        "text_observations",
+        "previous_text_actions",
+        "custom_observations",
+    ]
+
+    def __init__(self, directory: str, name: str):
+        """
+        :param directory: Directory in which the file is created. A directory
+        on a memory-backed file system, such as /dev/shm, avoids any disk I/O.
+        :param name: Prefix of the file name, unique for each worker.
+        """
+        self.directory = directory
+        self.name = name
+        self.generation = -1
+        self.capacity = 0
+        self._mmap = None
+        self._file_name = None
+
+    def _path(self, file_name: str) -> str:
+        return os.path.join(self.directory, file_name)
+
+    def _resize(self, size: int):
+        """
+        Creates a new, larger file for the buffer. The parent may still hold
+        views on the previous one, so it is unlinked rather than truncated.
+        """
+        old_file_name = self._file_name
+        self.generation += 1
+        self.capacity = max(size, 2 * self.capacity, INITIAL_CAPACITY)
+        self._file_name = "{}-{}".format(self.name, self.generation)
+        fd = os.open(self._path(self._file_name), os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            os.ftruncate(fd, self.capacity)
+            self._mmap = mmap.mmap(fd, self.capacity)
+        finally:
+            os.close(fd)
+        if old_file_name is not None:
+            try:
+                os.remove(self._path(old_file_name))
+            except OSError:
+                pass
+
+    def _map(self, file_name: str, size: int):
+        if file_name != self._file_name or size > self.capacity:
+            with open(self._path(file_name), "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            self._file_name = file_name
+            self.capacity = size
+
+    def pack(self, all_brain_info: AllBrainInfo) -> Dict[str, Any]:
+        """
+        Writes the arrays of all_brain_info into the buffer.
+        :param all_brain_info: The BrainInfos to send.
+        :return: Metadata to send to the process calling unpack().
+        """
+        arrays: List[np.ndarray] = []
+        brains = {}
+        for brain_name, brain_info in all_brain_info.items():
+            brains[brain_name] = self._describe(brain_info, arrays)
+        offsets = []
+        size = 0
+        for array in arrays:
+            size = _align(size)
+            offsets.append(size)
+            size += array.nbytes
+        if size > self.capacity:
+            self._resize(size)
+        for offset, array in zip(offsets, arrays):
+            if array.nbytes > 0:
+                np.ndarray(array.shape, array.dtype, buffer=self._mmap, offset=offset)[
+                    ...
+                ] = array
+        return {
+            "file_name": self._file_name,
+            "size": self.capacity,
+            "offsets": offsets,
+            "brains": brains,
+        }
+
+    @staticmethod
+    def _add_array(array, arrays: List[np.ndarray]) -> Optional[tuple]:
+        if array is None:
+            return None
+        array = np.ascontiguousarray(array)
+        arrays.append(array)
+        return len(arrays) - 1, array.shape, array.dtype.str
+
+    def _describe(self, brain_info: BrainInfo, arrays: List[np.ndarray]) -> Dict:
+        description = {"arrays": {}, "lists": {}, "objects": {}, "visual": []}
+        for field in self.ARRAY_FIELDS:
+            value = getattr(brain_info, field)
+            if isinstance(value, np.ndarray) and value.dtype.kind in "biuf":
+                description["arrays"][field] = self._add_array(value, arrays)
+            else:
+                description["objects"][field] = value
+        for field in self.LIST_FIELDS:
+            value = getattr(brain_info, field)
+            as_array = np.asarray(value) if value is not None else None
+            if as_array is not None and as_array.dtype.kind in "biuf":
+                description["lists"][field] = self._add_array(as_array, arrays)
+            else:
+                description["objects"][field] = value
+        for field in self.OBJECT_FIELDS:
+            description["objects"][field] = getattr(brain_info, field)
+        for visual_obs in brain_info.visual_observations:
+            if isinstance(visual_obs, LazyVisualObservations):
+                lengths = np.array([len(x) for x in visual_obs.images], np.int64)
+                images = np.frombuffer(b"".join(visual_obs.images), np.uint8)
+                description["visual"].append(
+                    (
+                        "images",
+                        self._add_array(images, arrays),
+                        self._add_array(lengths, arrays),
+                        visual_obs.camera_resolution,
+                        visual_obs.uint8_visual,
+                    )
+                )
+            else:
+                description["visual"].append(
+                    ("array", self._add_array(np.asarray(visual_obs), arrays))
+                )
+        return description
+
+    def unpack(self, metadata: Dict[str, Any]) -> AllBrainInfo:
+        """
+        Reads the BrainInfos written by pack().
+        :param metadata: The value returned by pack() in the worker.
+        :return: BrainInfos whose arrays are views on the buffer.
+        """
+        self._map(metadata["file_name"], metadata["size"])
+        offsets = metadata["offsets"]
+
+        def view(record):
+            if record is None:
+                return None
+            index, shape, dtype = record
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape))
+            return np.frombuffer(
+                self._mmap, dtype=dtype, count=count, offset=offsets[index]
+            ).reshape(shape)
+
+        all_brain_info = {}
+        for brain_name, description in metadata["brains"].items():
+            fields = dict(description["objects"])
+            for field, record in description["arrays"].items():
+                fields[field] = view(record)
+            for field, record in description["lists"].items():
+                fields[field] = view(record).tolist()
+            visual_observations = []
+            for visual in description["visual"]:
+                if visual[0] == "images":
+                    _, images_record, lengths_record, resolution, uint8_visual = visual
+                    images = view(images_record)
+                    ends = np.cumsum(view(lengths_record)).tolist()
+                    starts = [0] + ends[:-1]
+                    visual_observations.append(
+                        LazyVisualObservations(
+                            [images[s:e].tobytes() for s, e in zip(starts, ends)],
+                            resolution,
+                            uint8_visual=uint8_visual,
+                        )
+                    )
+                else:
+                    visual_observations.append(view(visual[1]))
+            all_brain_info[brain_name] = BrainInfo(
+                visual_observation=visual_observations,
+                vector_observation=fields["vector_observations"],
+                text_observations=fields["text_observations"],
+                memory=fields["memories"],
+                reward=fields["rewards"],
+                agents=fields["agents"],
+                local_done=fields["local_done"],
+                vector_action=fields["previous_vector_actions"],
+                text_action=fields["previous_text_actions"],
+                max_reached=fields["max_reached"],
+                action_mask=fields["action_masks"],
+                custom_observations=fields["custom_observations"],
+            )
+        return all_brain_info
+
+    def close(self):
+        """
+        Unmaps the buffer, and removes its file if this side created it.
+        """
+        if self._mmap is not None and self.generation >= 0:
+            self._mmap.close()
+            try:
+                os.remove(self._path(self._file_name))
+            except OSError:
+                pass
+        self._mmap = None
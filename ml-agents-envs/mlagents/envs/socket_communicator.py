@@ -4,7 +4,7 @@ import struct
 
 from .communicator import Communicator
 from .communicator_objects import UnityMessage, UnityOutput, UnityInput
-from .exception import UnityTimeOutException
+from .exception import UnityEnvironmentException, UnityTimeOutException
 
 
 logger = logging.getLogger("mlagents.envs")
@@ -20,7 +20,7 @@ class SocketCommunicator(Communicator):
         """
 
         self.port = base_port + worker_id
-        self._buffer_size = 12000
+        self._receive_buffer = bytearray(12000)
         self.worker_id = worker_id
         self._socket = None
         self._conn = None
@@ -42,6 +42,8 @@ class SocketCommunicator(Communicator):
             self._socket.listen(1)
             self._conn, _ = self._socket.accept()
             self._conn.settimeout(30)
+            # The length header and the message are sent separately.
+            self._conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         except:
             raise UnityTimeOutException(
                 "The Unity environment took too long to respond. Make sure that :\n"
@@ -58,19 +60,40 @@ class SocketCommunicator(Communicator):
         initialization_output.ParseFromString(self._communicator_receive())
         return initialization_output.unity_output
 
-    def _communicator_receive(self):
+    def _receive_into(self, view: memoryview):
+        """
+        Fills view with bytes read from the connection.
+        """
+        received = 0
+        while received < len(view):
+            n = self._conn.recv_into(view[received:])
+            if n == 0:
+                raise UnityEnvironmentException(
+                    "The environment closed the connection."
+                )
+            received += n
+
+    def _communicator_receive(self) -> memoryview:
+        """
+        Reads a length-prefixed message into the receive buffer, which is
+        reused across calls and grown as needed.
+        :return: A view on the message, valid until the next call.
+        """
         try:
-            s = self._conn.recv(self._buffer_size)
-            message_length = struct.unpack("I", bytearray(s[:4]))[0]
-            s = s[4:]
-            while len(s) != message_length:
-                s += self._conn.recv(self._buffer_size)
+            header = memoryview(self._receive_buffer)[:4]
+            self._receive_into(header)
+            message_length = struct.unpack("I", header)[0]
+            if message_length > len(self._receive_buffer):
+                self._receive_buffer = bytearray(message_length)
+            message = memoryview(self._receive_buffer)[:message_length]
+            self._receive_into(message)
         except socket.timeout as e:
             raise UnityTimeOutException("The environment took too long to respond.")
-        return s
+        return message
 
     def _communicator_send(self, message):
-        self._conn.send(struct.pack("I", len(message)) + message)
+        self._conn.sendall(struct.pack("I", len(message)))
+        self._conn.sendall(message)
 
     def exchange(self, inputs: UnityInput) -> UnityOutput:
         message = UnityMessage()
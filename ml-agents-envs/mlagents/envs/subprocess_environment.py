@@ -1,13 +1,16 @@
 from typing import *
-import copy
+import os
+import shutil
+import tempfile
 import numpy as np
 import cloudpickle
 
 from mlagents.envs import UnityEnvironment
 from multiprocessing import Process, Pipe
-from multiprocessing.connection import Connection
+from multiprocessing.connection import Connection, wait
 from mlagents.envs.base_unity_environment import BaseUnityEnvironment
-from mlagents.envs import AllBrainInfo, UnityEnvironmentException
+from mlagents.envs.shared_memory import SharedBrainInfoBuffer
+from mlagents.envs import AllBrainInfo, BrainInfo, UnityEnvironmentException
 
 
 class EnvironmentCommand(NamedTuple):
@@ -48,15 +51,30 @@ class UnityEnvWorker(NamedTuple):
         self.process.join()
 
 
-def worker(parent_conn: Connection, pickled_env_factory: str, worker_id: int):
+def worker(
+    parent_conn: Connection,
+    pickled_env_factory: str,
+    worker_id: int,
+    shared_memory_directory: Optional[str] = None,
+):
     env_factory: Callable[[int], UnityEnvironment] = cloudpickle.loads(
         pickled_env_factory
     )
     env = env_factory(worker_id)
+    shared_buffer = None
+    if shared_memory_directory is not None:
+        shared_buffer = SharedBrainInfoBuffer(
+            shared_memory_directory, "worker-{}".format(worker_id)
+        )
 
     def _send_response(cmd_name, payload):
         parent_conn.send(EnvironmentResponse(cmd_name, worker_id, payload))
 
+    def _send_brain_info(cmd_name, all_brain_info):
+        if shared_buffer is not None:
+            all_brain_info = shared_buffer.pack(all_brain_info)
+        _send_response(cmd_name, all_brain_info)
+
     try:
         while True:
             cmd: EnvironmentCommand = parent_conn.recv()
@@ -66,14 +84,14 @@ def worker(parent_conn: Connection, pickled_env_factory: str, worker_id: int):
                     all_brain_info = env.reset()
                 else:
                     all_brain_info = env.step(vector_action, memory, text_action, value)
-                _send_response("step", all_brain_info)
+                _send_brain_info("step", all_brain_info)
             elif cmd.name == "external_brains":
                 _send_response("external_brains", env.external_brains)
             elif cmd.name == "reset_parameters":
                 _send_response("reset_parameters", env.reset_parameters)
             elif cmd.name == "reset":
                 all_brain_info = env.reset(cmd.payload[0], cmd.payload[1])
-                _send_response("reset", all_brain_info)
+                _send_brain_info("reset", all_brain_info)
             elif cmd.name == "global_done":
                 _send_response("global_done", env.global_done)
             elif cmd.name == "close":
@@ -82,21 +100,52 @@ def worker(parent_conn: Connection, pickled_env_factory: str, worker_id: int):
         print("UnityEnvironment worker: keyboard interrupt")
     finally:
         env.close()
+        if shared_buffer is not None:
+            shared_buffer.close()
 
 
 class SubprocessUnityEnvironment(BaseUnityEnvironment):
     def __init__(
-        self, env_factory: Callable[[int], BaseUnityEnvironment], n_env: int = 1
+        self,
+        env_factory: Callable[[int], BaseUnityEnvironment],
+        n_env: int = 1,
+        use_shared_memory: bool = False,
     ):
+        """
+        :param env_factory: Function creating the environment of each worker.
+        :param n_env: Number of environments to run in parallel.
+        :param use_shared_memory: Whether the workers send the arrays of their
+        BrainInfos through memory-mapped files rather than pickling them
+        through a pipe.
+        """
         self.envs = []
         self.env_agent_counts = {}
         self.waiting = False
+        # Workers whose agents are in the last returned AllBrainInfo, and
+        # workers still stepping after a call to step_ready.
+        self.ready_workers = list(range(n_env))
+        self.pending_workers: Set[int] = set()
+        self.shared_memory_directory = None
+        self.shared_buffers: Dict[int, SharedBrainInfoBuffer] = {}
+        if use_shared_memory:
+            self.shared_memory_directory = tempfile.mkdtemp(
+                prefix="mlagents-",
+                dir="/dev/shm" if os.path.isdir("/dev/shm") else None,
+            )
         for worker_id in range(n_env):
-            self.envs.append(self.create_worker(worker_id, env_factory))
+            if use_shared_memory:
+                self.shared_buffers[worker_id] = SharedBrainInfoBuffer(
+                    self.shared_memory_directory, "worker-{}".format(worker_id)
+                )
+            self.envs.append(
+                self.create_worker(worker_id, env_factory, self.shared_memory_directory)
+            )
 
     @staticmethod
     def create_worker(
-        worker_id: int, env_factory: Callable[[int], BaseUnityEnvironment]
+        worker_id: int,
+        env_factory: Callable[[int], BaseUnityEnvironment],
+        shared_memory_directory: Optional[str] = None,
     ) -> UnityEnvWorker:
         parent_conn, child_conn = Pipe()
 
@@ -104,7 +153,8 @@ class SubprocessUnityEnvironment(BaseUnityEnvironment):
         # on Windows as of Python 3.6.
         pickled_env_factory = cloudpickle.dumps(env_factory)
         child_process = Process(
-            target=worker, args=(child_conn, pickled_env_factory, worker_id)
+            target=worker,
+            args=(child_conn, pickled_env_factory, worker_id, shared_memory_directory),
         )
         child_process.start()
         return UnityEnvWorker(child_process, worker_id, parent_conn)
@@ -116,37 +166,15 @@ class SubprocessUnityEnvironment(BaseUnityEnvironment):
             raise UnityEnvironmentException(
                 "Tried to take an environment step bore previous step has completed."
             )
+        if self.pending_workers:
+            raise UnityEnvironmentException(
+                "Tried to step all environments while some are still stepping "
+                "after a call to step_ready."
+            )
 
-        agent_counts_cum = {}
-        for brain_name in self.env_agent_counts.keys():
-            agent_counts_cum[brain_name] = np.cumsum(self.env_agent_counts[brain_name])
-
-        # Split the actions provided by the previous set of agent counts, and send the step
-        # commands to the workers.
-        for worker_id, env in enumerate(self.envs):
-            env_actions = {}
-            env_memory = {}
-            env_text_action = {}
-            env_value = {}
-            for brain_name in self.env_agent_counts.keys():
-                start_ind = 0
-                if worker_id > 0:
-                    start_ind = agent_counts_cum[brain_name][worker_id - 1]
-                end_ind = agent_counts_cum[brain_name][worker_id]
-                if vector_action.get(brain_name) is not None:
-                    env_actions[brain_name] = vector_action[brain_name][
-                        start_ind:end_ind
-                    ]
-                if memory and memory.get(brain_name) is not None:
-                    env_memory[brain_name] = memory[brain_name][start_ind:end_ind]
-                if text_action and text_action.get(brain_name) is not None:
-                    env_text_action[brain_name] = text_action[brain_name][
-                        start_ind:end_ind
-                    ]
-                if value and value.get(brain_name) is not None:
-                    env_value[brain_name] = value[brain_name][start_ind:end_ind]
-
-            env.send("step", (env_actions, env_memory, env_text_action, env_value))
+        self._send_actions(
+            list(range(len(self.envs))), vector_action, memory, text_action, value
+        )
         self.waiting = True
 
     def step_await(self) -> AllBrainInfo:
@@ -155,9 +183,10 @@ class SubprocessUnityEnvironment(BaseUnityEnvironment):
                 "Tried to await an environment step, but no async step was taken."
             )
 
-        steps = [self.envs[i].recv() for i in range(len(self.envs))]
-        self._get_agent_counts(map(lambda s: s.payload, steps))
+        steps = [self._recv_brain_info(self.envs[i]) for i in range(len(self.envs))]
+        self._get_agent_counts(steps)
         combined_brain_info = self._merge_step_info(steps)
+        self.ready_workers = [step.worker_id for step in steps]
         self.waiting = False
         return combined_brain_info
 
@@ -167,15 +196,107 @@ class SubprocessUnityEnvironment(BaseUnityEnvironment):
         self.step_async(vector_action, memory, text_action, value)
         return self.step_await()
 
+    def step_ready(
+        self,
+        vector_action=None,
+        memory=None,
+        text_action=None,
+        value=None,
+        min_workers: int = 1,
+    ) -> AllBrainInfo:
+        """
+        Steps the environments without waiting for the slowest ones.
+        The actions are for the agents of the last AllBrainInfo returned by
+        reset or step_ready, and are sent to the corresponding workers right
+        away. Then waits until at least min_workers of all the stepping
+        workers have replied, and returns the merged AllBrainInfo of all the
+        workers which have replied by then. The other workers keep stepping,
+        and are returned by a later call.
+        :param min_workers: Number of workers to wait for.
+        :return: The AllBrainInfo of the workers which have replied.
+        """
+        if self.waiting:
+            raise UnityEnvironmentException(
+                "Tried to take an environment step before the previous step has completed."
+            )
+        self._send_actions(
+            self.ready_workers, vector_action, memory, text_action, value
+        )
+        self.pending_workers.update(self.ready_workers)
+        ready = self._wait_for_workers(min_workers)
+        steps = [self._recv_brain_info(self.envs[i]) for i in ready]
+        self.pending_workers.difference_update(ready)
+        self._get_agent_counts(steps)
+        self.ready_workers = ready
+        return self._merge_step_info(steps)
+
+    def _wait_for_workers(self, min_workers: int) -> List[int]:
+        """
+        Waits until at least min_workers pending workers have a reply ready.
+        :return: The sorted ids of all the pending workers with a reply ready.
+        """
+        min_workers = max(1, min(min_workers, len(self.pending_workers)))
+        conns = {self.envs[i].conn: i for i in self.pending_workers}
+        ready_conns = set()
+        while len(ready_conns) < min_workers:
+            ready_conns.update(wait([c for c in conns if c not in ready_conns]))
+        # Also take the replies which arrived in the meantime.
+        ready_conns.update(wait([c for c in conns if c not in ready_conns], 0))
+        return sorted(conns[conn] for conn in ready_conns)
+
+    def _send_actions(
+        self, worker_ids: List[int], vector_action, memory, text_action, value
+    ):
+        """
+        Splits the actions of the agents of worker_ids, in the order of the
+        last merged AllBrainInfo, and sends each worker a step command.
+        """
+        start_ind = {brain_name: 0 for brain_name in self.env_agent_counts}
+        for worker_id in worker_ids:
+            env_actions = {}
+            env_memory = {}
+            env_text_action = {}
+            env_value = {}
+            for brain_name, agent_counts in self.env_agent_counts.items():
+                start = start_ind[brain_name]
+                end = start + agent_counts[worker_id]
+                start_ind[brain_name] = end
+                if vector_action.get(brain_name) is not None:
+                    env_actions[brain_name] = vector_action[brain_name][start:end]
+                if memory and memory.get(brain_name) is not None:
+                    env_memory[brain_name] = memory[brain_name][start:end]
+                if text_action and text_action.get(brain_name) is not None:
+                    env_text_action[brain_name] = text_action[brain_name][start:end]
+                if value and value.get(brain_name) is not None:
+                    env_value[brain_name] = value[brain_name][start:end]
+
+            self.envs[worker_id].send(
+                "step", (env_actions, env_memory, env_text_action, env_value)
+            )
+
+    def _discard_pending_steps(self):
+        """
+        Waits for the workers still stepping after step_ready, and discards
+        their replies so that they can receive other commands.
+        """
+        for worker_id in sorted(self.pending_workers):
+            self.envs[worker_id].recv()
+        self.pending_workers.clear()
+
     def reset(self, config=None, train_mode=True) -> AllBrainInfo:
+        self._discard_pending_steps()
         self._broadcast_message("reset", (config, train_mode))
-        reset_results = [self.envs[i].recv() for i in range(len(self.envs))]
-        self._get_agent_counts(map(lambda r: r.payload, reset_results))
+        reset_results = [
+            self._recv_brain_info(self.envs[i]) for i in range(len(self.envs))
+        ]
+        self._get_agent_counts(reset_results)
+        self.ready_workers = list(range(len(self.envs)))
 
         return self._merge_step_info(reset_results)
 
     @property
     def global_done(self):
+        self._discard_pending_steps()
         self._broadcast_message("global_done")
         dones: List[EnvironmentResponse] = [
             self.envs[i].recv().payload for i in range(len(self.envs))
@@ -195,28 +316,57 @@ class SubprocessUnityEnvironment(BaseUnityEnvironment):
     def close(self):
         for env in self.envs:
             env.close()
+        for shared_buffer in self.shared_buffers.values():
+            shared_buffer.close()
+        if self.shared_memory_directory is not None:
+            shutil.rmtree(self.shared_memory_directory, ignore_errors=True)
+            self.shared_memory_directory = None
+
+    def _recv_brain_info(self, env: UnityEnvWorker) -> EnvironmentResponse:
+        """
+        Receives a step or reset response from a worker. With shared memory,
+        the BrainInfos it contains are views on the worker's buffer, which
+        _merge_step_info copies.
+        """
+        response = env.recv()
+        if response.worker_id in self.shared_buffers:
+            response = EnvironmentResponse(
+                response.name,
+                response.worker_id,
+                self.shared_buffers[response.worker_id].unpack(response.payload),
+            )
+        return response
 
-    def _get_agent_counts(self, step_list: Iterable[AllBrainInfo]):
-        for i, step in enumerate(step_list):
-            for brain_name, brain_info in step.items():
+    def _get_agent_counts(self, step_list: Iterable[EnvironmentResponse]):
+        for step in step_list:
+            for brain_name, brain_info in step.payload.items():
                 if brain_name not in self.env_agent_counts.keys():
                     self.env_agent_counts[brain_name] = [0] * len(self.envs)
-                self.env_agent_counts[brain_name][i] = len(brain_info.agents)
+                self.env_agent_counts[brain_name][step.worker_id] = len(
+                    brain_info.agents
+                )
 
     @staticmethod
     def _merge_step_info(env_steps: List[EnvironmentResponse]) -> AllBrainInfo:
-        accumulated_brain_info: AllBrainInfo = None
+        """
+        Concatenates the BrainInfos of all workers, brain by brain. Agent ids
+        are prefixed with the id of their worker to keep them unique.
+        """
+        brain_infos: Dict[str, List[BrainInfo]] = {}
+        agent_ids: Dict[str, List[str]] = {}
         for env_step in env_steps:
             all_brain_info: AllBrainInfo = env_step.payload
+            prefix = str(env_step.worker_id) + "-"
             for brain_name, brain_info in all_brain_info.items():
-                for i in range(len(brain_info.agents)):
-                    brain_info.agents[i] = (
-                        str(env_step.worker_id) + "-" + str(brain_info.agents[i])
-                    )
-                if accumulated_brain_info:
-                    accumulated_brain_info[brain_name].merge(brain_info)
-            if not accumulated_brain_info:
-                accumulated_brain_info = copy.deepcopy(all_brain_info)
+                brain_infos.setdefault(brain_name, []).append(brain_info)
+                agent_ids.setdefault(brain_name, []).extend(
+                    [prefix + str(agent_id) for agent_id in brain_info.agents]
+                )
+        accumulated_brain_info: AllBrainInfo = {}
+        for brain_name, infos in brain_infos.items():
+            merged = BrainInfo.merge_all(infos)
+            merged.agents = agent_ids[brain_name]
+            accumulated_brain_info[brain_name] = merged
         return accumulated_brain_info
 
     def _broadcast_message(self, name: str, payload=None):
@@ -0,0 +1,90 @@
+"""
+Benchmark of synchronous stepping against SubprocessUnityEnvironment.step_ready.
+
+Each fake environment sleeps for a random time at every step, and some
+workers are slower than others, as happens with real Unity instances.
+Prints the number of agent steps collected per second. Run with:
+
+    python -m mlagents.envs.tests.benchmark_async_step
+"""
+import random
+import time
+
+import numpy as np
+
+from mlagents.envs import BrainInfo
+from mlagents.envs.subprocess_environment import SubprocessUnityEnvironment
+
+N_ENVS = 8
+AGENTS_PER_ENV = 4
+# Mean step latency of each worker, in seconds. Every fourth worker is a
+# straggler.
+BASE_LATENCY = 0.005
+STRAGGLER_LATENCY = 0.03
+
+
+class FakeLatencyEnvironment:
+    global_done = False
+
+    def __init__(self, worker_id):
+        self.latency = STRAGGLER_LATENCY if worker_id % 4 == 3 else BASE_LATENCY
+        self.brain_info = BrainInfo(
+            visual_observation=[],
+            vector_observation=np.zeros((AGENTS_PER_ENV, 8)),
+            text_observations=[""] * AGENTS_PER_ENV,
+            memory=np.zeros((0, 0)),
+            reward=[0.0] * AGENTS_PER_ENV,
+            agents=list(range(AGENTS_PER_ENV)),
+            local_done=[False] * AGENTS_PER_ENV,
+            vector_action=np.zeros((AGENTS_PER_ENV, 2)),
+            text_action=[[] for _ in range(AGENTS_PER_ENV)],
+            max_reached=[False] * AGENTS_PER_ENV,
+            action_mask=np.ones((AGENTS_PER_ENV, 2)),
+            custom_observations=[None] * AGENTS_PER_ENV,
+        )
+
+    def reset(self, config=None, train_mode=True):
+        return {"FakeBrain": self.brain_info}
+
+    def step(self, vector_action=None, memory=None, text_action=None, value=None):
+        time.sleep(random.expovariate(1.0 / self.latency))
+        return {"FakeBrain": self.brain_info}
+
+    def close(self):
+        pass
+
+
+def run(min_workers, duration):
+    env = SubprocessUnityEnvironment(FakeLatencyEnvironment, N_ENVS)
+    try:
+        info = env.reset()
+        agent_steps = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            n_agents = len(info["FakeBrain"].agents)
+            actions = {"FakeBrain": np.zeros((n_agents, 2))}
+            if min_workers is None:
+                info = env.step(actions)
+            else:
+                info = env.step_ready(actions, min_workers=min_workers)
+            agent_steps += len(info["FakeBrain"].agents)
+        return agent_steps / (time.perf_counter() - start)
+    finally:
+        env.close()
+
+
+def main(duration=5.0):
+    print("{:>22} {:>18}".format("mode", "agent steps / s"))
+    sync = run(None, duration)
+    print("{:>22} {:>18.0f}".format("step (all workers)", sync))
+    for min_workers in [N_ENVS // 2, 1]:
+        throughput = run(min_workers, duration)
+        print(
+            "{:>22} {:>18.0f} ({:.1f}x)".format(
+                "step_ready({})".format(min_workers), throughput, throughput / sync
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Microbenchmark for BrainInfo.from_agent_proto.
+
+Times the decoding of the agent infos of a brain across a range of agent
+counts. Run with:
+
+    python -m mlagents.envs.tests.benchmark_brain_info
+
+See mlagents.trainers.tests.benchmark_utils to compare with an earlier revision.
+"""
+import timeit
+
+import numpy as np
+
+from mlagents.envs import BrainInfo, BrainParameters
+from mlagents.envs.communicator_objects import AgentInfoProto
+
+AGENT_COUNTS = [1, 10, 100, 200, 1000, 2000]
+VECTOR_OBSERVATION_SIZE = 64
+ACTION_BRANCHES = [3, 3, 2]
+MEMORY_SIZE = 32
+
+
+def make_agent_infos(n_agents):
+    total_num_actions = sum(ACTION_BRANCHES)
+    return [
+        AgentInfoProto(
+            stacked_vector_observation=np.random.rand(VECTOR_OBSERVATION_SIZE),
+            reward=float(i),
+            stored_vector_actions=[1] * len(ACTION_BRANCHES),
+            memories=np.random.rand(MEMORY_SIZE),
+            action_mask=[i % 2 == 0] * total_num_actions,
+            done=False,
+            max_step_reached=False,
+            id=i,
+        )
+        for i in range(n_agents)
+    ]
+
+
+def main(number=20):
+    brain_params = BrainParameters(
+        "BenchmarkBrain",
+        VECTOR_OBSERVATION_SIZE,
+        1,
+        [],
+        ACTION_BRANCHES,
+        [""] * len(ACTION_BRANCHES),
+        0,
+    )
+    print("{:>8} {:>14}".format("agents", "decode (ms)"))
+    for n_agents in AGENT_COUNTS:
+        agent_infos = make_agent_infos(n_agents)
+        elapsed = timeit.timeit(
+            lambda: BrainInfo.from_agent_proto(agent_infos, brain_params), number=number
+        )
+        print("{:>8} {:>14.3f}".format(n_agents, 1000 * elapsed / number))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Latency benchmark for RpcCommunicator.
+
+A fake Unity peer runs in a thread and exchanges messages with the
+communicator over grpc, as the Unity client would. Reports the time per
+exchange for several observation sizes. Run with:
+
+    python -m mlagents.envs.tests.benchmark_rpc_communicator
+
+See mlagents.trainers.tests.benchmark_utils to compare with an earlier revision.
+"""
+import socket
+import threading
+import timeit
+
+import grpc
+
+from mlagents.envs import RpcCommunicator
+from mlagents.envs.communicator_objects import (
+    AgentInfoProto,
+    UnityInput,
+    UnityMessage,
+    UnityOutput,
+    UnityRLInitializationOutput,
+    UnityRLOutput,
+    UnityToExternalStub,
+)
+
+# Number of floats in the vector observations sent by the peer at each step.
+OBSERVATION_SIZES = [0, 1000, 100000]
+
+
+def fake_unity(port, observation_size):
+    channel = grpc.insecure_channel("localhost:{}".format(port))
+    grpc.channel_ready_future(channel).result(timeout=10)
+    stub = UnityToExternalStub(channel)
+    message = UnityMessage()
+    message.header.status = 200
+    message.unity_output.CopyFrom(
+        UnityOutput(rl_initialization_output=UnityRLInitializationOutput())
+    )
+    step_message = UnityMessage()
+    step_message.header.status = 200
+    agent_info = AgentInfoProto(stacked_vector_observation=[0.5] * observation_size)
+    step_message.unity_output.rl_output.CopyFrom(
+        UnityRLOutput(
+            agentInfos={"Brain": UnityRLOutput.ListAgentInfoProto(value=[agent_info])}
+        )
+    )
+    reply = stub.Exchange(message)
+    while reply.header.status == 200:
+        try:
+            reply = stub.Exchange(step_message)
+        except grpc.RpcError:
+            break
+
+
+def find_free_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(("localhost", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def time_exchanges(observation_size, number):
+    comm = RpcCommunicator(base_port=find_free_port())
+    peer = threading.Thread(target=fake_unity, args=(comm.port, observation_size))
+    peer.start()
+    comm.initialize(UnityInput())
+    comm.exchange(UnityInput())
+    elapsed = timeit.timeit(lambda: comm.exchange(UnityInput()), number=number)
+    comm.close()
+    peer.join()
+    return elapsed
+
+
+def main(number=500):
+    print("{:>10} {:>16}".format("obs size", "exchange (us)"))
+    for observation_size in OBSERVATION_SIZES:
+        elapsed = time_exchanges(observation_size, number)
+        print("{:>10} {:>16.1f}".format(observation_size, 1e6 * elapsed / number))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Microbenchmark for the SocketCommunicator framing.
+
+Sends length-prefixed messages of several sizes over a loopback TCP
+connection, and times the receive and send paths of the communicator. Run
+with:
+
+    python -m mlagents.envs.tests.benchmark_socket_communicator
+
+See mlagents.trainers.tests.benchmark_utils to compare with an earlier revision.
+"""
+import socket
+import struct
+import threading
+import time
+
+from mlagents.envs.socket_communicator import SocketCommunicator
+
+MESSAGE_SIZES = [1 << 10, 1 << 20, 16 << 20]
+
+
+def make_connection():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("localhost", 0))
+    server.listen(1)
+    client = socket.create_connection(server.getsockname())
+    conn, _ = server.accept()
+    server.close()
+    for s in (client, conn):
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return conn, client
+
+
+def drain(conn, total):
+    buffer = bytearray(1 << 20)
+    while total > 0:
+        total -= conn.recv_into(buffer)
+
+
+def write_frames(client, frame, number):
+    # As with Unity, the next message is only sent once the previous one
+    # has been answered.
+    for _ in range(number):
+        client.sendall(frame)
+        client.recv(1)
+
+
+def time_receive(receive, message, number):
+    conn, client = make_connection()
+    frame = struct.pack("I", len(message)) + message
+    writer = threading.Thread(target=write_frames, args=(client, frame, number))
+    writer.start()
+    start = time.perf_counter()
+    for _ in range(number):
+        assert len(receive(conn)) == len(message)
+        conn.sendall(b"\0")
+    elapsed = time.perf_counter() - start
+    writer.join()
+    conn.close()
+    client.close()
+    return elapsed
+
+
+def time_send(send, message, number):
+    conn, client = make_connection()
+    reader = threading.Thread(target=drain, args=(client, number * (len(message) + 4)))
+    reader.start()
+    start = time.perf_counter()
+    for _ in range(number):
+        send(conn, message)
+    reader.join()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    client.close()
+    return elapsed
+
+
+def main():
+    comm = SocketCommunicator()
+
+    def receive(conn):
+        comm._conn = conn
+        return comm._communicator_receive()
+
+    def send(conn, message):
+        comm._conn = conn
+        comm._communicator_send(message)
+
+    print("{:>10} {:>6} {:>10}".format("size", "path", "time (ms)"))
+    for size in MESSAGE_SIZES:
+        message = bytes(size)
+        number = max(5, (64 << 20) // size // 4)
+        number = min(number, 2000)
+        for path, function, timer in [
+            ("recv", receive, time_receive),
+            ("send", send, time_send),
+        ]:
+            elapsed = timer(function, message, number)
+            print("{:>10} {:>6} {:>10.3f}".format(size, path, 1000 * elapsed / number))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import io
+import pickle
+import numpy as np
+
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+from mlagents.envs import BrainInfo, BrainParameters, LazyVisualObservations
+from mlagents.envs.communicator_objects import AgentInfoProto
+
+
+def make_brain_parameters(discrete_action=True):
+    return BrainParameters(
+        brain_name="RealFakeBrain",
+        vector_observation_space_size=3,
+        num_stacked_vector_observations=1,
+        camera_resolutions=[],
+        vector_action_space_size=[2, 3] if discrete_action else [2],
+        vector_action_descriptions=["", ""],
+        vector_action_space_type=0 if discrete_action else 1,
+    )
+
+
+def test_from_agent_proto_scrubs_nan():
+    agent_infos = [
+        AgentInfoProto(
+            stacked_vector_observation=[1, float("nan"), 3],
+            reward=float("nan"),
+            stored_vector_actions=[1, 2],
+            id=0,
+        ),
+        AgentInfoProto(
+            stacked_vector_observation=[4, 5, 6],
+            reward=2,
+            stored_vector_actions=[0, 1],
+            id=1,
+        ),
+    ]
+    brain_info = BrainInfo.from_agent_proto(agent_infos, make_brain_parameters())
+    assert brain_info.vector_observations.tolist() == [[1, 0, 3], [4, 5, 6]]
+    assert brain_info.rewards == [0, 2]
+    assert brain_info.previous_vector_actions.tolist() == [[1, 2], [0, 1]]
+    assert brain_info.agents == [0, 1]
+
+
+def test_from_agent_proto_masks_and_memories():
+    agent_infos = [
+        AgentInfoProto(
+            stacked_vector_observation=[1, 2, 3],
+            memories=[1, 2],
+            action_mask=[False, True, False, False, True],
+            id=0,
+        ),
+        AgentInfoProto(
+            stacked_vector_observation=[1, 2, 3],
+            memories=[3, 4, 5, 6],
+            action_mask=[True],
+            id=1,
+        ),
+    ]
+    brain_info = BrainInfo.from_agent_proto(agent_infos, make_brain_parameters())
+    assert brain_info.memories.tolist() == [[1, 2, 0, 0], [3, 4, 5, 6]]
+    # Masks that do not match the action space size are ignored.
+    assert brain_info.action_masks.tolist() == [[1, 0, 1, 1, 0], [1, 1, 1, 1, 1]]
+
+
+def test_from_agent_proto_no_agents():
+    brain_info = BrainInfo.from_agent_proto([], make_brain_parameters(False))
+    assert brain_info.vector_observations.shape == (0, 3)
+    assert brain_info.memories.shape == (0, 0)
+    assert brain_info.action_masks.shape == (0, 2)
+    assert brain_info.agents == []
+
+
+def make_png(color, size=(4, 3)):
+    image = Image.new("RGB", size, color)
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def test_from_agent_proto_decodes_visual_observations():
+    brain_params = make_brain_parameters()
+    brain_params.camera_resolutions = [
+        {"height": 3, "width": 4, "blackAndWhite": False},
+        {"height": 3, "width": 4, "blackAndWhite": True},
+    ]
+    brain_params.number_visual_observations = 2
+    agent_infos = [
+        AgentInfoProto(
+            stacked_vector_observation=[1, 2, 3],
+            visual_observations=[make_png((255, 0, 0)), make_png((0, 0, 255))],
+            id=i,
+        )
+        for i in range(3)
+    ]
+    brain_info = BrainInfo.from_agent_proto(agent_infos, brain_params)
+    assert brain_info.visual_observations[0].shape == (3, 3, 4, 3)
+    assert brain_info.visual_observations[1].shape == (3, 3, 4, 1)
+    assert brain_info.visual_observations[0][:, :, :, 0].min() == 1.0
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        parallel_info = BrainInfo.from_agent_proto(agent_infos, brain_params, executor)
+        for i in range(2):
+            np.testing.assert_array_equal(
+                brain_info.visual_observations[i], parallel_info.visual_observations[i]
+            )
+
+
+def test_from_agent_proto_uint8_visual_observations():
+    brain_params = make_brain_parameters()
+    brain_params.camera_resolutions = [
+        {"height": 3, "width": 4, "blackAndWhite": False},
+        {"height": 3, "width": 4, "blackAndWhite": True},
+    ]
+    brain_params.number_visual_observations = 2
+    agent_infos = [
+        AgentInfoProto(
+            stacked_vector_observation=[1, 2, 3],
+            visual_observations=[make_png((255, 0, 0)), make_png((30, 60, 90))],
+            id=i,
+        )
+        for i in range(2)
+    ]
+    brain_info = BrainInfo.from_agent_proto(
+        agent_infos, brain_params, uint8_visual=True
+    )
+    assert brain_info.visual_observations[0].dtype == np.uint8
+    assert brain_info.visual_observations[0][0, 0, 0].tolist() == [255, 0, 0]
+    assert brain_info.visual_observations[1].dtype == np.uint8
+    assert brain_info.visual_observations[1].shape == (2, 3, 4, 1)
+    assert (np.asarray(brain_info.visual_observations[1]) == 60).all()
+    empty_info = BrainInfo.from_agent_proto([], brain_params, uint8_visual=True)
+    assert empty_info.visual_observations[0].dtype == np.uint8
+
+
+def test_from_agent_proto_decodes_visual_observations_lazily():
+    brain_params = make_brain_parameters()
+    brain_params.camera_resolutions = [
+        {"height": 3, "width": 4, "blackAndWhite": False}
+    ]
+    brain_params.number_visual_observations = 1
+    agent_infos = [
+        AgentInfoProto(
+            stacked_vector_observation=[1, 2, 3],
+            visual_observations=[make_png((0, 255, 0))],
+            id=0,
+        ),
+        AgentInfoProto(
+            stacked_vector_observation=[1, 2, 3],
+            visual_observations=[b"not an image"],
+            id=1,
+        ),
+    ]
+    brain_info = BrainInfo.from_agent_proto(agent_infos, brain_params)
+    visual_obs = brain_info.visual_observations[0]
+    assert isinstance(visual_obs, LazyVisualObservations)
+    assert visual_obs.shape == (2, 3, 4, 3)
+    assert visual_obs[0, 0, 0].tolist() == [0, 1, 0]
+    with pytest.raises(IOError):
+        np.asarray(visual_obs)
+
+    brain_info.merge(BrainInfo.from_agent_proto(agent_infos[:1], brain_params))
+    visual_obs = brain_info.visual_observations[0]
+    assert len(visual_obs) == 3
+    assert visual_obs[2][0, 0].tolist() == [0, 1, 0]
+    visual_obs = pickle.loads(pickle.dumps(visual_obs))
+    assert visual_obs[0][0, 0].tolist() == [0, 1, 0]
+
+
+def test_merge_all():
+    brain_infos = [
+        BrainInfo(
+            [],
+            np.array([[1.0, 2.0]]),
+            ["a"],
+            memory=np.array([[1.0]]),
+            reward=[1.0],
+            agents=[0],
+            action_mask=np.ones((1, 2)),
+        ),
+        BrainInfo(
+            [],
+            np.zeros((0, 2)),
+            [],
+            memory=np.zeros((0, 0)),
+            reward=[],
+            agents=[],
+            action_mask=np.ones((0, 2)),
+        ),
+        BrainInfo(
+            [],
+            np.array([[3.0, 4.0], [5.0, 6.0]]),
+            ["b", "c"],
+            memory=np.zeros((0, 0)),
+            reward=[2.0, 3.0],
+            agents=[1, 2],
+            action_mask=np.zeros((2, 2)),
+        ),
+    ]
+    merged = BrainInfo.merge_all(brain_infos)
+    assert merged.vector_observations.tolist() == [[1, 2], [3, 4], [5, 6]]
+    assert merged.memories.tolist() == [[1], [0], [0]]
+    assert merged.text_observations == ["a", "b", "c"]
+    assert merged.rewards == [1.0, 2.0, 3.0]
+    assert merged.agents == [0, 1, 2]
+    assert merged.local_done is None
+    assert merged.action_masks.tolist() == [[1, 1], [0, 0], [0, 0]]
+    assert brain_infos[0].agents == [0]
+    assert brain_infos[0].vector_observations.tolist() == [[1, 2]]
+
+
+def test_agent_index():
+    brain_info = BrainInfo([], np.zeros((3, 2)), ["", "", ""], agents=[7, 3, 5])
+    assert brain_info.agent_index == {7: 0, 3: 1, 5: 2}
+    assert brain_info.agent_index is brain_info.agent_index
+    brain_info.merge(BrainInfo([], np.zeros((1, 2)), [""], agents=[1]))
+    assert brain_info.agent_index[1] == 3
+    brain_info.agents = [1]
+    assert brain_info.agent_index == {1: 0}
+    assert BrainInfo([], [], []).agent_index == {}
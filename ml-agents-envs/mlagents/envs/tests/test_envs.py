@@ -109,6 +109,34 @@ def test_step(mock_communicator, mock_launcher):
     assert brain_info["RealFakeBrain"].local_done[2]
 
 
+@mock.patch("mlagents.envs.UnityEnvironment.executable_launcher")
+@mock.patch("mlagents.envs.UnityEnvironment.get_communicator")
+def test_step_input(mock_communicator, mock_launcher):
+    comm = MockCommunicator(discrete_action=False, visual_inputs=0)
+    mock_communicator.return_value = comm
+    env = UnityEnvironment(" ")
+    env.reset()
+    with mock.patch.object(comm, "exchange", wraps=comm.exchange) as exchange:
+        env.step(
+            np.array([[1, 2], [3, 4], [5, 6]]),
+            memory=[np.array([0.5]), np.array([1.5]), np.array([2.5])],
+            text_action="text",
+            value=np.array([[0.1], [0.2], [0.3]], np.float32),
+        )
+        env.step()
+    agent_actions = exchange.call_args_list[0][0][0].rl_input.agent_actions
+    actions = agent_actions["RealFakeBrain"].value
+    assert [list(a.vector_actions) for a in actions] == [[1, 2], [3, 4], [5, 6]]
+    assert [list(a.memories) for a in actions] == [[0.5], [1.5], [2.5]]
+    assert [a.text_actions for a in actions] == ["text"] * 3
+    assert [a.value for a in actions] == list(np.array([0.1, 0.2, 0.3], np.float32))
+    agent_actions = exchange.call_args_list[1][0][0].rl_input.agent_actions
+    actions = agent_actions["RealFakeBrain"].value
+    assert [list(a.vector_actions) for a in actions] == [[0, 0]] * 3
+    assert [list(a.memories) for a in actions] == [[]] * 3
+    env.close()
+
+
 @mock.patch("mlagents.envs.UnityEnvironment.executable_launcher")
 @mock.patch("mlagents.envs.UnityEnvironment.get_communicator")
 def test_close(mock_communicator, mock_launcher):
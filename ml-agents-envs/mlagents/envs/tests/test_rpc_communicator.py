@@ -1,7 +1,19 @@
+import socket
+import threading
+
+import grpc
 import pytest
 
 from mlagents.envs import RpcCommunicator
-from mlagents.envs import UnityWorkerInUseException
+from mlagents.envs import UnityWorkerInUseException, UnityTimeOutException
+from mlagents.envs.communicator_objects import (
+    UnityInput,
+    UnityMessage,
+    UnityOutput,
+    UnityRLInitializationOutput,
+    UnityRLOutput,
+    UnityToExternalStub,
+)
 
 
 def test_rpc_communicator_checks_port_on_create():
@@ -28,3 +40,65 @@ def test_rpc_communicator_create_multiple_workers():
     second_comm = RpcCommunicator(worker_id=1)
     first_comm.close()
     second_comm.close()
+
+
+def find_free_port():
+    # The server closes the connection first, which leaves its port in
+    # TIME_WAIT for a while, so the test does not reuse a fixed port.
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(("localhost", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def fake_unity(port, received):
+    """
+    Plays the Unity side of the protocol: initializes, then exchanges
+    until the communicator is closed.
+    """
+    channel = grpc.insecure_channel("localhost:{}".format(port))
+    grpc.channel_ready_future(channel).result(timeout=10)
+    stub = UnityToExternalStub(channel)
+    message = UnityMessage()
+    message.header.status = 200
+    message.unity_output.CopyFrom(
+        UnityOutput(
+            rl_initialization_output=UnityRLInitializationOutput(name="FakeAcademy")
+        )
+    )
+    received.append(stub.Exchange(message))
+    step = 0
+    while received[-1].header.status == 200:
+        message = UnityMessage()
+        message.header.status = 200
+        message.unity_output.rl_output.CopyFrom(UnityRLOutput(global_done=step == 2))
+        try:
+            received.append(stub.Exchange(message))
+        except grpc.RpcError:
+            # The server may stop before the closing message reaches us.
+            break
+        step += 1
+
+
+def test_rpc_communicator_exchange():
+    comm = RpcCommunicator(base_port=find_free_port())
+    received = []
+    peer = threading.Thread(target=fake_unity, args=(comm.port, received))
+    peer.start()
+    aca_param = comm.initialize(UnityInput())
+    assert aca_param.rl_initialization_output.name == "FakeAcademy"
+    assert not comm.exchange(UnityInput()).rl_output.global_done
+    assert comm.exchange(UnityInput()).rl_output.global_done
+    comm.close()
+    peer.join(10)
+    assert not peer.is_alive()
+    assert [m.header.status for m in received[:3]] == [200, 200, 200]
+    assert received[3:] == [] or received[3].header.status == 400
+
+
+def test_rpc_communicator_initialize_timeout():
+    comm = RpcCommunicator(worker_id=3, timeout_wait=0.1)
+    with pytest.raises(UnityTimeOutException):
+        comm.initialize(UnityInput())
+    comm.close()
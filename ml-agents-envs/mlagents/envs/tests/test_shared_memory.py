@@ -0,0 +1,66 @@
+import numpy as np
+
+from mlagents.envs import BrainInfo, LazyVisualObservations
+from mlagents.envs.shared_memory import SharedBrainInfoBuffer
+
+
+def make_brain_info(n_agents, obs_size=4):
+    return BrainInfo(
+        visual_observation=[
+            LazyVisualObservations(
+                [bytes([i]) * (i + 1) for i in range(n_agents)],
+                {"height": 2, "width": 2, "blackAndWhite": False},
+            ),
+            np.arange(n_agents * 12, dtype=np.uint8).reshape(n_agents, 2, 2, 3),
+        ],
+        vector_observation=np.arange(n_agents * obs_size, dtype=np.float64).reshape(
+            n_agents, obs_size
+        ),
+        text_observations=[""] * n_agents,
+        memory=np.zeros((0, 0)),
+        reward=[float(i) for i in range(n_agents)],
+        agents=list(range(n_agents)),
+        local_done=[i % 2 == 0 for i in range(n_agents)],
+        vector_action=np.ones((n_agents, 2)),
+        text_action=[[] for _ in range(n_agents)],
+        max_reached=[False] * n_agents,
+        action_mask=np.ones((n_agents, 3)),
+        custom_observations=[None] * n_agents,
+    )
+
+
+def test_pack_unpack(tmpdir):
+    writer = SharedBrainInfoBuffer(str(tmpdir), "worker-0")
+    reader = SharedBrainInfoBuffer(str(tmpdir), "worker-0")
+    brain_info = make_brain_info(3)
+    unpacked = reader.unpack(writer.pack({"Brain": brain_info}))["Brain"]
+    assert unpacked.vector_observations.tolist() == (
+        brain_info.vector_observations.tolist()
+    )
+    assert unpacked.memories.shape == (0, 0)
+    assert unpacked.rewards == [0.0, 1.0, 2.0]
+    assert unpacked.agents == [0, 1, 2]
+    assert unpacked.local_done == [True, False, True]
+    assert unpacked.text_observations == ["", "", ""]
+    assert unpacked.visual_observations[0].images == [b"\x00", b"\x01\x01", b"\x02" * 3]
+    np.testing.assert_array_equal(
+        unpacked.visual_observations[1], brain_info.visual_observations[1]
+    )
+    writer.close()
+
+
+def test_pack_grows_buffer(tmpdir):
+    writer = SharedBrainInfoBuffer(str(tmpdir), "worker-0")
+    reader = SharedBrainInfoBuffer(str(tmpdir), "worker-0")
+    small = reader.unpack(writer.pack({"Brain": make_brain_info(2)}))["Brain"]
+    copied = small.vector_observations.copy()
+    large_info = make_brain_info(10, obs_size=50000)
+    large = reader.unpack(writer.pack({"Brain": large_info}))["Brain"]
+    assert writer.generation == 1
+    assert len(tmpdir.listdir()) == 1
+    np.testing.assert_array_equal(
+        large.vector_observations, large_info.vector_observations
+    )
+    np.testing.assert_array_equal(small.vector_observations, copied)
+    writer.close()
+    assert len(tmpdir.listdir()) == 0
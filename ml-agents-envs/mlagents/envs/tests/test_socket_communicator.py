@@ -0,0 +1,38 @@
+import socket
+import struct
+import threading
+
+import pytest
+
+from mlagents.envs import UnityEnvironmentException
+from mlagents.envs.socket_communicator import SocketCommunicator
+
+
+def make_connected_communicator():
+    comm = SocketCommunicator()
+    comm._conn, peer = socket.socketpair()
+    return comm, peer
+
+
+def test_socket_communicator_receive():
+    comm, peer = make_connected_communicator()
+    messages = [b"a" * 10, bytes(range(256)) * 1000, b"", b"b" * 5]
+    writer = threading.Thread(
+        target=lambda: [peer.sendall(struct.pack("I", len(m)) + m) for m in messages]
+    )
+    writer.start()
+    for message in messages:
+        assert bytes(comm._communicator_receive()) == message
+    writer.join()
+    peer.close()
+    with pytest.raises(UnityEnvironmentException):
+        comm._communicator_receive()
+    comm._conn.close()
+
+
+def test_socket_communicator_send():
+    comm, peer = make_connected_communicator()
+    comm._communicator_send(b"message")
+    assert peer.recv(100) == struct.pack("I", 7) + b"message"
+    peer.close()
+    comm._conn.close()
@@ -20,13 +20,16 @@ class MockEnvWorker:
 
 
 class SubprocessEnvironmentTest(unittest.TestCase):
-    def test_environments_are_created(self):
-        SubprocessUnityEnvironment.create_worker = MagicMock()
+    @mock.patch.object(SubprocessUnityEnvironment, "create_worker")
+    def test_environments_are_created(self, _):
         env = SubprocessUnityEnvironment(mock_env_factory, 2)
         # Creates two processes
         self.assertEqual(
             env.create_worker.call_args_list,
-            [mock.call(0, mock_env_factory), mock.call(1, mock_env_factory)],
+            [
+                mock.call(0, mock_env_factory, None),
+                mock.call(1, mock_env_factory, None),
+            ],
         )
         self.assertEqual(len(env.envs), 2)
 
@@ -121,3 +124,135 @@ class SubprocessEnvironmentTest(unittest.TestCase):
         mock_parent_connection.send.assert_called_with(
             EnvironmentResponse("step", 0, "reset_data")
         )
+
+
+class PipeEnvWorker:
+    """
+    Worker whose replies are sent by the test through a real pipe, so that
+    SubprocessUnityEnvironment can wait on it.
+    """
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.process = None
+        self.conn, self.child_conn = Pipe()
+        self.send = MagicMock()
+
+    def recv(self):
+        return self.conn.recv()
+
+    def reply(self, vector_observations):
+        n_agents = len(vector_observations)
+        brain_info = BrainInfo(
+            [],
+            np.array(vector_observations),
+            [],
+            agents=list(range(n_agents)),
+            memory=np.zeros((0, 0)),
+        )
+        self.child_conn.send(
+            EnvironmentResponse("step", self.worker_id, {"MockBrain": brain_info})
+        )
+
+
+class SubprocessEnvironmentStepReadyTest(unittest.TestCase):
+    def test_step_ready_returns_ready_workers(self):
+        env = SubprocessUnityEnvironment(mock_env_factory, 0)
+        env.envs = [PipeEnvWorker(0), PipeEnvWorker(1), PipeEnvWorker(2)]
+        env.env_agent_counts = {"MockBrain": [1, 2, 1]}
+        env.ready_workers = [0, 1, 2]
+        env.envs[0].reply([[1.0]])
+        env.envs[2].reply([[3.0], [4.0]])
+
+        vector_action = {"MockBrain": [[0.0], [1.0], [1.0], [2.0]]}
+        info = env.step_ready(vector_action=vector_action)["MockBrain"]
+        env.envs[1].send.assert_called_with(
+            "step", ({"MockBrain": [[1.0], [1.0]]}, {}, {}, {})
+        )
+        self.assertEqual(info.vector_observations.tolist(), [[1.0], [3.0], [4.0]])
+        self.assertEqual(info.agents, ["0-0", "2-0", "2-1"])
+        self.assertEqual(env.ready_workers, [0, 2])
+        self.assertEqual(env.pending_workers, {1})
+
+        # Only the workers which replied get the next actions.
+        env.envs[1].reply([[2.0]])
+        vector_action = {"MockBrain": [[5.0], [6.0], [7.0]]}
+        info = env.step_ready(vector_action=vector_action, min_workers=1)["MockBrain"]
+        env.envs[0].send.assert_called_with(
+            "step", ({"MockBrain": [[5.0]]}, {}, {}, {})
+        )
+        env.envs[2].send.assert_called_with(
+            "step", ({"MockBrain": [[6.0], [7.0]]}, {}, {}, {})
+        )
+        self.assertEqual(env.envs[1].send.call_count, 1)
+        self.assertEqual(info.agents, ["1-0"])
+        self.assertEqual(env.pending_workers, {0, 2})
+
+        with self.assertRaises(UnityEnvironmentException):
+            env.step_async(vector_action={})
+
+
+class CountingEnvironment:
+    """
+    Environment whose observations are filled with the number of steps taken.
+    """
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.steps = 0
+        self.global_done = False
+
+    def _brain_info(self):
+        n_agents = self.worker_id + 1
+        value = 10 * self.worker_id + self.steps
+        return {
+            "MockBrain": BrainInfo(
+                [np.full((n_agents, 4, 4, 3), value, dtype=np.float32)],
+                np.full((n_agents, 2), value, dtype=np.float32),
+                [""] * n_agents,
+                reward=[float(value)] * n_agents,
+                agents=list(range(n_agents)),
+                local_done=[False] * n_agents,
+                max_reached=[False] * n_agents,
+                memory=np.zeros((0, 0)),
+            )
+        }
+
+    def reset(self, config=None, train_mode=True):
+        self.steps = 0
+        return self._brain_info()
+
+    def step(self, vector_action=None, memory=None, text_action=None, value=None):
+        self.steps += 1
+        return self._brain_info()
+
+    def close(self):
+        pass
+
+
+class SubprocessEnvironmentSharedMemoryTest(unittest.TestCase):
+    def test_step_returns_copies_of_shared_memory(self):
+        env = SubprocessUnityEnvironment(CountingEnvironment, 2, use_shared_memory=True)
+        shared_memory_directory = env.shared_memory_directory
+        try:
+            self.assertTrue(os.path.isdir(shared_memory_directory))
+            env.reset()
+            first = env.step(vector_action={})["MockBrain"]
+            second = env.step(vector_action={})["MockBrain"]
+        finally:
+            env.close()
+
+        self.assertEqual(first.agents, ["0-0", "1-0", "1-1"])
+        self.assertEqual(
+            first.vector_observations.tolist(), [[1.0, 1.0], [11.0, 11.0], [11.0, 11.0]]
+        )
+        self.assertEqual(first.visual_observations[0][:, 0, 0, 0].tolist(), [1, 11, 11])
+        self.assertEqual(first.rewards, [1.0, 11.0, 11.0])
+        self.assertEqual(
+            second.vector_observations.tolist(),
+            [[2.0, 2.0], [12.0, 12.0], [12.0, 12.0]],
+        )
+        self.assertEqual(
+            second.visual_observations[0][:, 0, 0, 0].tolist(), [2, 12, 12]
+        )
+        self.assertFalse(os.path.exists(shared_memory_directory))
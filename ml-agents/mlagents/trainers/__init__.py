@@ -1,5 +1,6 @@
 from .action_info import *
 from .buffer import *
+from .prefetch import *
 from .curriculum import *
 from .meta_curriculum import *
 from .models import *
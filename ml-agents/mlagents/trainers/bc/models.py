@@ -14,8 +14,11 @@ class BehavioralCloningModel(LearningModel):
         normalize=False,
         use_recurrent=False,
         seed=0,
+        uint8_visual=False,
     ):
-        LearningModel.__init__(self, m_size, normalize, use_recurrent, brain, seed)
+        LearningModel.__init__(
+            self, m_size, normalize, use_recurrent, brain, seed, uint8_visual
+        )
         num_streams = 1
         hidden_streams = self.create_observation_streams(num_streams, h_size, n_layers)
         hidden = hidden_streams[0]
@@ -50,7 +50,9 @@ class OfflineBCTrainer(BCTrainer):
         )
 
         brain_params, self.demonstration_buffer = demo_to_buffer(
-            trainer_parameters["demo_path"], self.policy.sequence_length
+            trainer_parameters["demo_path"],
+            self.policy.sequence_length,
+            self.policy.uint8_visual,
         )
 
         policy_brain = copy.deepcopy(brain.__dict__)
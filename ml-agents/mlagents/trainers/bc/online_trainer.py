@@ -82,8 +82,8 @@ class OnlineBCTrainer(BCTrainer):
             if stored_info_teacher is None:
                 continue
             else:
-                idx = stored_info_teacher.agents.index(agent_id)
-                next_idx = next_info_teacher.agents.index(agent_id)
+                idx = stored_info_teacher.agent_index[agent_id]
+                next_idx = next_info_teacher.agent_index[agent_id]
                 if stored_info_teacher.text_observations[idx] != "":
                     info_teacher_record, info_teacher_reset = (
                         stored_info_teacher.text_observations[idx].lower().split(",")
@@ -18,17 +18,7 @@ class BCPolicy(Policy):
         super(BCPolicy, self).__init__(seed, brain, trainer_parameters)
 
         with self.graph.as_default():
-            with self.graph.as_default():
-                self.model = BehavioralCloningModel(
-                    h_size=int(trainer_parameters["hidden_units"]),
-                    lr=float(trainer_parameters["learning_rate"]),
-                    n_layers=int(trainer_parameters["num_layers"]),
-                    m_size=self.m_size,
-                    normalize=False,
-                    use_recurrent=trainer_parameters["use_recurrent"],
-                    brain=brain,
-                    seed=seed,
-                )
+            self.model = self._create_model(self.uint8_visual)
 
         if load:
             self._load_graph()
@@ -46,6 +36,25 @@ class BCPolicy(Policy):
         self.evaluate_rate = 1.0
         self.update_rate = 0.5
 
+    def _create_model(self, uint8_visual):
+        """
+        Builds the behavioral cloning model of the policy in the default graph.
+        :param uint8_visual: Whether visual observations are fed as uint8 pixels.
+        :return: The BehavioralCloningModel.
+        """
+        trainer_parameters = self.trainer_parameters
+        return BehavioralCloningModel(
+            h_size=int(trainer_parameters["hidden_units"]),
+            lr=float(trainer_parameters["learning_rate"]),
+            n_layers=int(trainer_parameters["num_layers"]),
+            m_size=self.m_size,
+            normalize=False,
+            use_recurrent=trainer_parameters["use_recurrent"],
+            brain=self.brain,
+            seed=self.seed,
+            uint8_visual=uint8_visual,
+        )
+
     def evaluate(self, brain_info):
         """
         Evaluates policy for the agent experiences provided.
@@ -65,12 +74,12 @@ class BCPolicy(Policy):
         run_out = self._execute_model(feed_dict, self.inference_dict)
         return run_out
 
-    def update(self, mini_batch, num_sequences):
+    def make_update_feed_dict(self, mini_batch, num_sequences):
         """
-        Performs update on model.
+        Makes the feed dict of an update of the model.
         :param mini_batch: Batch of experiences.
         :param num_sequences: Number of sequences to process.
-        :return: Results of update.
+        :return: Feed dict of the update.
         """
 
         feed_dict = {
@@ -102,5 +111,4 @@ class BCPolicy(Policy):
             feed_dict[self.model.visual_in[i]] = visual_obs
         if self.use_recurrent:
             feed_dict[self.model.memory_in] = np.zeros([num_sequences, self.m_size])
-        run_out = self._execute_model(feed_dict, self.update_dict)
-        return run_out
+        return feed_dict
@@ -105,7 +105,7 @@ class BCTrainer(Trainer):
             if stored_info_student is None:
                 continue
             else:
-                next_idx = next_info_student.agents.index(agent_id)
+                next_idx = next_info_student.agent_index[agent_id]
                 if agent_id not in self.cumulative_rewards:
                     self.cumulative_rewards[agent_id] = 0
                 self.cumulative_rewards[agent_id] += next_info_student.rewards[next_idx]
@@ -164,12 +164,14 @@ class BCTrainer(Trainer):
             len(self.demonstration_buffer.update_buffer["actions"]) // self.n_sequences,
             self.batches_per_epoch,
         )
-        for i in range(num_batches):
-            update_buffer = self.demonstration_buffer.update_buffer
-            start = i * self.n_sequences
-            end = (i + 1) * self.n_sequences
-            mini_batch = update_buffer.make_mini_batch(start, end)
-            run_out = self.policy.update(mini_batch, self.n_sequences)
+        feed_dicts = self.policy.get_update_feed_dicts(
+            self.demonstration_buffer.update_buffer,
+            self.n_sequences,
+            num_batches,
+            self.trainer_parameters.get("prefetch_mini_batches", 0),
+        )
+        for feed_dict in feed_dicts:
+            run_out = self.policy.update_with_feed_dict(feed_dict)
             loss = run_out["policy_loss"]
             batch_losses.append(loss)
         if len(batch_losses) > 0:
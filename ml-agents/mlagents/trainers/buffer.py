@@ -1,3 +1,5 @@
+import tempfile
+
 import numpy as np
 
 from mlagents.envs.exception import UnityException
@@ -23,18 +25,100 @@ class Buffer(dict):
         The keys correspond to the name of the field. Example: state, action
         """
 
-        class AgentBufferField(list):
+        class AgentBufferField(object):
             """
-            AgentBufferField is a list of numpy arrays. When an agent collects a field, you can add it to his
-            AgentBufferField with the append method.
+            AgentBufferField stores the elements of a field in a single numpy array, which
+            grows by doubling its capacity. When an agent collects a field, you can add it
+            to his AgentBufferField with the append method.
             """
 
-            def __init__(self):
+            INITIAL_CAPACITY = 16
+            # Elements at least this large are memory-mapped when a directory is given.
+            MEMMAP_MIN_ELEMENT_BYTES = 4096
+            # Amount of memory-mapped data gathered at once when reordering.
+            MEMMAP_CHUNK_BYTES = 1 << 23
+
+            def __init__(self, memmap_directory=None, initial_capacity=None):
+                """
+                :param memmap_directory: If set, fields with large elements, such as
+                visual observations, are stored in memory-mapped files created in this
+                directory instead of in memory.
+                :param initial_capacity: The number of elements the storage is first
+                allocated for. If None, INITIAL_CAPACITY is used.
+                """
                 self.padding_value = 0
-                super(Buffer.AgentBuffer.AgentBufferField, self).__init__()
+                self.memmap_directory = memmap_directory
+                self.initial_capacity = initial_capacity or self.INITIAL_CAPACITY
+                self._data = None
+                self._length = 0
 
             def __str__(self):
-                return str(np.array(self).shape)
+                return str(self._elements().shape)
+
+            def __len__(self):
+                return self._length
+
+            def __getitem__(self, index):
+                return self._elements()[index]
+
+            def __iter__(self):
+                return iter(self._elements())
+
+            def __array__(self, dtype=None):
+                if dtype is None:
+                    return self._elements()
+                return self._elements().astype(dtype, copy=False)
+
+            def _elements(self):
+                """
+                :return: A view on the elements of the field.
+                """
+                if self._data is None:
+                    return np.array([])
+                return self._data[: self._length]
+
+            def _allocate(self, capacity, shape, dtype):
+                """
+                Allocates the storage of the field, in a memory-mapped temporary file if
+                the elements are large and a memmap directory was given. The file is
+                removed by the system once the array is released.
+                """
+                element_bytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+                if (
+                    self.memmap_directory is not None
+                    and element_bytes >= self.MEMMAP_MIN_ELEMENT_BYTES
+                ):
+                    with tempfile.TemporaryFile(dir=self.memmap_directory) as f:
+                        return np.memmap(f, dtype, "w+", shape=(capacity,) + shape)
+                return np.empty((capacity,) + shape, dtype)
+
+            def _reserve(self, shape, dtype, count):
+                """
+                Makes room for count more elements, reallocating the storage if it is full
+                or if its dtype cannot hold the new elements.
+                :param shape: The shape of the new elements.
+                :param dtype: The dtype of the new elements.
+                :param count: The number of new elements.
+                """
+                if self._data is None or (
+                    self._length == 0 and shape != self._data.shape[1:]
+                ):
+                    capacity = max(count, self.initial_capacity)
+                    self._data = self._allocate(capacity, shape, dtype)
+                    return
+                if shape != self._data.shape[1:]:
+                    raise BufferException(
+                        "Unable to add elements of shape {0} to a field of elements "
+                        "of shape {1}".format(shape, self._data.shape[1:])
+                    )
+                dtype = np.promote_types(self._data.dtype, dtype)
+                capacity = len(self._data)
+                if self._length + count > capacity or dtype != self._data.dtype:
+                    while self._length + count > capacity:
+                        capacity *= 2
+                    data = self._allocate(capacity, shape, dtype)
+                    data[: self._length] = self._data[: self._length]
+                    self._data = data
 
             def append(self, element, padding_value=0):
                 """
@@ -44,7 +128,27 @@ class Buffer(dict):
                 :param element: The element to append to the list.
                 :param padding_value: The value used to pad when get_batch is called.
                 """
-                super(Buffer.AgentBuffer.AgentBufferField, self).append(element)
+                self.append_row(np.asarray(element), padding_value)
+
+            def append_row(self, row, padding_value=0):
+                """
+                Adds an element which is already a numpy array, such as a row of the
+                array of a batch, without converting it.
+                :param row: The np.array to append.
+                :param padding_value: The value used to pad when get_batch is called.
+                """
+                data = self._data
+                # Only check the storage when it cannot take the row as is.
+                if (
+                    data is None
+                    or self._length == len(data)
+                    or data.dtype != row.dtype
+                    or data.shape[1:] != row.shape
+                ):
+                    self._reserve(row.shape, row.dtype, 1)
+                    data = self._data
+                data[self._length] = row
+                self._length += 1
                 self.padding_value = padding_value
 
             def extend(self, data):
@@ -52,15 +156,42 @@ class Buffer(dict):
                 Adds a list of np.arrays to the end of the list of np.arrays.
                 :param data: The np.array list to append.
                 """
-                self += list(np.array(data))
+                data = np.asarray(data)
+                if len(data) == 0:
+                    return
+                self._reserve(data.shape[1:], data.dtype, len(data))
+                self._data[self._length : self._length + len(data)] = data
+                self._length += len(data)
 
             def set(self, data):
                 """
                 Sets the list of np.array to the input data
                 :param data: The np.array list to be set.
                 """
-                self[:] = []
-                self[:] = list(np.array(data))
+                self._length = 0
+                self.extend(data)
+
+            def reorder(self, indices):
+                """
+                Reorders the elements of the field with a single gather, keeping the
+                storage of the field.
+                :param indices: The index of the element to put at each position.
+                """
+                if self._data is None:
+                    return
+                if isinstance(self._data, np.memmap):
+                    # Gathering into a new file by chunks keeps the field out of memory.
+                    data = self._allocate(
+                        len(self._data), self._data.shape[1:], self._data.dtype
+                    )
+                    element_bytes = max(self._data[0].nbytes, 1)
+                    chunk = max(self.MEMMAP_CHUNK_BYTES // element_bytes, 1)
+                    for start in range(0, self._length, chunk):
+                        end = min(start + chunk, self._length)
+                        data[start:end] = self._data[indices[start:end]]
+                    self._data = data
+                else:
+                    self._data[: self._length] = self._elements()[indices]
 
             def get_batch(self, batch_size=None, training_length=1, sequential=True):
                 """
@@ -80,12 +211,12 @@ class Buffer(dict):
                     # not a list of sequences of elements.
                     if batch_size is None:
                         # If batch_size is None : All the elements of the AgentBufferField are returned.
-                        return np.array(self)
+                        return self._elements()
                     else:
                         # return the batch_size last elements
                         if batch_size > len(self):
                             raise BufferException("Batch size requested is too large")
-                        return np.array(self[-batch_size:])
+                        return self[-batch_size:]
                 else:
                     # The training_length is not None, the method returns a list of SEQUENCES of elements
                     if not sequential:
@@ -100,10 +231,16 @@ class Buffer(dict):
                                 "The batch size and training length requested for get_batch where"
                                 " too large given the current number of data points."
                             )
-                        tmp_list = []
-                        for end in range(len(self) - batch_size + 1, len(self) + 1):
-                            tmp_list += [np.array(self[end - training_length : end])]
-                        return np.array(tmp_list)
+                        # Overlapping windows on the last elements, without copying them.
+                        elements = self._elements()
+                        batch_size = max(batch_size, 0)
+                        first = len(self) - batch_size - training_length + 1
+                        return np.lib.stride_tricks.as_strided(
+                            elements[max(first, 0) :],
+                            shape=(batch_size, training_length) + elements.shape[1:],
+                            strides=elements.strides[:1] + elements.strides,
+                            writeable=False,
+                        )
                     if sequential:
                         # The sequences will not have overlapping elements (this involves padding)
                         leftover = len(self) % training_length
@@ -122,32 +259,47 @@ class Buffer(dict):
                                 "The batch size and training length requested for get_batch where"
                                 " too large given the current number of data points."
                             )
-                        tmp_list = []
+                        # The complete sequences are the last elements, reshaped.
+                        elements = self._elements()
+                        num_complete = min(batch_size, len(self) // training_length)
+                        sequences = elements[
+                            len(self) - num_complete * training_length :
+                        ].reshape((num_complete, training_length) + elements.shape[1:])
+                        if num_complete == batch_size:
+                            return sequences
+                        # The first sequence is completed by padding at the front. The
+                        # padding is the last element multiplied by the padding value.
                         padding = np.array(self[-1]) * self.padding_value
-                        # The padding is made with zeros and its shape is given by the shape of the last element
-                        for end in range(
-                            len(self), len(self) % training_length, -training_length
-                        )[:batch_size]:
-                            tmp_list += [np.array(self[end - training_length : end])]
-                        if (leftover != 0) and (len(tmp_list) < batch_size):
-                            tmp_list += [
-                                np.array(
-                                    [padding] * (training_length - leftover)
-                                    + self[:leftover]
-                                )
+                        first_sequence = np.concatenate(
+                            [
+                                np.repeat(
+                                    padding[np.newaxis],
+                                    training_length - leftover,
+                                    axis=0,
+                                ),
+                                elements[:leftover],
                             ]
-                        tmp_list.reverse()
-                        return np.array(tmp_list)
+                        )
+                        return np.concatenate([first_sequence[np.newaxis], sequences])
 
             def reset_field(self):
                 """
-                Resets the AgentBufferField
+                Resets the AgentBufferField. The storage is kept to be reused by the
+                next elements.
                 """
-                self[:] = []
+                self._length = 0
 
-        def __init__(self):
+        def __init__(self, memmap_directory=None, initial_capacity=None):
+            """
+            :param memmap_directory: If set, the fields with large elements are stored
+            in memory-mapped files created in this directory.
+            :param initial_capacity: The number of elements the storage of each field
+            is first allocated for.
+            """
             self.last_brain_info = None
             self.last_take_action_outputs = None
+            self.memmap_directory = memmap_directory
+            self.initial_capacity = initial_capacity
             super(Buffer.AgentBuffer, self).__init__()
 
         def __str__(self):
@@ -165,8 +317,10 @@ class Buffer(dict):
             self.last_take_action_outputs = None
 
         def __getitem__(self, key):
-            if key not in self.keys():
-                self[key] = self.AgentBufferField()
+            if key not in self:
+                self[key] = self.AgentBufferField(
+                    self.memmap_directory, self.initial_capacity
+                )
             return super(Buffer.AgentBuffer, self).__getitem__(key)
 
         def check_length(self, key_list):
@@ -200,25 +354,35 @@ class Buffer(dict):
                 raise BufferException(
                     "Unable to shuffle if the fields are not of same length"
                 )
-            s = np.arange(len(self[key_list[0]]))
-            np.random.shuffle(s)
+            s = np.random.permutation(len(self[key_list[0]]))
             for key in key_list:
-                self[key][:] = [self[key][i] for i in s]
+                self[key].reorder(s)
 
         def make_mini_batch(self, start, end):
             """
-            Creates a mini-batch from buffer.
+            Creates a mini-batch from buffer. The arrays of the mini-batch are views
+            on the buffer, which are only valid until it is modified.
             :param start: Starting index of buffer.
             :param end: Ending index of buffer.
             :return: Dict of mini batch.
             """
             mini_batch = {}
             for key in self:
-                mini_batch[key] = np.array(self[key][start:end])
+                mini_batch[key] = self[key][start:end]
             return mini_batch
 
-    def __init__(self):
-        self.update_buffer = self.AgentBuffer()
+    def __init__(self, update_buffer_directory=None, local_buffer_capacity=None):
+        """
+        :param update_buffer_directory: If set, the fields of the update buffer with
+        large elements, such as visual observations, are stored in memory-mapped files
+        created in this directory, and paged from disk instead of held in memory.
+        :param local_buffer_capacity: The number of elements the fields of the local
+        buffers are first allocated for, usually the time horizon of the trainer.
+        """
+        self.update_buffer = self.AgentBuffer(update_buffer_directory)
+        self.local_buffer_capacity = local_buffer_capacity
+        # Released local buffers, whose storage is reused by the next new agents.
+        self._free_local_buffers = []
         super(Buffer, self).__init__()
 
     def __str__(self):
@@ -231,22 +395,68 @@ class Buffer(dict):
 
     def __getitem__(self, key):
         if key not in self.keys():
-            self[key] = self.AgentBuffer()
+            if self._free_local_buffers:
+                self[key] = self._free_local_buffers.pop()
+            else:
+                self[key] = self.AgentBuffer(
+                    initial_capacity=self.local_buffer_capacity
+                )
         return super(Buffer, self).__getitem__(key)
 
+    def release_agent(self, agent_id):
+        """
+        Removes the local buffer of an agent which is done, and keeps it to be
+        reused by the next new agent. The memory used by the local buffers then
+        only depends on the number of agents alive at the same time.
+        :param agent_id: The id of the agent which buffer is released.
+        """
+        agent_buffer = self.pop(agent_id, None)
+        if agent_buffer is not None:
+            agent_buffer.reset_agent()
+            self._free_local_buffers.append(agent_buffer)
+
     def reset_update_buffer(self):
         """
         Resets the update buffer
         """
         self.update_buffer.reset_agent()
 
+    def take_update_buffer(self):
+        """
+        Takes the update buffer, e.g. to update the model from it in the background,
+        and replaces it with an empty one in which the next experiences are collected.
+        :return: The AgentBuffer holding the experiences collected so far.
+        """
+        update_buffer = self.update_buffer
+        self.update_buffer = self.AgentBuffer(update_buffer.memmap_directory)
+        return update_buffer
+
+    def append_batch(self, agent_ids, batch, padding_values=None):
+        """
+        Appends one element to fields of the local buffers of several agents, e.g.
+        the experiences of all agents at one step.
+        :param agent_ids: The ids of the agents, one for each row of the arrays.
+        :param batch: Dict from the name of each field to an array of the elements,
+        one row per agent.
+        :param padding_values: Optional dict from field name to the padding value of
+        the field, which is 0 by default.
+        """
+        agent_buffers = [self[agent_id] for agent_id in agent_ids]
+        padding_values = padding_values or {}
+        for key, rows in batch.items():
+            rows = np.asarray(rows)
+            padding_value = padding_values.get(key, 0)
+            for agent_buffer, row in zip(agent_buffers, rows):
+                agent_buffer[key].append_row(row, padding_value)
+
     def reset_local_buffers(self):
         """
-        Resets all the local local_buffers
+        Resets all the local local_buffers, releasing them to be reused by the
+        next agents.
         """
         agent_ids = list(self.keys())
         for k in agent_ids:
-            self[k].reset_agent()
+            self.release_agent(k)
 
     def append_update_buffer(
         self, agent_id, key_list=None, batch_size=None, training_length=None
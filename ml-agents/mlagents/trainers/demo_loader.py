@@ -40,22 +40,24 @@ def make_demo_buffer(brain_infos, brain_params, sequence_length):
     return demo_buffer
 
 
-def demo_to_buffer(file_path, sequence_length):
+def demo_to_buffer(file_path, sequence_length, uint8_visual=False):
     """
     Loads demonstration file and uses it to fill training buffer.
     :param file_path: Location of demonstration file (.demo).
     :param sequence_length: Length of trajectories to fill buffer.
+    :param uint8_visual: Whether to keep visual observations as uint8.
     :return:
     """
-    brain_params, brain_infos, _ = load_demonstration(file_path)
+    brain_params, brain_infos, _ = load_demonstration(file_path, uint8_visual)
     demo_buffer = make_demo_buffer(brain_infos, brain_params, sequence_length)
     return brain_params, demo_buffer
 
 
-def load_demonstration(file_path):
+def load_demonstration(file_path, uint8_visual=False):
     """
     Loads and parses a demonstration file.
     :param file_path: Location of demonstration file (.demo).
+    :param uint8_visual: Whether to keep visual observations as uint8.
     :return: BrainParameter and list of BrainInfos containing demonstration data.
     """
 
@@ -93,7 +95,9 @@ def load_demonstration(file_path):
         if obs_decoded > 1:
             agent_info = AgentInfoProto()
             agent_info.ParseFromString(data[pos : pos + next_pos])
-            brain_info = BrainInfo.from_agent_proto([agent_info], brain_params)
+            brain_info = BrainInfo.from_agent_proto(
+                [agent_info], brain_params, uint8_visual=uint8_visual
+            )
             brain_infos.append(brain_info)
             if len(brain_infos) == total_expected:
                 break
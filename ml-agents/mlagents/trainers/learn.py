@@ -9,7 +9,7 @@ import shutil
 import numpy as np
 import yaml
 from docopt import docopt
-from typing import Optional, Callable
+from typing import Optional, Callable, List
 
 
 from mlagents.trainers.trainer_controller import TrainerController
@@ -51,6 +51,12 @@ def run_training(sub_id: int, run_seed: int, run_options, process_queue):
     lesson = int(run_options["--lesson"])
     fast_simulation = not bool(run_options["--slow"])
     no_graphics = run_options["--no-graphics"]
+    uint8_visual = run_options["--uint8-visual"]
+    use_shared_memory = run_options["--shared-memory"]
+    min_ready_envs = int(run_options["--min-ready-envs"])
+    async_update = run_options["--async-update"]
+    max_update_staleness = int(run_options["--max-update-staleness"])
+    cpu_affinity = run_options["--cpu-affinity"]
     trainer_config_path = run_options["<trainer-config-path>"]
     # Recognize and use docker volume if one is passed as an argument
     if not docker_target_name:
@@ -74,14 +80,27 @@ def run_training(sub_id: int, run_seed: int, run_options, process_queue):
         )
 
     trainer_config = load_config(trainer_config_path)
+    worker_cpus = None
+    if cpu_affinity:
+        run_cpus = apply_cpu_affinity(sub_id, int(run_options["--num-runs"]))
+        if run_cpus is not None:
+            # Size the thread pools of TensorFlow by the cores of the run, rather
+            # than by all the cores of the machine.
+            trainer_config["default"].setdefault("intra_op_threads", len(run_cpus))
+            trainer_config["default"].setdefault("inter_op_threads", len(run_cpus))
+            worker_cpus = split_cpus(run_cpus, num_envs)
     env_factory = create_environment_factory(
         env_path,
         docker_target_name,
         no_graphics,
         run_seed,
         base_port + (sub_id * num_envs),
+        uint8_visual,
+        worker_cpus,
+    )
+    env = SubprocessUnityEnvironment(
+        env_factory, num_envs, use_shared_memory=use_shared_memory
     )
-    env = SubprocessUnityEnvironment(env_factory, num_envs)
     maybe_meta_curriculum = try_create_meta_curriculum(curriculum_folder, env)
 
     # Create controller and begin training.
@@ -98,6 +117,10 @@ def run_training(sub_id: int, run_seed: int, run_options, process_queue):
         env.external_brains,
         run_seed,
         fast_simulation,
+        uint8_visual,
+        min_ready_envs,
+        async_update,
+        max_update_staleness,
     )
 
     # Signal that environment has been launched.
@@ -167,12 +190,50 @@ def load_config(trainer_config_path):
         )
 
 
+def split_cpus(cpus: List[int], n: int) -> List[List[int]]:
+    """
+    Divides CPU cores into n contiguous groups of nearly equal sizes. If there
+    are fewer cores than groups, each group gets one core, shared round-robin.
+    :param cpus: The ids of the cores.
+    :param n: The number of groups.
+    :return: The ids of the cores of each group.
+    """
+    cpus = sorted(cpus)
+    if len(cpus) < n:
+        return [[cpus[i % len(cpus)]] for i in range(n)]
+    return [cpus[i * len(cpus) // n : (i + 1) * len(cpus) // n] for i in range(n)]
+
+
+def apply_cpu_affinity(sub_id: int, num_runs: int) -> Optional[List[int]]:
+    """
+    Restricts the current training session to its share of the cores available to
+    the process, when the cores are divided across the concurrent sessions.
+    :param sub_id: Unique id for training session.
+    :param num_runs: Number of concurrent training sessions.
+    :return: The ids of the cores of the session, or None if the platform does not
+    support CPU affinity.
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        logging.getLogger("mlagents.trainers").warning(
+            "CPU affinity is not supported on this platform and will be ignored."
+        )
+        return None
+    run_cpus = split_cpus(list(os.sched_getaffinity(0)), num_runs)[sub_id]
+    os.sched_setaffinity(0, run_cpus)
+    logging.getLogger("mlagents.trainers").info(
+        "Training session {} runs on CPU cores {}.".format(sub_id, run_cpus)
+    )
+    return run_cpus
+
+
 def create_environment_factory(
     env_path: str,
     docker_target_name: str,
     no_graphics: bool,
     seed: Optional[int],
     start_port: int,
+    uint8_visual: bool = False,
+    worker_cpus: Optional[List[List[int]]] = None,
 ) -> Callable[[int], BaseUnityEnvironment]:
     if env_path is not None:
         # Strip out executable extensions if passed
@@ -198,6 +259,9 @@ def create_environment_factory(
     seed_pool = [np.random.randint(0, seed_count) for _ in range(seed_count)]
 
     def create_unity_environment(worker_id: int) -> UnityEnvironment:
+        if worker_cpus is not None:
+            # The Unity process inherits the affinity of its worker.
+            os.sched_setaffinity(0, worker_cpus[worker_id % len(worker_cpus)])
         env_seed = seed
         if not env_seed:
             env_seed = seed_pool[worker_id % len(seed_pool)]
@@ -208,6 +272,7 @@ def create_environment_factory(
             docker_training=docker_training,
             no_graphics=no_graphics,
             base_port=start_port,
+            uint8_visual=uint8_visual,
         )
 
     return create_unity_environment
@@ -257,6 +322,12 @@ def main():
       --num-envs=<n>             Number of parallel environments to use for training [default: 1]
       --docker-target-name=<dt>  Docker volume to store training-specific files [default: None].
       --no-graphics              Whether to run the environment in no-graphics mode [default: False].
+      --uint8-visual             Whether to keep visual observations as uint8 pixels [default: False].
+      --shared-memory            Whether environments send observations through shared memory [default: False].
+      --min-ready-envs=<n>       Number of environments to wait for at each step, 0 to wait for all of them [default: 0].
+      --async-update             Whether to update the policies in the background while the environments keep stepping [default: False].
+      --max-update-staleness=<n> Number of steps after which to wait for a background update, 0 to never wait [default: 0].
+      --cpu-affinity             Whether to divide the CPU cores across the training sessions and their environments [default: False].
       --debug                    Whether to run ML-Agents in debug mode with detailed logging [default: False].
     """
 
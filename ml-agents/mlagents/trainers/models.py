@@ -10,9 +10,12 @@ logger = logging.getLogger("mlagents.trainers")
 class LearningModel(object):
     _version_number_ = 2
 
-    def __init__(self, m_size, normalize, use_recurrent, brain, seed):
+    def __init__(
+        self, m_size, normalize, use_recurrent, brain, seed, uint8_visual=False
+    ):
         tf.set_random_seed(seed)
         self.brain = brain
+        self.uint8_visual = uint8_visual
         self.vector_in = None
         self.global_step, self.increment_step = self.create_global_steps()
         self.visual_in = []
@@ -76,11 +79,12 @@ class LearningModel(object):
         return tf.multiply(input_activation, tf.nn.sigmoid(input_activation))
 
     @staticmethod
-    def create_visual_input(camera_parameters, name):
+    def create_visual_input(camera_parameters, name, uint8_visual=False):
         """
         Creates image input op.
         :param camera_parameters: Parameters for visual observation from BrainInfo.
         :param name: Desired name of input op.
+        :param uint8_visual: Whether the input is fed as uint8 pixels in [0, 255].
         :return: input op.
         """
         o_size_h = camera_parameters["height"]
@@ -93,7 +97,9 @@ class LearningModel(object):
             c_channels = 3
 
         visual_in = tf.placeholder(
-            shape=[None, o_size_h, o_size_w, c_channels], dtype=tf.float32, name=name
+            shape=[None, o_size_h, o_size_w, c_channels],
+            dtype=tf.uint8 if uint8_visual else tf.float32,
+            name=name,
         )
         return visual_in
 
@@ -191,6 +197,8 @@ class LearningModel(object):
         :param num_layers: number of hidden layers to create.
         :return: List of hidden layer tensors.
         """
+        if image_input.dtype == tf.uint8:
+            image_input = tf.cast(image_input, tf.float32) / 255.0
         with tf.variable_scope(scope):
             conv1 = tf.layers.conv2d(
                 image_input,
@@ -276,7 +284,9 @@ class LearningModel(object):
         self.visual_in = []
         for i in range(brain.number_visual_observations):
             visual_input = self.create_visual_input(
-                brain.camera_resolutions[i], name="visual_observation_" + str(i)
+                brain.camera_resolutions[i],
+                name="visual_observation_" + str(i),
+                uint8_visual=self.uint8_visual,
             )
             self.visual_in.append(visual_input)
         vector_observation_input = self.create_vector_input()
@@ -1,8 +1,13 @@
+import glob
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import tensorflow as tf
 
 from mlagents.trainers import ActionInfo, UnityException
+from mlagents.trainers.prefetch import prefetch
 from tensorflow.python.tools import freeze_graph
 from mlagents.trainers import tensorflow_to_barracuda as tf2bc
 from mlagents.envs import BrainInfo
@@ -49,15 +54,38 @@ class Policy(object):
         self.sequence_length = 1
         self.seed = seed
         self.brain = brain
+        self.trainer_parameters = trainer_parameters
         self.use_recurrent = trainer_parameters["use_recurrent"]
         self.use_continuous_act = brain.vector_action_space_type == "continuous"
         self.model_path = trainer_parameters["model_path"]
         self.keep_checkpoints = trainer_parameters.get("keep_checkpoints", 5)
+        self.uint8_visual = trainer_parameters.get("uint8_visual", False)
         self.graph = tf.Graph()
         config = tf.ConfigProto()
         config.gpu_options.allow_growth = True
+        # 0 lets TensorFlow size its thread pools by the cores of the machine.
+        config.intra_op_parallelism_threads = int(
+            trainer_parameters.get("intra_op_threads", 0)
+        )
+        config.inter_op_parallelism_threads = int(
+            trainer_parameters.get("inter_op_threads", 0)
+        )
         self.sess = tf.Session(config=config, graph=self.graph)
         self.saver = None
+        # The step of the model is counted in Python, and only written to its
+        # global_step variable when the model is saved.
+        self._step = 0
+        # Checkpoints written by the background thread of save_model, oldest first.
+        self._checkpoint_writer = None
+        self._pending_save = None
+        self._checkpoints = []
+        self._graph_written = False
+        # Values of the trainable variables and of the normalizer fed to the
+        # inference of the policy while an update of the variables runs in the
+        # background, and the vector observations and steps of the updates of the
+        # normalizer deferred until the update is done.
+        self._inference_weights = None
+        self._deferred_normalizer_updates = []
         if self.use_recurrent:
             self.m_size = trainer_parameters["memory_size"]
             self.sequence_length = trainer_parameters["sequence_length"]
@@ -79,6 +107,7 @@ class Policy(object):
             self.saver = tf.train.Saver(max_to_keep=self.keep_checkpoints)
             init = tf.global_variables_initializer()
             self.sess.run(init)
+        self._read_counters()
 
     def _load_graph(self):
         with self.graph.as_default():
@@ -92,6 +121,29 @@ class Policy(object):
                     "--run-id".format(self.model_path)
                 )
             self.saver.restore(self.sess, ckpt.model_checkpoint_path)
+        self._read_counters()
+
+    def _read_counters(self):
+        """
+        Reads the counters kept in Python, such as the step, from the variables of
+        the model, e.g. once it is loaded.
+        """
+        self._step = int(self.sess.run(self.model.global_step))
+
+    def _write_counters(self):
+        """
+        Writes the counters kept in Python to the variables of the model, so that
+        they are saved with it.
+        """
+        self.model.global_step.load(self._step, self.sess)
+
+    def _create_model(self, uint8_visual):
+        """
+        Builds the model of the policy in the default graph.
+        :param uint8_visual: Whether visual observations are fed as uint8 pixels.
+        :return: The model.
+        """
+        raise UnityPolicyException("The _create_model function was not implemented.")
 
     def evaluate(self, brain_info: BrainInfo):
         """
@@ -127,7 +179,68 @@ class Policy(object):
         :param mini_batch: Batch of experiences.
         :return: Results of update.
         """
-        raise UnityPolicyException("The update function was not implemented.")
+        return self.update_with_feed_dict(
+            self.make_update_feed_dict(mini_batch, num_sequences)
+        )
+
+    def make_update_feed_dict(self, mini_batch, num_sequences):
+        """
+        Makes the feed dict of an update of the policy.
+        :param num_sequences: Number of experience trajectories in batch.
+        :param mini_batch: Batch of experiences.
+        :return: Dict from the nodes of the model to the data fed to them.
+        """
+        raise UnityPolicyException(
+            "The make_update_feed_dict function was not implemented."
+        )
+
+    def update_with_feed_dict(self, feed_dict):
+        """
+        Performs update of the policy.
+        :param feed_dict: Feed dict made by make_update_feed_dict.
+        :return: Results of update.
+        """
+        return self._execute_model(feed_dict, self.update_dict)
+
+    def get_update_feed_dicts(
+        self, update_buffer, num_sequences, num_batches, prefetch_count=0
+    ):
+        """
+        Makes the feed dicts of the updates with consecutive mini-batches of a buffer.
+        :param update_buffer: The AgentBuffer of the experiences.
+        :param num_sequences: Number of experience trajectories in each mini-batch.
+        :param num_batches: Number of mini-batches, from the start of the buffer.
+        :param prefetch_count: If positive, the feed dicts are made on a background
+        thread, up to this many ahead of the update which uses them. The buffer must
+        then not be modified until they are all used.
+        :return: An iterator of the feed dicts.
+        """
+        feed_dicts = (
+            self.make_update_feed_dict(
+                update_buffer.make_mini_batch(
+                    i * num_sequences, (i + 1) * num_sequences
+                ),
+                num_sequences,
+            )
+            for i in range(num_batches)
+        )
+        if prefetch_count > 0:
+            feed_dicts = prefetch(
+                (self._as_feed_arrays(feed_dict) for feed_dict in feed_dicts),
+                prefetch_count,
+            )
+        return feed_dicts
+
+    @staticmethod
+    def _as_feed_arrays(feed_dict):
+        """
+        Converts the data of a feed dict to arrays of the dtypes of their nodes, as
+        the session would when running the model.
+        """
+        return {
+            node: np.asarray(value, dtype=node.dtype.as_numpy_dtype)
+            for node, value in feed_dict.items()
+        }
 
     def _execute_model(self, feed_dict, out_dict):
         """
@@ -136,11 +249,66 @@ class Policy(object):
         :param out_dict: Output dictionary mapping names to nodes.
         :return: Dictionary mapping names to input data.
         """
+        feed_dict[self.model.global_step] = self._step
         network_out = self.sess.run(list(out_dict.values()), feed_dict=feed_dict)
         run_out = dict(zip(list(out_dict.keys()), network_out))
         return run_out
 
+    def freeze_inference_weights(self):
+        """
+        Takes a snapshot of the trainable variables of the model and of its
+        normalizer, which the inference of the policy uses instead of the variables
+        until release_inference_weights, e.g. while the variables are updated in the
+        background. The updates of the normalizer are deferred meanwhile, see
+        defer_normalizer_update.
+        """
+        with self.graph.as_default():
+            variables = tf.trainable_variables()
+        if self.model.normalize:
+            variables += [self.model.running_mean, self.model.running_variance]
+        self._inference_weights = dict(zip(variables, self.sess.run(variables)))
+
+    @property
+    def inference_weights_frozen(self):
+        """
+        :return: Whether the inference uses the snapshot of freeze_inference_weights.
+        """
+        return self._inference_weights is not None
+
+    def defer_normalizer_update(self, vector_obs):
+        """
+        Records an update of the normalizer with vector observations, to apply it
+        in release_inference_weights, so that the normalizer does not change while
+        the variables are updated in the background.
+        :param vector_obs: The vector observations of the update.
+        """
+        self._deferred_normalizer_updates.append((vector_obs, self._step))
+
+    def release_inference_weights(self):
+        """
+        Makes the inference of the policy use the variables of the model again, and
+        applies the updates of the normalizer deferred meanwhile, in order.
+        """
+        self._inference_weights = None
+        deferred_updates = self._deferred_normalizer_updates
+        self._deferred_normalizer_updates = []
+        for vector_obs, step in deferred_updates:
+            self.sess.run(
+                [self.model.update_mean, self.model.update_variance],
+                feed_dict={
+                    self.model.vector_in: vector_obs,
+                    self.model.global_step: step,
+                },
+            )
+
+    def _fill_inference_weights(self, feed_dict):
+        inference_weights = self._inference_weights
+        if inference_weights is not None:
+            feed_dict.update(inference_weights)
+        return feed_dict
+
     def _fill_eval_dict(self, feed_dict, brain_info):
+        self._fill_inference_weights(feed_dict)
         for i, _ in enumerate(brain_info.visual_observations):
             feed_dict[self.model.visual_in[i]] = brain_info.visual_observations[i]
         if self.use_vec_obs:
@@ -162,14 +330,13 @@ class Policy(object):
         Gets current model step.
         :return: current model step.
         """
-        step = self.sess.run(self.model.global_step)
-        return step
+        return self._step
 
     def increment_step(self):
         """
         Increments model step.
         """
-        self.sess.run(self.model.increment_step)
+        self._step += 1
 
     def get_inference_vars(self):
         """
@@ -185,27 +352,77 @@ class Policy(object):
 
     def save_model(self, steps):
         """
-        Saves the model
+        Saves the model. Its variables are copied in memory, and written to a
+        checkpoint by a background thread, see wait_for_saves.
         :param steps: The number of steps the model was trained for
         :return:
         """
+        # Only one snapshot of the variables waits to be written at a time.
+        self.wait_for_saves()
+        self._write_counters()
         with self.graph.as_default():
-            last_checkpoint = self.model_path + "/model-" + str(steps) + ".cptk"
-            self.saver.save(self.sess, last_checkpoint)
+            variables = tf.global_variables()
+        snapshot = dict(zip(variables, self.sess.run(variables)))
+        last_checkpoint = self.model_path + "/model-" + str(steps) + ".cptk"
+        if self._checkpoint_writer is None:
+            self._checkpoint_writer = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="checkpoint"
+            )
+        self._pending_save = self._checkpoint_writer.submit(
+            self._write_checkpoint, last_checkpoint, snapshot
+        )
+
+    def wait_for_saves(self):
+        """
+        Waits for the checkpoint of the last save_model to be written, and raises the
+        errors of writing it.
+        """
+        if self._pending_save is not None:
+            pending_save, self._pending_save = self._pending_save, None
+            pending_save.result()
+
+    def _write_checkpoint(self, checkpoint_path, snapshot):
+        """
+        Writes a checkpoint of the variables of the model, and removes the oldest
+        ones beyond keep_checkpoints. Runs on the checkpoint writer thread.
+        :param checkpoint_path: The path prefix of the checkpoint.
+        :param snapshot: Dict from the variables saved by the saver to their values.
+        """
+        # The saver runs with the snapshot fed in place of the variables, which may
+        # have been updated since.
+        feed_dict = dict(snapshot)
+        feed_dict[self.saver.saver_def.filename_tensor_name] = checkpoint_path
+        self.sess.run(self.saver.saver_def.save_tensor_name, feed_dict)
+        if not self._graph_written:
+            # The graph does not change once the model is built.
             tf.train.write_graph(
                 self.graph, self.model_path, "raw_graph_def.pb", as_text=False
             )
+            self._graph_written = True
+        if checkpoint_path in self._checkpoints:
+            self._checkpoints.remove(checkpoint_path)
+        self._checkpoints.append(checkpoint_path)
+        if self.keep_checkpoints > 0:
+            while len(self._checkpoints) > self.keep_checkpoints:
+                for checkpoint_file in glob.glob(self._checkpoints.pop(0) + ".*"):
+                    os.remove(checkpoint_file)
+        tf.train.update_checkpoint_state(
+            self.model_path, checkpoint_path, self._checkpoints
+        )
 
     def export_model(self):
         """
         Exports latest saved model to .nn format for Unity embedding.
         """
-
+        self.wait_for_saves()
         with self.graph.as_default():
             target_nodes = ",".join(self._process_graph())
-            ckpt = tf.train.get_checkpoint_state(self.model_path)
+        input_graph = self._write_export_graph()
+        ckpt = tf.train.get_checkpoint_state(self.model_path)
+        # freeze_graph imports the graph into the default graph.
+        with tf.Graph().as_default():
             freeze_graph.freeze_graph(
-                input_graph=self.model_path + "/raw_graph_def.pb",
+                input_graph=input_graph,
                 input_binary=True,
                 input_checkpoint=ckpt.model_checkpoint_path,
                 output_node_names=target_nodes,
@@ -220,6 +437,25 @@ class Policy(object):
         tf2bc.convert(self.model_path + "/frozen_graph_def.pb", self.model_path + ".nn")
         logger.info("Exported " + self.model_path + ".nn file")
 
+    def _write_export_graph(self):
+        """
+        Gets the graph to freeze into the exported model. Unity feeds visual
+        observations as floats in [0, 1], so a model trained with uint8 visual
+        observations is rebuilt with float visual inputs, which the variables of its
+        checkpoints are restored into.
+        :return: The path of the graph.
+        """
+        if not (self.uint8_visual and self.use_vis_obs):
+            return self.model_path + "/raw_graph_def.pb"
+        export_graph = tf.Graph()
+        with export_graph.as_default():
+            self._create_model(uint8_visual=False)
+            tf.train.Saver()
+        tf.train.write_graph(
+            export_graph, self.model_path, "export_graph_def.pb", as_text=False
+        )
+        return self.model_path + "/export_graph_def.pb"
+
     def _process_graph(self):
         """
         Gets the list of the output nodes present in the graph for inference
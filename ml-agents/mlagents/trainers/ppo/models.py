@@ -24,6 +24,7 @@ class PPOModel(LearningModel):
         curiosity_strength=0.01,
         curiosity_enc_size=128,
         seed=0,
+        uint8_visual=False,
     ):
         """
         Takes a Unity environment and model-specific hyper-parameters and returns the
@@ -39,8 +40,11 @@ class PPOModel(LearningModel):
         :param use_recurrent: Whether to use an LSTM layer in the network.
         :param num_layers Number of hidden layers between encoded input and policy & value layers
         :param m_size: Size of brain memory.
+        :param uint8_visual: Whether visual observations are fed as uint8 pixels.
         """
-        LearningModel.__init__(self, m_size, normalize, use_recurrent, brain, seed)
+        LearningModel.__init__(
+            self, m_size, normalize, use_recurrent, brain, seed, uint8_visual
+        )
         self.use_curiosity = use_curiosity
         if num_layers < 1:
             num_layers = 1
@@ -98,6 +102,7 @@ class PPOModel(LearningModel):
                 next_visual_input = self.create_visual_input(
                     self.brain.camera_resolutions[i],
                     name="next_visual_observation_" + str(i),
+                    uint8_visual=self.uint8_visual,
                 )
                 self.next_visual_in.append(next_visual_input)
 
@@ -20,24 +20,14 @@ class PPOPolicy(Policy):
         super().__init__(seed, brain, trainer_params)
         self.has_updated = False
         self.use_curiosity = bool(trainer_params["use_curiosity"])
+        self._last_reward = 0.0
+        # Generator of the exploration noise of continuous actions. The policy has its
+        # own so that the policies of several brains can be evaluated concurrently
+        # and still reproducibly.
+        self.random_state = np.random.RandomState(np.random.randint(2 ** 31))
 
         with self.graph.as_default():
-            self.model = PPOModel(
-                brain,
-                lr=float(trainer_params["learning_rate"]),
-                h_size=int(trainer_params["hidden_units"]),
-                epsilon=float(trainer_params["epsilon"]),
-                beta=float(trainer_params["beta"]),
-                max_step=float(trainer_params["max_steps"]),
-                normalize=trainer_params["normalize"],
-                use_recurrent=trainer_params["use_recurrent"],
-                num_layers=int(trainer_params["num_layers"]),
-                m_size=self.m_size,
-                use_curiosity=bool(trainer_params["use_curiosity"]),
-                curiosity_strength=float(trainer_params["curiosity_strength"]),
-                curiosity_enc_size=float(trainer_params["curiosity_enc_size"]),
-                seed=seed,
-            )
+            self.model = self._create_model(self.uint8_visual)
 
         if load:
             self._load_graph()
@@ -68,6 +58,31 @@ class PPOPolicy(Policy):
             self.update_dict["forward_loss"] = self.model.forward_loss
             self.update_dict["inverse_loss"] = self.model.inverse_loss
 
+    def _create_model(self, uint8_visual):
+        """
+        Builds the PPO model of the policy in the default graph.
+        :param uint8_visual: Whether visual observations are fed as uint8 pixels.
+        :return: The PPOModel.
+        """
+        trainer_params = self.trainer_parameters
+        return PPOModel(
+            self.brain,
+            lr=float(trainer_params["learning_rate"]),
+            h_size=int(trainer_params["hidden_units"]),
+            epsilon=float(trainer_params["epsilon"]),
+            beta=float(trainer_params["beta"]),
+            max_step=float(trainer_params["max_steps"]),
+            normalize=trainer_params["normalize"],
+            use_recurrent=trainer_params["use_recurrent"],
+            num_layers=int(trainer_params["num_layers"]),
+            m_size=self.m_size,
+            use_curiosity=bool(trainer_params["use_curiosity"]),
+            curiosity_strength=float(trainer_params["curiosity_strength"]),
+            curiosity_enc_size=float(trainer_params["curiosity_enc_size"]),
+            seed=self.seed,
+            uint8_visual=uint8_visual,
+        )
+
     def evaluate(self, brain_info):
         """
         Evaluates policy for the agent experiences provided.
@@ -90,22 +105,31 @@ class PPOPolicy(Policy):
                 brain_info.memories = self.make_empty_memory(len(brain_info.agents))
             feed_dict[self.model.memory_in] = brain_info.memories
         if self.use_continuous_act:
-            epsilon = np.random.normal(
+            epsilon = self.random_state.normal(
                 size=(len(brain_info.vector_observations), self.model.act_size[0])
             )
             feed_dict[self.model.epsilon] = epsilon
         feed_dict = self._fill_eval_dict(feed_dict, brain_info)
-        run_out = self._execute_model(feed_dict, self.inference_dict)
+        inference_dict = self.inference_dict
+        if self.inference_weights_frozen and "update_mean" in inference_dict:
+            # The normalizer is read by the update running in the background.
+            self.defer_normalizer_update(brain_info.vector_observations)
+            inference_dict = {
+                key: node
+                for key, node in inference_dict.items()
+                if key not in ("update_mean", "update_variance")
+            }
+        run_out = self._execute_model(feed_dict, inference_dict)
         if self.use_continuous_act:
             run_out["random_normal_epsilon"] = epsilon
         return run_out
 
-    def update(self, mini_batch, num_sequences):
+    def make_update_feed_dict(self, mini_batch, num_sequences):
         """
-        Updates model using buffer.
+        Makes the feed dict of an update of the model.
         :param num_sequences: Number of trajectories in batch.
         :param mini_batch: Experience batch.
-        :return: Output from update process.
+        :return: Feed dict of the update.
         """
         feed_dict = {
             self.model.batch_size: num_sequences,
@@ -165,9 +189,16 @@ class PPOPolicy(Policy):
         if self.use_recurrent:
             mem_in = mini_batch["memory"][:, 0, :]
             feed_dict[self.model.memory_in] = mem_in
+        return feed_dict
+
+    def update_with_feed_dict(self, feed_dict):
+        """
+        Updates model.
+        :param feed_dict: Feed dict made by make_update_feed_dict.
+        :return: Output from update process.
+        """
         self.has_updated = True
-        run_out = self._execute_model(feed_dict, self.update_dict)
-        return run_out
+        return super(PPOPolicy, self).update_with_feed_dict(feed_dict)
 
     def get_intrinsic_rewards(self, curr_info, next_info):
         """
@@ -183,6 +214,7 @@ class PPOPolicy(Policy):
             feed_dict = {
                 self.model.batch_size: len(next_info.vector_observations),
                 self.model.sequence_length: 1,
+                self.model.global_step: self._step,
             }
             if self.use_continuous_act:
                 feed_dict[
@@ -202,6 +234,7 @@ class PPOPolicy(Policy):
                 if curr_info.memories.shape[1] == 0:
                     curr_info.memories = self.make_empty_memory(len(curr_info.agents))
                 feed_dict[self.model.memory_in] = curr_info.memories
+            self._fill_inference_weights(feed_dict)
             intrinsic_rewards = self.sess.run(
                 self.model.intrinsic_reward, feed_dict=feed_dict
             ) * float(self.has_updated)
@@ -216,36 +249,73 @@ class PPOPolicy(Policy):
         :param idx: Index in BrainInfo of agent.
         :return: Value estimate.
         """
-        feed_dict = {self.model.batch_size: 1, self.model.sequence_length: 1}
-        for i in range(len(brain_info.visual_observations)):
-            feed_dict[self.model.visual_in[i]] = [
-                brain_info.visual_observations[i][idx]
-            ]
+        return self.get_value_estimates([(brain_info, idx)])[0]
+
+    def get_value_estimates(self, bootstrap_requests):
+        """
+        Generates the value estimates used for bootstrapping of several agents, with
+        a single evaluation of the model.
+        :param bootstrap_requests: List of (BrainInfo, index in BrainInfo of agent)
+        pairs. The BrainInfos can differ between agents.
+        :return: Array of the value estimates, one per request.
+        """
+        if len(bootstrap_requests) == 0:
+            return np.zeros(0, dtype=np.float32)
+        feed_dict = {
+            self.model.batch_size: len(bootstrap_requests),
+            self.model.sequence_length: 1,
+            self.model.global_step: self._step,
+        }
+        for i in range(len(bootstrap_requests[0][0].visual_observations)):
+            feed_dict[self.model.visual_in[i]] = np.stack(
+                [
+                    brain_info.visual_observations[i][idx]
+                    for brain_info, idx in bootstrap_requests
+                ]
+            )
         if self.use_vec_obs:
-            feed_dict[self.model.vector_in] = [brain_info.vector_observations[idx]]
+            feed_dict[self.model.vector_in] = np.stack(
+                [
+                    brain_info.vector_observations[idx]
+                    for brain_info, idx in bootstrap_requests
+                ]
+            )
         if self.use_recurrent:
-            if brain_info.memories.shape[1] == 0:
-                brain_info.memories = self.make_empty_memory(len(brain_info.agents))
-            feed_dict[self.model.memory_in] = [brain_info.memories[idx]]
+            for brain_info, _ in bootstrap_requests:
+                if brain_info.memories.shape[1] == 0:
+                    brain_info.memories = self.make_empty_memory(len(brain_info.agents))
+            feed_dict[self.model.memory_in] = np.stack(
+                [brain_info.memories[idx] for brain_info, idx in bootstrap_requests]
+            )
         if not self.use_continuous_act and self.use_recurrent:
-            feed_dict[self.model.prev_action] = brain_info.previous_vector_actions[
-                idx
-            ].reshape([-1, len(self.model.act_size)])
-        value_estimate = self.sess.run(self.model.value, feed_dict)
-        return value_estimate
+            feed_dict[self.model.prev_action] = np.stack(
+                [
+                    np.reshape(brain_info.previous_vector_actions[idx], -1)
+                    for brain_info, idx in bootstrap_requests
+                ]
+            ).reshape([-1, len(self.model.act_size)])
+        self._fill_inference_weights(feed_dict)
+        value_estimates = self.sess.run(self.model.value, feed_dict)
+        return value_estimates[:, 0]
 
     def get_last_reward(self):
         """
         Returns the last reward the trainer has had
         :return: the new last reward
         """
-        return self.sess.run(self.model.last_reward)
+        return self._last_reward
 
     def update_reward(self, new_reward):
         """
-        Updates reward value for policy.
+        Updates reward value for policy. It is written to the model when it is saved.
         :param new_reward: New reward to save.
         """
-        self.sess.run(
-            self.model.update_reward, feed_dict={self.model.new_reward: new_reward}
-        )
+        self._last_reward = new_reward
+
+    def _read_counters(self):
+        super(PPOPolicy, self)._read_counters()
+        self._last_reward = float(self.sess.run(self.model.last_reward))
+
+    def _write_counters(self):
+        super(PPOPolicy, self)._write_counters()
+        self.model.last_reward.load(self._last_reward, self.sess)
@@ -3,6 +3,8 @@
 # Contains an implementation of PPO as described (https://arxiv.org/abs/1707.06347).
 
 import logging
+import os
+import threading
 from collections import deque
 
 import numpy as np
@@ -70,6 +72,7 @@ class PPOTrainer(Trainer):
             "Losses/Value Loss": [],
             "Losses/Policy Loss": [],
             "Policy/Learning Rate": [],
+            "Policy/Update Staleness": [],
         }
         if self.use_curiosity:
             stats["Losses/Forward Loss"] = []
@@ -78,10 +81,24 @@ class PPOTrainer(Trainer):
             self.intrinsic_rewards = {}
         self.stats = stats
 
-        self.training_buffer = Buffer()
+        update_buffer_directory = None
+        if trainer_parameters.get("memmap_update_buffer", False):
+            update_buffer_directory = os.path.join(
+                trainer_parameters["model_path"], "update_buffer"
+            )
+            os.makedirs(update_buffer_directory, exist_ok=True)
+        # The local buffers hold up to time_horizon + 1 experiences before they
+        # are processed.
+        self.training_buffer = Buffer(
+            update_buffer_directory, trainer_parameters["time_horizon"] + 1
+        )
         self.cumulative_rewards = {}
         self._reward_buffer = deque(maxlen=reward_buff_cap)
         self.episode_steps = {}
+        # The update running in the background, see start_policy_update.
+        self._update_thread = None
+        self._update_losses = None
+        self._update_error = None
 
     def __str__(self):
         return """Hyperparameters for the PPO Trainer of brain {0}: \n{1}""".format(
@@ -159,7 +176,7 @@ class PPOTrainer(Trainer):
             agent_brain_info = self.training_buffer[agent_id].last_brain_info
             if agent_brain_info is None:
                 agent_brain_info = next_info
-            agent_index = agent_brain_info.agents.index(agent_id)
+            agent_index = agent_brain_info.agent_index[agent_id]
             for i in range(len(next_info.visual_observations)):
                 visual_observations[i].append(
                     agent_brain_info.visual_observations[i][agent_index]
@@ -239,83 +256,107 @@ class PPOTrainer(Trainer):
 
         intrinsic_rewards = self.policy.get_intrinsic_rewards(curr_to_use, next_info)
 
+        # Agents are grouped by the BrainInfo their last experience is stored in,
+        # so that the fields of each group are gathered with one indexing each.
+        groups = {}
         for agent_id in next_info.agents:
-            stored_info = self.training_buffer[agent_id].last_brain_info
-            stored_take_action_outputs = self.training_buffer[
-                agent_id
-            ].last_take_action_outputs
+            agent_buffer = self.training_buffer[agent_id]
+            stored_info = agent_buffer.last_brain_info
             if stored_info is not None:
-                idx = stored_info.agents.index(agent_id)
-                next_idx = next_info.agents.index(agent_id)
-                if not stored_info.local_done[idx]:
-                    for i, _ in enumerate(stored_info.visual_observations):
-                        self.training_buffer[agent_id]["visual_obs%d" % i].append(
-                            stored_info.visual_observations[i][idx]
-                        )
-                        self.training_buffer[agent_id]["next_visual_obs%d" % i].append(
-                            next_info.visual_observations[i][next_idx]
-                        )
-                    if self.policy.use_vec_obs:
-                        self.training_buffer[agent_id]["vector_obs"].append(
-                            stored_info.vector_observations[idx]
-                        )
-                        self.training_buffer[agent_id]["next_vector_in"].append(
-                            next_info.vector_observations[next_idx]
-                        )
-                    if self.policy.use_recurrent:
-                        if stored_info.memories.shape[1] == 0:
-                            stored_info.memories = np.zeros(
-                                (len(stored_info.agents), self.policy.m_size)
-                            )
-                        self.training_buffer[agent_id]["memory"].append(
-                            stored_info.memories[idx]
-                        )
-                    actions = stored_take_action_outputs["action"]
-                    if self.policy.use_continuous_act:
-                        actions_pre = stored_take_action_outputs["pre_action"]
-                        self.training_buffer[agent_id]["actions_pre"].append(
-                            actions_pre[idx]
-                        )
-                        epsilons = stored_take_action_outputs["random_normal_epsilon"]
-                        self.training_buffer[agent_id]["random_normal_epsilon"].append(
-                            epsilons[idx]
-                        )
-                    else:
-                        self.training_buffer[agent_id]["action_mask"].append(
-                            stored_info.action_masks[idx], padding_value=1
-                        )
-                    a_dist = stored_take_action_outputs["log_probs"]
-                    value = stored_take_action_outputs["value"]
-                    self.training_buffer[agent_id]["actions"].append(actions[idx])
-                    self.training_buffer[agent_id]["prev_action"].append(
-                        stored_info.previous_vector_actions[idx]
-                    )
-                    self.training_buffer[agent_id]["masks"].append(1.0)
-                    if self.use_curiosity:
-                        self.training_buffer[agent_id]["rewards"].append(
-                            next_info.rewards[next_idx] + intrinsic_rewards[next_idx]
-                        )
-                    else:
-                        self.training_buffer[agent_id]["rewards"].append(
-                            next_info.rewards[next_idx]
-                        )
-                    self.training_buffer[agent_id]["action_probs"].append(a_dist[idx])
-                    self.training_buffer[agent_id]["value_estimates"].append(
-                        value[idx][0]
-                    )
+                group = groups.setdefault(
+                    id(stored_info),
+                    (stored_info, agent_buffer.last_take_action_outputs, []),
+                )
+                group[2].append(agent_id)
+
+        if self.use_curiosity:
+            intrinsic_rewards = np.asarray(intrinsic_rewards)
+        for stored_info, stored_take_action_outputs, agent_ids in groups.values():
+            idx = np.array([stored_info.agent_index[a] for a in agent_ids], dtype=int)
+            next_idx = np.array(
+                [next_info.agent_index[a] for a in agent_ids], dtype=int
+            )
+            not_done = ~np.asarray(stored_info.local_done, dtype=bool)[idx]
+            if not_done.any():
+                self.add_experiences_batch(
+                    [a for a, keep in zip(agent_ids, not_done) if keep],
+                    stored_info,
+                    stored_take_action_outputs,
+                    idx[not_done],
+                    next_info,
+                    next_idx[not_done],
+                    intrinsic_rewards,
+                )
+            for agent_id, i, keep in zip(agent_ids, next_idx, not_done):
+                if keep:
                     if agent_id not in self.cumulative_rewards:
                         self.cumulative_rewards[agent_id] = 0
-                    self.cumulative_rewards[agent_id] += next_info.rewards[next_idx]
+                    self.cumulative_rewards[agent_id] += next_info.rewards[i]
                     if self.use_curiosity:
                         if agent_id not in self.intrinsic_rewards:
                             self.intrinsic_rewards[agent_id] = 0
-                        self.intrinsic_rewards[agent_id] += intrinsic_rewards[next_idx]
-                if not next_info.local_done[next_idx]:
+                        self.intrinsic_rewards[agent_id] += intrinsic_rewards[i]
+                if not next_info.local_done[i]:
                     if agent_id not in self.episode_steps:
                         self.episode_steps[agent_id] = 0
                     self.episode_steps[agent_id] += 1
         self.trainer_metrics.end_experience_collection_timer()
 
+    def add_experiences_batch(
+        self,
+        agent_ids,
+        stored_info,
+        stored_take_action_outputs,
+        idx,
+        next_info,
+        next_idx,
+        intrinsic_rewards,
+    ):
+        """
+        Adds the experiences of several agents to their experience histories, with
+        one append_batch for all of them.
+        :param agent_ids: The ids of the agents.
+        :param stored_info: The BrainInfo in which the agents took their actions.
+        :param stored_take_action_outputs: The outputs of the Policy's get_action
+        method for stored_info.
+        :param idx: The rows of the agents in stored_info.
+        :param next_info: The BrainInfo which follows the actions.
+        :param next_idx: The rows of the agents in next_info.
+        :param intrinsic_rewards: The intrinsic rewards of the agents in next_info.
+        """
+        batch = {}
+        for i, _ in enumerate(stored_info.visual_observations):
+            batch["visual_obs%d" % i] = stored_info.visual_observations[i][idx]
+            batch["next_visual_obs%d" % i] = next_info.visual_observations[i][next_idx]
+        if self.policy.use_vec_obs:
+            batch["vector_obs"] = stored_info.vector_observations[idx]
+            batch["next_vector_in"] = next_info.vector_observations[next_idx]
+        if self.policy.use_recurrent:
+            if stored_info.memories.shape[1] == 0:
+                stored_info.memories = np.zeros(
+                    (len(stored_info.agents), self.policy.m_size)
+                )
+            batch["memory"] = stored_info.memories[idx]
+        if self.policy.use_continuous_act:
+            batch["actions_pre"] = stored_take_action_outputs["pre_action"][idx]
+            batch["random_normal_epsilon"] = stored_take_action_outputs[
+                "random_normal_epsilon"
+            ][idx]
+        else:
+            batch["action_mask"] = np.asarray(stored_info.action_masks)[idx]
+        batch["actions"] = stored_take_action_outputs["action"][idx]
+        batch["prev_action"] = np.asarray(stored_info.previous_vector_actions)[idx]
+        batch["masks"] = np.ones(len(idx))
+        rewards = np.asarray(next_info.rewards)[next_idx]
+        if self.use_curiosity:
+            rewards = rewards + intrinsic_rewards[next_idx]
+        batch["rewards"] = rewards
+        batch["action_probs"] = stored_take_action_outputs["log_probs"][idx]
+        batch["value_estimates"] = stored_take_action_outputs["value"][idx, 0]
+        self.training_buffer.append_batch(
+            agent_ids, batch, padding_values={"action_mask": 1}
+        )
+
     def process_experiences(self, current_info: AllBrainInfo, new_info: AllBrainInfo):
         """
         Checks agent histories for processing condition, and processes them as necessary.
@@ -325,6 +366,10 @@ class PPOTrainer(Trainer):
         """
         self.trainer_metrics.start_experience_collection_timer()
         info = new_info[self.brain_name]
+        # The agents to process are found first, so that the value estimates used
+        # for bootstrapping are computed for all of them at once.
+        agents_to_process = []
+        bootstrap_requests = []
         for l in range(len(info.agents)):
             agent_actions = self.training_buffer[info.agents[l]]["actions"]
             if (
@@ -333,61 +378,66 @@ class PPOTrainer(Trainer):
             ) and len(agent_actions) > 0:
                 agent_id = info.agents[l]
                 if info.local_done[l] and not info.max_reached[l]:
-                    value_next = 0.0
+                    agents_to_process.append((l, None))
                 else:
                     if info.max_reached[l]:
                         bootstrapping_info = self.training_buffer[
                             agent_id
                         ].last_brain_info
-                        idx = bootstrapping_info.agents.index(agent_id)
+                        idx = bootstrapping_info.agent_index[agent_id]
                     else:
                         bootstrapping_info = info
                         idx = l
-                    value_next = self.policy.get_value_estimate(bootstrapping_info, idx)
-
-                self.training_buffer[agent_id]["advantages"].set(
-                    get_gae(
-                        rewards=self.training_buffer[agent_id]["rewards"].get_batch(),
-                        value_estimates=self.training_buffer[agent_id][
-                            "value_estimates"
-                        ].get_batch(),
-                        value_next=value_next,
-                        gamma=self.trainer_parameters["gamma"],
-                        lambd=self.trainer_parameters["lambd"],
-                    )
+                    agents_to_process.append((l, len(bootstrap_requests)))
+                    bootstrap_requests.append((bootstrapping_info, idx))
+        value_estimates = self.policy.get_value_estimates(bootstrap_requests)
+        agent_buffers = [
+            self.training_buffer[info.agents[l]] for l, _ in agents_to_process
+        ]
+        advantages = get_gae_batch(
+            rewards=[b["rewards"].get_batch() for b in agent_buffers],
+            value_estimates=[b["value_estimates"].get_batch() for b in agent_buffers],
+            value_next=[
+                0.0 if request_index is None else value_estimates[request_index]
+                for _, request_index in agents_to_process
+            ],
+            gamma=self.trainer_parameters["gamma"],
+            lambd=self.trainer_parameters["lambd"],
+        )
+
+        for (l, _), agent_advantages in zip(agents_to_process, advantages):
+            agent_id = info.agents[l]
+            self.training_buffer[agent_id]["advantages"].set(agent_advantages)
+            self.training_buffer[agent_id]["discounted_returns"].set(
+                self.training_buffer[agent_id]["advantages"].get_batch()
+                + self.training_buffer[agent_id]["value_estimates"].get_batch()
+            )
+
+            self.training_buffer.append_update_buffer(
+                agent_id, batch_size=None, training_length=self.policy.sequence_length
+            )
+
+            if info.local_done[l]:
+                self.training_buffer.release_agent(agent_id)
+                self.cumulative_returns_since_policy_update.append(
+                    self.cumulative_rewards.get(agent_id, 0)
                 )
-                self.training_buffer[agent_id]["discounted_returns"].set(
-                    self.training_buffer[agent_id]["advantages"].get_batch()
-                    + self.training_buffer[agent_id]["value_estimates"].get_batch()
+                self.stats["Environment/Cumulative Reward"].append(
+                    self.cumulative_rewards.get(agent_id, 0)
                 )
-
-                self.training_buffer.append_update_buffer(
-                    agent_id,
-                    batch_size=None,
-                    training_length=self.policy.sequence_length,
+                self.reward_buffer.appendleft(self.cumulative_rewards.get(agent_id, 0))
+                self.stats["Environment/Episode Length"].append(
+                    self.episode_steps.get(agent_id, 0)
                 )
-
-                self.training_buffer[agent_id].reset_agent()
-                if info.local_done[l]:
-                    self.cumulative_returns_since_policy_update.append(
-                        self.cumulative_rewards.get(agent_id, 0)
-                    )
-                    self.stats["Environment/Cumulative Reward"].append(
-                        self.cumulative_rewards.get(agent_id, 0)
-                    )
-                    self.reward_buffer.appendleft(
-                        self.cumulative_rewards.get(agent_id, 0)
-                    )
-                    self.stats["Environment/Episode Length"].append(
-                        self.episode_steps.get(agent_id, 0)
+                self.cumulative_rewards[agent_id] = 0
+                self.episode_steps[agent_id] = 0
+                if self.use_curiosity:
+                    self.stats["Policy/Curiosity Reward"].append(
+                        self.intrinsic_rewards.get(agent_id, 0)
                     )
-                    self.cumulative_rewards[agent_id] = 0
-                    self.episode_steps[agent_id] = 0
-                    if self.use_curiosity:
-                        self.stats["Policy/Curiosity Reward"].append(
-                            self.intrinsic_rewards.get(agent_id, 0)
-                        )
-                        self.intrinsic_rewards[agent_id] = 0
+                    self.intrinsic_rewards[agent_id] = 0
+            else:
+                self.training_buffer[agent_id].reset_agent()
         self.trainer_metrics.end_experience_collection_timer()
 
     def end_episode(self):
@@ -418,43 +468,129 @@ class PPOTrainer(Trainer):
         """
         Uses demonstration_buffer to update the policy.
         """
+        self._start_policy_update_timer()
+        losses = self._update_from_buffer(self.training_buffer.update_buffer)
+        self._record_update_losses(losses)
+        self.training_buffer.reset_update_buffer()
+        self.trainer_metrics.end_policy_update()
+
+    def start_policy_update(self):
+        """
+        Starts an update of the policy on a background thread, with the experiences
+        collected so far. The next experiences are collected in a new update buffer,
+        and the policy keeps acting with its weights from before the update until
+        finish_policy_update swaps the new weights in.
+        """
+        self.finish_policy_update()
+        self._start_policy_update_timer()
+        update_buffer = self.training_buffer.take_update_buffer()
+        self.policy.freeze_inference_weights()
+        self.policy_update_staleness = 0
+        self._update_thread = threading.Thread(
+            target=self._run_policy_update,
+            args=(update_buffer,),
+            name="{}-update".format(self.brain_name),
+        )
+        self._update_thread.daemon = True
+        self._update_thread.start()
+
+    def _run_policy_update(self, update_buffer):
+        """
+        Updates the policy with the experiences of update_buffer. Runs on the thread
+        started by start_policy_update.
+        """
+        try:
+            self._update_losses = self._update_from_buffer(update_buffer)
+        except Exception as e:
+            self._update_error = e
+
+    @property
+    def is_updating_policy(self):
+        """
+        :return: Whether an update started by start_policy_update is yet to be
+        finished.
+        """
+        return self._update_thread is not None
+
+    @property
+    def policy_update_done(self):
+        """
+        :return: Whether the update running in the background is done, so that
+        finish_policy_update does not wait.
+        """
+        return self._update_thread is not None and not self._update_thread.is_alive()
+
+    def finish_policy_update(self):
+        """
+        Waits for the update running in the background, if any, and swaps its new
+        weights in for the inference of the policy.
+        """
+        if self._update_thread is None:
+            return
+        self._update_thread.join()
+        self._update_thread = None
+        self.policy.release_inference_weights()
+        update_error, self._update_error = self._update_error, None
+        if update_error is not None:
+            raise update_error
+        self._record_update_losses(self._update_losses)
+        self.stats["Policy/Update Staleness"].append(self.policy_update_staleness)
+        logger.debug(
+            "{}: The policy acted for {} steps during the update.".format(
+                self.brain_name, self.policy_update_staleness
+            )
+        )
+        self.trainer_metrics.end_policy_update()
+
+    def _start_policy_update_timer(self):
         self.trainer_metrics.start_policy_update_timer(
             number_experiences=len(self.training_buffer.update_buffer["actions"]),
             mean_return=float(np.mean(self.cumulative_returns_since_policy_update)),
         )
         self.cumulative_returns_since_policy_update = []
+
+    def _update_from_buffer(self, update_buffer):
+        """
+        Runs the epochs of gradient descent of an update of the policy.
+        :param update_buffer: The AgentBuffer of the experiences to update with.
+        :return: Dict from the name of the statistic of each loss to its mean.
+        """
         n_sequences = max(
             int(self.trainer_parameters["batch_size"] / self.policy.sequence_length), 1
         )
         value_total, policy_total, forward_total, inverse_total = [], [], [], []
-        advantages = self.training_buffer.update_buffer["advantages"].get_batch()
-        self.training_buffer.update_buffer["advantages"].set(
+        advantages = update_buffer["advantages"].get_batch()
+        update_buffer["advantages"].set(
             (advantages - advantages.mean()) / (advantages.std() + 1e-10)
         )
         num_epoch = self.trainer_parameters["num_epoch"]
         for _ in range(num_epoch):
-            self.training_buffer.update_buffer.shuffle()
-            buffer = self.training_buffer.update_buffer
-            for l in range(
-                len(self.training_buffer.update_buffer["actions"]) // n_sequences
-            ):
-                start = l * n_sequences
-                end = (l + 1) * n_sequences
-                run_out = self.policy.update(
-                    buffer.make_mini_batch(start, end), n_sequences
-                )
+            update_buffer.shuffle()
+            feed_dicts = self.policy.get_update_feed_dicts(
+                update_buffer,
+                n_sequences,
+                len(update_buffer["actions"]) // n_sequences,
+                self.trainer_parameters.get("prefetch_mini_batches", 0),
+            )
+            for feed_dict in feed_dicts:
+                run_out = self.policy.update_with_feed_dict(feed_dict)
                 value_total.append(run_out["value_loss"])
                 policy_total.append(np.abs(run_out["policy_loss"]))
                 if self.use_curiosity:
                     inverse_total.append(run_out["inverse_loss"])
                     forward_total.append(run_out["forward_loss"])
-        self.stats["Losses/Value Loss"].append(np.mean(value_total))
-        self.stats["Losses/Policy Loss"].append(np.mean(policy_total))
+        losses = {
+            "Losses/Value Loss": np.mean(value_total),
+            "Losses/Policy Loss": np.mean(policy_total),
+        }
         if self.use_curiosity:
-            self.stats["Losses/Forward Loss"].append(np.mean(forward_total))
-            self.stats["Losses/Inverse Loss"].append(np.mean(inverse_total))
-        self.training_buffer.reset_update_buffer()
-        self.trainer_metrics.end_policy_update()
+            losses["Losses/Forward Loss"] = np.mean(forward_total)
+            losses["Losses/Inverse Loss"] = np.mean(inverse_total)
+        return losses
+
+    def _record_update_losses(self, losses):
+        for stat, loss in losses.items():
+            self.stats[stat].append(loss)
 
 
 def discount_rewards(r, gamma=0.99, value_next=0.0):
@@ -487,3 +623,82 @@ def get_gae(rewards, value_estimates, value_next=0.0, gamma=0.99, lambd=0.95):
     delta_t = rewards + gamma * value_estimates[1:] - value_estimates[:-1]
     advantage = discount_rewards(r=delta_t, gamma=gamma * lambd)
     return advantage
+
+
+# Length of the blocks in which discount_rewards_batch sums rewards with a
+# matrix product. The discount factors of a block do not underflow.
+DISCOUNT_BLOCK_SIZE = 64
+
+
+def discount_rewards_batch(r, gamma=0.99, value_next=0.0):
+    """
+    Computes the discounted sums of future rewards of several trajectories of the
+    same length at once. Within blocks of DISCOUNT_BLOCK_SIZE steps, the sums are
+    computed with a matrix product, and the blocks are chained from the last one.
+    :param r: Array of rewards, one row per trajectory.
+    :param gamma: Discount factor.
+    :param value_next: T+1 value estimate of each trajectory, or a single value.
+    :return: Array of the discounted sums of future rewards, one row per trajectory.
+    """
+    r = np.asarray(r, dtype=np.float64)
+    n_trajectories, length = r.shape
+    block_size = max(min(length, DISCOUNT_BLOCK_SIZE), 1)
+    n_blocks = -(-length // block_size)
+    # The rewards are padded at the front, where the padding does not contribute
+    # to the sums of the actual steps.
+    padding = n_blocks * block_size - length
+    blocks = np.zeros((n_trajectories, n_blocks * block_size))
+    blocks[:, padding:] = r
+    blocks = blocks.reshape(n_trajectories * n_blocks, block_size)
+    # discounts[j, i] is the weight of the reward at step j in the sum at step i.
+    steps = np.arange(block_size)
+    delays = steps[:, np.newaxis] - steps[np.newaxis, :]
+    discounts = np.where(delays >= 0, gamma ** np.maximum(delays, 0), 0.0)
+    sums = np.dot(blocks, discounts).reshape(n_trajectories, n_blocks, block_size)
+    # Weight at each step of the sum following the block.
+    carry_discounts = gamma ** (block_size - steps)
+    carry = np.broadcast_to(np.asarray(value_next, dtype=np.float64), n_trajectories)
+    for b in reversed(range(n_blocks)):
+        sums[:, b] += carry[:, np.newaxis] * carry_discounts
+        carry = sums[:, b, 0]
+    return sums.reshape(n_trajectories, n_blocks * block_size)[:, padding:]
+
+
+def get_gae_batch(rewards, value_estimates, value_next, gamma=0.99, lambd=0.95):
+    """
+    Computes generalized advantage estimates of several trajectories at once. The
+    trajectories can have different lengths.
+    :param rewards: List of the rewards of each trajectory, or an array with one row
+    per trajectory.
+    :param value_estimates: List of the value estimates of each trajectory, for the
+    same time-steps as the rewards.
+    :param value_next: Value estimate for the time-step following each trajectory.
+    :param gamma: Discount factor.
+    :param lambd: GAE weighing factor.
+    :return: List of the advantage estimates of each trajectory.
+    """
+    lengths = np.array([len(r) for r in rewards], dtype=int)
+    if len(lengths) == 0:
+        return []
+    max_length = lengths.max()
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    flat_rewards = np.concatenate([np.asarray(r, dtype=np.float64) for r in rewards])
+    flat_values = np.concatenate(
+        [np.asarray(v, dtype=np.float64) for v in value_estimates]
+    )
+    next_values = np.empty_like(flat_values)
+    next_values[:-1] = flat_values[1:]
+    not_empty = lengths > 0
+    next_values[ends[not_empty] - 1] = np.asarray(value_next, dtype=np.float64)[
+        not_empty
+    ]
+    delta_t = flat_rewards + gamma * next_values - flat_values
+    # Trajectories are aligned on their last step, so that the padding is never
+    # summed into the advantages.
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    columns = np.arange(len(delta_t)) - starts[rows] + (max_length - lengths)[rows]
+    padded_delta_t = np.zeros((len(lengths), max_length))
+    padded_delta_t[rows, columns] = delta_t
+    advantages = discount_rewards_batch(padded_delta_t, gamma=gamma * lambd)
+    return np.split(advantages[rows, columns], ends[:-1])
@@ -0,0 +1,54 @@
+# # Unity ML-Agents Toolkit
+import queue
+import threading
+
+# Time after which a background thread blocked on a full queue checks whether
+# its consumer stopped.
+_PUT_TIMEOUT = 0.1
+
+
+def prefetch(iterable, count):
+    """
+    Iterates over an iterable on a background thread, which keeps up to count
+    items ready ahead of the consumer. E.g. the mini-batches of an update are then
+    made while the model is updated with the previous ones. Exceptions raised by
+    the iterable are raised to the consumer.
+    :param iterable: The iterable to iterate over in the background.
+    :param count: The maximum number of items made ahead of the consumer.
+    :return: A generator of the items of iterable.
+    """
+    items = queue.Queue(maxsize=count)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=_PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except Exception as e:
+            put((None, e))
+
+    thread = threading.Thread(target=produce, name="prefetch")
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        stopped.set()
@@ -0,0 +1,63 @@
+"""
+Benchmark for the agent lookups of the PPOTrainer experience handling.
+
+Feeds the steps of a brain with many agents to PPOTrainer.add_experiences
+and process_experiences, and reports the time per step measured by
+TrainerMetrics. Run with:
+
+    python -m mlagents.trainers.tests.benchmark_agent_index
+
+See benchmark_utils to compare with an earlier revision.
+"""
+import tempfile
+
+import numpy as np
+
+from mlagents.trainers.tests.benchmark_utils import (
+    make_brain_info,
+    make_take_action_outputs,
+    make_trainer,
+)
+
+AGENT_COUNTS = [200, 2000]
+NUM_STEPS = 50
+# Probability for an agent to be done at each step.
+DONE_PROBABILITY = 1 / 64
+
+
+def measure(n_agents):
+    """
+    :return: The mean time per step reported by TrainerMetrics.
+    """
+    np.random.seed(0)
+    trainer = make_trainer(tempfile.mkdtemp())
+    agents = list(range(n_agents))
+    curr_info = make_brain_info(agents, [False] * n_agents)
+    step_times = []
+    for _ in range(NUM_STEPS):
+        local_done = (np.random.rand(n_agents) < DONE_PROBABILITY).tolist()
+        next_info = make_brain_info(agents, local_done)
+        trainer.add_experiences(
+            {trainer.brain_name: curr_info},
+            {trainer.brain_name: next_info},
+            make_take_action_outputs(n_agents),
+        )
+        trainer.process_experiences(
+            {trainer.brain_name: curr_info}, {trainer.brain_name: next_info}
+        )
+        metrics = trainer.trainer_metrics
+        step_times.append(metrics.delta_last_experience_collection)
+        metrics.delta_last_experience_collection = None
+        curr_info = next_info
+    trainer.policy.sess.close()
+    return np.mean(step_times)
+
+
+def main():
+    print("{:>8} {:>15}".format("agents", "per step (ms)"))
+    for n_agents in AGENT_COUNTS:
+        print("{:>8} {:>15.1f}".format(n_agents, 1000 * measure(n_agents)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark for the training Buffer.
+
+Simulates the way the PPO trainer uses the Buffer: agents append one
+experience per step to their local buffers, which are moved to the update
+buffer at the end of each trajectory, and the update buffer is then shuffled
+and split into mini-batches for a few epochs. Reports the time and the
+memory allocated by numpy (with tracemalloc) per update, and separately the
+time taken to extract the sequences used by recurrent policies. Run with:
+
+    python -m mlagents.trainers.tests.benchmark_buffer
+
+See benchmark_utils to compare with an earlier revision.
+"""
+import time
+import tracemalloc
+
+import numpy as np
+
+from mlagents.trainers.buffer import Buffer
+
+NUM_AGENTS = 16
+TIME_HORIZON = 64
+BATCH_SIZE = 256
+NUM_EPOCH = 3
+# Buffer size and camera resolution of each scenario.
+SCENARIOS = [(10240, None), (2048, (40, 40, 3))]
+SEQUENCE_LENGTHS = [16, 64, 128]
+SEQUENCE_TRAJECTORY_LENGTH = 1000
+SEQUENCE_MEMORY_SIZE = 256
+
+
+def collect(buffer, steps, visual_shape):
+    """
+    Fills the update buffer with steps experiences per agent.
+    """
+    for step in range(steps):
+        for agent_id in range(NUM_AGENTS):
+            agent_buffer = buffer[agent_id]
+            if visual_shape is not None:
+                agent_buffer["visual_obs0"].append(
+                    np.random.rand(*visual_shape).astype(np.float32)
+                )
+            agent_buffer["vector_obs"].append(np.random.rand(8))
+            agent_buffer["actions"].append(np.random.rand(2).astype(np.float32))
+            agent_buffer["action_probs"].append(np.random.rand(2).astype(np.float32))
+            agent_buffer["rewards"].append(float(step))
+            agent_buffer["value_estimates"].append(np.float32(step))
+            agent_buffer["masks"].append(1.0)
+        if (step + 1) % TIME_HORIZON == 0:
+            for agent_id in range(NUM_AGENTS):
+                buffer[agent_id]["advantages"].set(
+                    buffer[agent_id]["rewards"].get_batch()
+                    - buffer[agent_id]["value_estimates"].get_batch()
+                )
+                buffer.append_update_buffer(agent_id, training_length=1)
+                buffer[agent_id].reset_agent()
+
+
+def update(buffer):
+    """
+    Shuffles the update buffer and gathers its mini-batches, as update_policy does.
+    """
+    update_buffer = buffer.update_buffer
+    advantages = update_buffer["advantages"].get_batch()
+    update_buffer["advantages"].set(
+        (advantages - advantages.mean()) / (advantages.std() + 1e-10)
+    )
+    total = 0.0
+    for _ in range(NUM_EPOCH):
+        update_buffer.shuffle()
+        for start in range(0, len(update_buffer["actions"]), BATCH_SIZE):
+            mini_batch = update_buffer.make_mini_batch(start, start + BATCH_SIZE)
+            total += mini_batch["actions"][0, 0]
+    buffer.reset_update_buffer()
+    return total
+
+
+def measure(buffer_size, visual_shape, num_updates=3):
+    buffer = Buffer()
+    steps = buffer_size // NUM_AGENTS
+    results = []
+    for _ in range(num_updates):
+        tracemalloc.start()
+        start = time.perf_counter()
+        collect(buffer, steps, visual_shape)
+        collect_time = time.perf_counter() - start
+        start = time.perf_counter()
+        update(buffer)
+        update_time = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results.append((collect_time, update_time, peak))
+    return results
+
+
+def measure_sequences(sequence_length, sequential, number=5):
+    """
+    Times get_batch on a trajectory of recurrent memories, including a copy
+    of the sequences as append_update_buffer makes for recurrent policies.
+    """
+    buffer = Buffer()
+    np.random.seed(0)
+    for _ in range(SEQUENCE_TRAJECTORY_LENGTH):
+        buffer[0]["memory"].append(np.random.rand(SEQUENCE_MEMORY_SIZE))
+    field = buffer[0]["memory"]
+    start = time.perf_counter()
+    for _ in range(number):
+        np.array(
+            field.get_batch(training_length=sequence_length, sequential=sequential)
+        )
+    return (time.perf_counter() - start) / number
+
+
+def main():
+    print("{:>8} {:>11} {:>10}".format("seq len", "sequential", "time (ms)"))
+    for sequence_length in SEQUENCE_LENGTHS:
+        for sequential in [True, False]:
+            elapsed = measure_sequences(sequence_length, sequential)
+            print(
+                "{:>8} {:>11} {:>10.2f}".format(
+                    sequence_length, str(sequential), 1000 * elapsed
+                )
+            )
+    for buffer_size, visual_shape in SCENARIOS:
+        print(
+            "\nbuffer_size {}, camera {}".format(
+                buffer_size, "none" if visual_shape is None else visual_shape
+            )
+        )
+        print(
+            "{:>7} {:>13} {:>12} {:>10}".format(
+                "update", "collect (ms)", "update (ms)", "peak (MB)"
+            )
+        )
+        results = measure(buffer_size, visual_shape)
+        for i, (collect_time, update_time, peak) in enumerate(results):
+            print(
+                "{:>7} {:>13.1f} {:>12.1f} {:>10.1f}".format(
+                    i, 1000 * collect_time, 1000 * update_time, peak / 2 ** 20
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
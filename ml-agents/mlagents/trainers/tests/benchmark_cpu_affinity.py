@@ -0,0 +1,103 @@
+"""
+Benchmark for the CPU affinity plan of concurrent training sessions.
+
+Runs several sessions at once in separate processes, as mlagents-learn does
+with --num-runs, each repeatedly deciding the actions of its agents and
+updating its policy with a mini-batch. Reports the aggregate number of such
+steps per second, with each session free to use all cores and the TensorFlow
+thread pools sized by the machine, against the plan of --cpu-affinity, which
+restricts each session to its share of the cores and sizes its thread pools
+by it. Run with:
+
+    python -m mlagents.trainers.tests.benchmark_cpu_affinity
+"""
+import os
+import tempfile
+import time
+from multiprocessing import Process, Queue
+
+import numpy as np
+
+from mlagents.trainers.learn import split_cpus
+from mlagents.trainers.tests.benchmark_utils import (
+    ACTION_SIZE,
+    VECTOR_OBSERVATION_SIZE,
+    make_brain_info,
+    make_trainer,
+)
+
+RUN_COUNTS = [1, 2, 4]
+NUM_AGENTS = 64
+BATCH_SIZE = 256
+DURATION = 10.0
+
+
+def run_session(run_cpus, steps_queue):
+    """
+    Runs the steps of a training session for DURATION seconds.
+    :param run_cpus: The cores of the session, or None to use all of them.
+    :param steps_queue: Queue the number of steps is reported to.
+    """
+    parameters = {}
+    if run_cpus is not None:
+        os.sched_setaffinity(0, run_cpus)
+        parameters["intra_op_threads"] = len(run_cpus)
+        parameters["inter_op_threads"] = len(run_cpus)
+    trainer = make_trainer(tempfile.mkdtemp(), **parameters)
+    policy = trainer.policy
+    brain_info = make_brain_info(list(range(NUM_AGENTS)), [False] * NUM_AGENTS)
+    update_buffer = trainer.training_buffer.update_buffer
+    update_buffer["vector_obs"].set(np.random.rand(BATCH_SIZE, VECTOR_OBSERVATION_SIZE))
+    for key in ["actions", "actions_pre", "random_normal_epsilon", "action_probs"]:
+        update_buffer[key].set(np.random.rand(BATCH_SIZE, ACTION_SIZE))
+    update_buffer["masks"].set(np.ones(BATCH_SIZE))
+    for key in ["discounted_returns", "value_estimates", "advantages"]:
+        update_buffer[key].set(np.random.rand(BATCH_SIZE))
+    mini_batch = update_buffer.make_mini_batch(0, BATCH_SIZE)
+    steps = 0
+    end = time.perf_counter() + DURATION
+    while time.perf_counter() < end:
+        policy.get_action(brain_info)
+        policy.update(mini_batch, BATCH_SIZE)
+        steps += 1
+    policy.sess.close()
+    steps_queue.put(steps)
+
+
+def measure(num_runs, use_plan):
+    """
+    :return: The aggregate number of steps per second of num_runs sessions.
+    """
+    if use_plan:
+        plan = split_cpus(list(os.sched_getaffinity(0)), num_runs)
+    else:
+        plan = [None] * num_runs
+    steps_queue = Queue()
+    jobs = [Process(target=run_session, args=(cpus, steps_queue)) for cpus in plan]
+    for job in jobs:
+        job.start()
+    total_steps = sum(steps_queue.get() for _ in jobs)
+    for job in jobs:
+        job.join()
+    return total_steps / DURATION
+
+
+def main():
+    print(
+        "{:>6} {:>6} {:>18} {:>18} {:>9}".format(
+            "runs", "cores", "no plan (steps/s)", "plan (steps/s)", "speedup"
+        )
+    )
+    num_cpus = len(os.sched_getaffinity(0))
+    for num_runs in RUN_COUNTS:
+        free_rate = measure(num_runs, use_plan=False)
+        plan_rate = measure(num_runs, use_plan=True)
+        print(
+            "{:>6} {:>6} {:>18.1f} {:>18.1f} {:>8.2f}x".format(
+                num_runs, num_cpus, free_rate, plan_rate, plan_rate / free_rate
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark for the computation of the advantages of PPO.
+
+Computes the generalized advantage estimates of the trajectories of many
+agents, with get_gae_batch for all of them at once against get_gae for each
+trajectory, for several time horizons. Run with:
+
+    python -m mlagents.trainers.tests.benchmark_gae
+"""
+import timeit
+
+import numpy as np
+
+from mlagents.trainers.ppo.trainer import get_gae, get_gae_batch
+
+NUM_TRAJECTORIES = 256
+TIME_HORIZONS = [16, 64, 256, 1024]
+
+
+def main(number=5):
+    print(
+        "{:>8} {:>18} {:>18} {:>9}".format(
+            "horizon", "get_gae (ms)", "batched (ms)", "speedup"
+        )
+    )
+    for time_horizon in TIME_HORIZONS:
+        np.random.seed(0)
+        # Trajectories cut by the end of an episode are shorter than the horizon.
+        lengths = np.random.randint(
+            time_horizon // 2, time_horizon + 1, NUM_TRAJECTORIES
+        )
+        rewards = [np.random.randn(length) for length in lengths]
+        value_estimates = [
+            np.random.randn(length).astype(np.float32) for length in lengths
+        ]
+        value_next = np.random.randn(NUM_TRAJECTORIES).astype(np.float32)
+
+        def per_trajectory():
+            return [
+                get_gae(rewards[i], value_estimates[i], value_next[i])
+                for i in range(NUM_TRAJECTORIES)
+            ]
+
+        def batched():
+            return get_gae_batch(rewards, value_estimates, value_next)
+
+        for expected, advantages in zip(per_trajectory(), batched()):
+            np.testing.assert_allclose(advantages, expected, atol=1e-9)
+        per_trajectory_time = timeit.timeit(per_trajectory, number=number) / number
+        batched_time = timeit.timeit(batched, number=number) / number
+        print(
+            "{:>8} {:>18.2f} {:>18.2f} {:>8.1f}x".format(
+                time_horizon,
+                1000 * per_trajectory_time,
+                1000 * batched_time,
+                per_trajectory_time / batched_time,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Helpers shared by the benchmarks.
+
+The benchmarks only time the code of the tree they run in. To compare it
+with an earlier revision, e.g. the commit before an optimization, run the
+same benchmark with the packages of that revision and of the working tree:
+
+    python -m mlagents.trainers.tests.benchmark_utils <revision> <benchmark>
+
+where <benchmark> is the module of the benchmark, such as
+mlagents.trainers.tests.benchmark_agent_index or
+mlagents.envs.tests.benchmark_brain_info.
+"""
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import tensorflow as tf
+
+from mlagents.envs import BrainInfo, BrainParameters
+from mlagents.trainers.ppo.trainer import PPOTrainer
+
+VECTOR_OBSERVATION_SIZE = 8
+ACTION_SIZE = 2
+# Folders of the packages in the repository, in the order of their dependencies.
+PACKAGES = ["ml-agents-envs", "ml-agents"]
+
+
+def make_trainer(directory, use_recurrent=False, **parameters):
+    """
+    Creates a PPOTrainer for a brain with continuous actions and vector
+    observations.
+    :param directory: The folder of the summaries and the model.
+    :param use_recurrent: Whether the policy is recurrent.
+    :param parameters: Trainer parameters which override the defaults.
+    :return: The PPOTrainer.
+    """
+    brain = BrainParameters(
+        brain_name="BenchmarkBrain",
+        vector_observation_space_size=VECTOR_OBSERVATION_SIZE,
+        num_stacked_vector_observations=1,
+        camera_resolutions=[],
+        vector_action_space_size=[ACTION_SIZE],
+        vector_action_descriptions=[""] * ACTION_SIZE,
+        vector_action_space_type=1,
+    )
+    trainer_parameters = {
+        "trainer": "ppo",
+        "batch_size": 1024,
+        "beta": 5.0e-3,
+        "buffer_size": 10240,
+        "epsilon": 0.2,
+        "gamma": 0.99,
+        "hidden_units": 32,
+        "lambd": 0.95,
+        "learning_rate": 3.0e-4,
+        "max_steps": 5.0e4,
+        "normalize": False,
+        "num_epoch": 3,
+        "num_layers": 1,
+        "time_horizon": 1000,
+        "sequence_length": 64,
+        "summary_freq": 1000,
+        "use_recurrent": use_recurrent,
+        "memory_size": 8,
+        "use_curiosity": False,
+        "curiosity_strength": 0.0,
+        "curiosity_enc_size": 1,
+        "summary_path": directory,
+        "model_path": directory,
+    }
+    trainer_parameters.update(parameters)
+    tf.reset_default_graph()
+    return PPOTrainer(brain, 100, trainer_parameters, True, False, 0, "benchmark")
+
+
+def make_brain_info(agents, local_done):
+    """
+    Creates a BrainInfo of random observations for the brain of make_trainer.
+    :param agents: The ids of the agents.
+    :param local_done: Whether each agent is done.
+    :return: The BrainInfo.
+    """
+    n_agents = len(agents)
+    return BrainInfo(
+        visual_observation=[],
+        vector_observation=np.random.rand(n_agents, VECTOR_OBSERVATION_SIZE),
+        text_observations=[""] * n_agents,
+        memory=np.zeros((n_agents, 0)),
+        reward=np.random.rand(n_agents).tolist(),
+        agents=agents,
+        local_done=local_done,
+        vector_action=np.random.rand(n_agents, ACTION_SIZE),
+        text_action=[""] * n_agents,
+        max_reached=[False] * n_agents,
+        action_mask=np.ones((n_agents, ACTION_SIZE)),
+    )
+
+
+def make_take_action_outputs(n_agents):
+    """
+    Creates random outputs of the policy of make_trainer for n_agents agents.
+    """
+    action = np.random.rand(n_agents, ACTION_SIZE).astype(np.float32)
+    return {
+        "action": action,
+        "pre_action": action,
+        "random_normal_epsilon": action,
+        "log_probs": action,
+        "value": np.random.rand(n_agents, 1).astype(np.float32),
+        "entropy": np.random.rand(n_agents).astype(np.float32),
+        "learning_rate": 3.0e-4,
+    }
+
+
+def run_at_revision(revision, benchmark):
+    """
+    Runs a benchmark with the packages of a revision of the repository. The
+    benchmarks themselves are taken from the working tree, so that both
+    revisions run the same measurements.
+    :param revision: The git revision, e.g. a commit hash.
+    :param benchmark: The module of the benchmark.
+    """
+    root = (
+        subprocess.check_output(
+            ["git", "rev-parse", "--show-toplevel"], cwd=os.path.dirname(__file__)
+        )
+        .decode()
+        .strip()
+    )
+    directory = tempfile.mkdtemp()
+    try:
+        archive = subprocess.Popen(
+            ["git", "archive", revision] + PACKAGES, cwd=root, stdout=subprocess.PIPE
+        )
+        subprocess.check_call(["tar", "-x", "-C", directory], stdin=archive.stdout)
+        if archive.wait() != 0:
+            raise subprocess.CalledProcessError(archive.returncode, "git archive")
+        for path in glob.glob(
+            os.path.join(root, "*", "mlagents", "*", "tests", "benchmark_*.py")
+        ):
+            shutil.copy(path, os.path.join(directory, os.path.relpath(path, root)))
+        python_path = os.pathsep.join(
+            os.path.join(directory, package) for package in PACKAGES
+        )
+        subprocess.check_call(
+            [sys.executable, "-m", benchmark],
+            cwd=directory,
+            env=dict(os.environ, PYTHONPATH=python_path),
+        )
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs a benchmark at a revision and in the working tree."
+    )
+    parser.add_argument("revision", help="The git revision to compare with.")
+    parser.add_argument("benchmark", help="The module of the benchmark.")
+    args = parser.parse_args()
+    print("{} at {}".format(args.benchmark, args.revision), flush=True)
+    run_at_revision(args.revision, args.benchmark)
+    print("\n{} in the working tree".format(args.benchmark), flush=True)
+    subprocess.check_call([sys.executable, "-m", args.benchmark])
+
+
+if __name__ == "__main__":
+    main()
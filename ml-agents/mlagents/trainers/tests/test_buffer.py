@@ -1,5 +1,7 @@
 import numpy as np
-from mlagents.trainers.buffer import Buffer
+import pytest
+
+from mlagents.trainers.buffer import Buffer, BufferException
 
 
 def assert_array(a, b):
@@ -65,3 +67,125 @@ def test_buffer():
     c = b.update_buffer.make_mini_batch(start=0, end=1)
     assert c.keys() == b.update_buffer.keys()
     assert c["action"].shape == (1, 2, 2)
+
+
+def test_buffer_field_storage():
+    b = Buffer()
+    field = b[0]["rewards"]
+    for step in range(40):
+        field.append(step)
+    field.append(0.5)
+    assert len(field) == 41
+    assert field.get_batch().dtype == np.float64
+    assert field.get_batch(batch_size=2).tolist() == [39, 0.5]
+    field.extend(np.array([1.5, 2.5]))
+    assert field[-2:].tolist() == [1.5, 2.5]
+    storage = field._data
+    b[0].reset_agent()
+    assert len(field) == 0
+    field.append(3.0)
+    assert field._data is storage
+    assert np.array(field).tolist() == [3.0]
+    field.set(np.ones((2, 3)))
+    assert field.get_batch().shape == (2, 3)
+    with pytest.raises(BufferException):
+        field.append([1.0, 2.0])
+
+
+def test_buffer_shuffle():
+    b = Buffer()
+    for step in range(10):
+        b[0]["a"].append([step, step])
+        b[0]["b"].append(2 * step)
+    b[0].shuffle()
+    assert sorted(b[0]["b"].get_batch().tolist()) == list(range(0, 20, 2))
+    assert (b[0]["a"].get_batch()[:, 0] * 2 == b[0]["b"].get_batch()).all()
+    mini_batch = b[0].make_mini_batch(2, 5)
+    assert mini_batch["a"].shape == (3, 2)
+    assert mini_batch["b"].tolist() == b[0]["b"].get_batch()[2:5].tolist()
+
+
+def test_buffer_sequences():
+    b = Buffer()
+    field = b[0]["action_mask"]
+    for step in range(7):
+        field.append([step, -step], padding_value=1)
+    a = field.get_batch(training_length=3)
+    assert_array(
+        a,
+        np.array(
+            [
+                [[6, -6], [6, -6], [0, 0]],
+                [[1, -1], [2, -2], [3, -3]],
+                [[4, -4], [5, -5], [6, -6]],
+            ]
+        ),
+    )
+    a = field.get_batch(batch_size=2, training_length=3)
+    assert a.shape == (2, 3, 2)
+    assert a[0, 0].tolist() == [1, -1]
+    a = field.get_batch(training_length=3, sequential=False)
+    assert a.shape == (5, 3, 2)
+    assert a[:, 0, 0].tolist() == [0, 1, 2, 3, 4]
+    assert a[:, 2, 0].tolist() == [2, 3, 4, 5, 6]
+    with pytest.raises(BufferException):
+        field.get_batch(batch_size=6, training_length=3, sequential=False)
+    with pytest.raises(BufferException):
+        field.get_batch(batch_size=4, training_length=3)
+    assert b[0]["empty"].get_batch(training_length=3).shape == (0, 3)
+
+
+def test_buffer_memmap(tmpdir):
+    b = Buffer(update_buffer_directory=str(tmpdir))
+    for step in range(20):
+        b[0]["visual_obs0"].append(np.full((32, 32, 3), step, np.float32))
+        b[0]["rewards"].append(step)
+    b.append_update_buffer(0, training_length=1)
+    update_buffer = b.update_buffer
+    assert isinstance(update_buffer["visual_obs0"]._data, np.memmap)
+    assert not isinstance(update_buffer["rewards"]._data, np.memmap)
+    assert not isinstance(b[0]["visual_obs0"]._data, np.memmap)
+    update_buffer.shuffle()
+    mini_batch = update_buffer.make_mini_batch(0, 20)
+    assert (mini_batch["visual_obs0"][:, 0, 0, 0] == mini_batch["rewards"]).all()
+    assert sorted(mini_batch["rewards"].tolist()) == list(range(20))
+
+
+def test_buffer_release_agent():
+    b = Buffer(local_buffer_capacity=8)
+    b[0]["actions"].append([1.0, 2.0])
+    b[0].last_brain_info = "info"
+    assert len(b[0]["actions"]._data) == 8
+    storage = b[0]["actions"]._data
+    agent_buffer = b[0]
+    b.release_agent(0)
+    b.release_agent(0)
+    assert 0 not in b
+    assert b[1] is agent_buffer
+    assert len(b[1]["actions"]) == 0
+    assert b[1].last_brain_info is None
+    b[1]["actions"].append([3.0, 4.0])
+    assert b[1]["actions"]._data is storage
+    b.reset_local_buffers()
+    assert len(b) == 0
+    assert b[2] is agent_buffer
+
+
+def test_buffer_append_batch():
+    b = Buffer(local_buffer_capacity=2)
+    b[1]["rewards"].append(0.5)
+    for step in range(3):
+        b.append_batch(
+            [1, 2],
+            {
+                "rewards": np.array([1.0, 2.0]) + step,
+                "action_mask": np.ones((2, 3), dtype=np.float32),
+            },
+            padding_values={"action_mask": 1},
+        )
+    assert b[1]["rewards"].get_batch().tolist() == [0.5, 1, 2, 3]
+    assert b[2]["rewards"].get_batch().tolist() == [2, 3, 4]
+    assert b[2]["action_mask"].get_batch().dtype == np.float32
+    assert b[2]["action_mask"].padding_value == 1
+    with pytest.raises(BufferException):
+        b.append_batch([1], {"rewards": np.ones((1, 2))})
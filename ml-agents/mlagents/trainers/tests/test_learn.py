@@ -20,6 +20,12 @@ def basic_options():
         "--lesson": "0",
         "--slow": False,
         "--no-graphics": False,
+        "--uint8-visual": False,
+        "--shared-memory": False,
+        "--min-ready-envs": "0",
+        "--async-update": False,
+        "--max-update-staleness": "0",
+        "--cpu-affinity": False,
         "<trainer-config-path>": "basic_path",
         "--debug": False,
     }
@@ -53,6 +59,10 @@ def test_run_training(load_config, create_environment_factory, subproc_env_mock)
                 subproc_env_mock.return_value.external_brains,
                 0,
                 True,
+                False,
+                0,
+                False,
+                0,
             )
 
 
@@ -77,3 +87,37 @@ def test_docker_target_path(load_config, create_environment_factory, subproc_env
             mock_init.assert_called_once()
             assert mock_init.call_args[0][0] == "/dockertarget/models/ppo-0"
             assert mock_init.call_args[0][1] == "/dockertarget/summaries"
+
+
+def test_split_cpus():
+    assert learn.split_cpus([3, 2, 1, 0], 2) == [[0, 1], [2, 3]]
+    assert learn.split_cpus(list(range(5)), 2) == [[0, 1], [2, 3, 4]]
+    assert learn.split_cpus([0, 1], 3) == [[0], [1], [0]]
+
+
+@patch("mlagents.trainers.learn.os.sched_setaffinity", create=True)
+@patch("mlagents.trainers.learn.os.sched_getaffinity", create=True)
+@patch("mlagents.trainers.learn.SubprocessUnityEnvironment")
+@patch("mlagents.trainers.learn.create_environment_factory")
+@patch("mlagents.trainers.learn.load_config")
+def test_run_training_with_cpu_affinity(
+    load_config,
+    create_environment_factory,
+    subproc_env_mock,
+    sched_getaffinity,
+    sched_setaffinity,
+):
+    sched_getaffinity.return_value = set(range(8))
+    trainer_config = {"default": {"intra_op_threads": 1}}
+    load_config.return_value = trainer_config
+    options = basic_options()
+    options["--cpu-affinity"] = True
+    options["--num-runs"] = "2"
+    options["--num-envs"] = "2"
+
+    with patch.object(TrainerController, "__init__", MagicMock(return_value=None)):
+        with patch.object(TrainerController, "start_learning", MagicMock()):
+            learn.run_training(1, 0, options, MagicMock())
+    sched_setaffinity.assert_called_once_with(0, [4, 5, 6, 7])
+    assert create_environment_factory.call_args[0][6] == [[4, 5], [6, 7]]
+    assert trainer_config["default"] == {"intra_op_threads": 1, "inter_op_threads": 4}
@@ -1,3 +1,4 @@
+import os
 import unittest.mock as mock
 import pytest
 
@@ -6,9 +7,15 @@ import tensorflow as tf
 import yaml
 
 from mlagents.trainers.ppo.models import PPOModel
-from mlagents.trainers.ppo.trainer import discount_rewards
+from mlagents.trainers.ppo.trainer import (
+    PPOTrainer,
+    discount_rewards,
+    discount_rewards_batch,
+    get_gae,
+    get_gae_batch,
+)
 from mlagents.trainers.ppo.policy import PPOPolicy
-from mlagents.envs import UnityEnvironment
+from mlagents.envs import BrainInfo, BrainParameters, UnityEnvironment
 from mlagents.envs.mock_communicator import MockCommunicator
 
 
@@ -64,6 +71,69 @@ def test_ppo_policy_evaluate(mock_communicator, mock_launcher, dummy_config):
     env.close()
 
 
+@mock.patch("mlagents.envs.UnityEnvironment.executable_launcher")
+@mock.patch("mlagents.envs.UnityEnvironment.get_communicator")
+def test_ppo_policy_step_counter(
+    mock_communicator, mock_launcher, dummy_config, tmpdir
+):
+    tf.reset_default_graph()
+    mock_communicator.return_value = MockCommunicator(
+        discrete_action=False, visual_inputs=0
+    )
+    env = UnityEnvironment(" ")
+    brain_info = env.reset()[env.brain_names[0]]
+    brain = env.brains[env.brain_names[0]]
+    trainer_parameters = dummy_config
+    trainer_parameters["model_path"] = str(tmpdir)
+    policy = PPOPolicy(0, brain, trainer_parameters, True, False)
+    learning_rate = policy.evaluate(brain_info)["learning_rate"]
+    for _ in range(1000):
+        policy.increment_step()
+    policy.update_reward(2.5)
+    assert policy.get_current_step() == 1000
+    assert policy.get_last_reward() == 2.5
+    # The model sees the step counted in Python, which is only written to its
+    # variables when it is saved.
+    assert policy.evaluate(brain_info)["learning_rate"] < learning_rate
+    assert policy.sess.run(policy.model.global_step) == 0
+    policy.save_model(1000)
+    assert policy.sess.run(policy.model.global_step) == 1000
+    policy.wait_for_saves()
+
+    loaded_policy = PPOPolicy(0, brain, trainer_parameters, True, True)
+    assert loaded_policy.get_current_step() == 1000
+    assert loaded_policy.get_last_reward() == 2.5
+    env.close()
+
+
+@mock.patch("mlagents.envs.UnityEnvironment.executable_launcher")
+@mock.patch("mlagents.envs.UnityEnvironment.get_communicator")
+def test_ppo_policy_value_estimates(mock_communicator, mock_launcher, dummy_config):
+    tf.reset_default_graph()
+    mock_communicator.return_value = MockCommunicator(
+        discrete_action=True, visual_inputs=0
+    )
+    env = UnityEnvironment(" ")
+    brain_info = env.reset()[env.brain_names[0]]
+    other_info = env.step()[env.brain_names[0]]
+    other_info.vector_observations = other_info.vector_observations + 1
+
+    trainer_parameters = dummy_config
+    trainer_parameters["model_path"] = env.brain_names[0]
+    trainer_parameters["use_recurrent"] = True
+    policy = PPOPolicy(
+        0, env.brains[env.brain_names[0]], trainer_parameters, False, False
+    )
+    requests = [(brain_info, 2), (other_info, 0), (brain_info, 0)]
+    value_estimates = policy.get_value_estimates(requests)
+    assert value_estimates.shape == (3,)
+    for (info, idx), value in zip(requests, value_estimates):
+        assert policy.get_value_estimate(info, idx) == pytest.approx(value, abs=1e-6)
+    assert value_estimates[0] != pytest.approx(value_estimates[1])
+    assert policy.get_value_estimates([]).shape == (0,)
+    env.close()
+
+
 @mock.patch("mlagents.envs.UnityEnvironment.executable_launcher")
 @mock.patch("mlagents.envs.UnityEnvironment.get_communicator")
 def test_ppo_model_cc_vector(mock_communicator, mock_launcher):
@@ -419,6 +489,270 @@ def test_ppo_model_cc_visual_curio(mock_communicator, mock_launcher):
             env.close()
 
 
+@mock.patch("mlagents.envs.UnityEnvironment.executable_launcher")
+@mock.patch("mlagents.envs.UnityEnvironment.get_communicator")
+def test_ppo_model_dc_visual_uint8(mock_communicator, mock_launcher):
+    tf.reset_default_graph()
+    with tf.Session() as sess:
+        with tf.variable_scope("FakeGraphScope"):
+            mock_communicator.return_value = MockCommunicator(
+                discrete_action=True, visual_inputs=2
+            )
+            env = UnityEnvironment(" ")
+            model = PPOModel(
+                env.brains["RealFakeBrain"], use_curiosity=True, uint8_visual=True
+            )
+            init = tf.global_variables_initializer()
+            sess.run(init)
+
+            assert model.visual_in[0].dtype == tf.uint8
+            assert model.next_visual_in[0].dtype == tf.uint8
+            run_list = [model.output, model.value, model.intrinsic_reward]
+            feed_dict = {
+                model.batch_size: 2,
+                model.sequence_length: 1,
+                model.vector_in: np.array([[1, 2, 3, 1, 2, 3], [3, 4, 5, 3, 4, 5]]),
+                model.next_vector_in: np.array(
+                    [[1, 2, 3, 1, 2, 3], [3, 4, 5, 3, 4, 5]]
+                ),
+                model.action_holder: [[0], [0]],
+                model.visual_in[0]: np.full([2, 40, 30, 3], 255, dtype=np.uint8),
+                model.visual_in[1]: np.full([2, 40, 30, 3], 255, dtype=np.uint8),
+                model.next_visual_in[0]: np.zeros([2, 40, 30, 3], dtype=np.uint8),
+                model.next_visual_in[1]: np.zeros([2, 40, 30, 3], dtype=np.uint8),
+                model.action_masks: np.ones([2, 2]),
+            }
+            sess.run(run_list, feed_dict=feed_dict)
+            env.close()
+
+
+def make_brain_info(agents, local_done, reward):
+    n_agents = len(agents)
+    return BrainInfo(
+        visual_observation=[],
+        vector_observation=np.array([[agent_id] * 3 for agent_id in agents], float),
+        text_observations=[""] * n_agents,
+        memory=np.zeros((n_agents, 0)),
+        reward=[reward] * n_agents,
+        agents=agents,
+        local_done=local_done,
+        vector_action=np.zeros((n_agents, 2)),
+        text_action=[""] * n_agents,
+        max_reached=[False] * n_agents,
+        action_mask=np.ones((n_agents, 5)),
+    )
+
+
+def test_trainer_add_experiences(dummy_config, tmpdir):
+    tf.reset_default_graph()
+    brain_params = BrainParameters(
+        brain_name="RealFakeBrain",
+        vector_observation_space_size=3,
+        num_stacked_vector_observations=1,
+        camera_resolutions=[],
+        vector_action_space_size=[2, 3],
+        vector_action_descriptions=["", ""],
+        vector_action_space_type=0,
+    )
+    dummy_config["summary_path"] = str(tmpdir)
+    dummy_config["model_path"] = str(tmpdir)
+    trainer = PPOTrainer(brain_params, 0, dummy_config, True, False, 0, "0")
+    curr_info = make_brain_info([10, 11, 12], [False, True, False], 0.0)
+    next_info = make_brain_info([12, 11, 13], [True, False, False], 1.0)
+    take_action_outputs = {
+        "action": np.array([[0, 1], [1, 2], [1, 0]]),
+        "log_probs": np.zeros((3, 5)),
+        "value": np.array([[0.1], [0.2], [0.3]], np.float32),
+        "entropy": np.zeros(3),
+        "learning_rate": 0.1,
+    }
+    trainer.add_experiences(
+        {"RealFakeBrain": curr_info}, {"RealFakeBrain": next_info}, take_action_outputs
+    )
+    buffer = trainer.training_buffer
+    # Agent 11 was done and agent 13 has no previous step.
+    assert len(buffer[11]["actions"]) == 0
+    assert len(buffer[13]["actions"]) == 0
+    assert buffer[12]["vector_obs"].get_batch().tolist() == [[12, 12, 12]]
+    assert buffer[12]["next_vector_in"].get_batch().tolist() == [[12, 12, 12]]
+    assert buffer[12]["actions"].get_batch().tolist() == [[1, 0]]
+    assert buffer[12]["value_estimates"].get_batch().tolist() == [np.float32(0.3)]
+    assert buffer[12]["rewards"].get_batch().tolist() == [1.0]
+    assert buffer[12]["action_mask"].padding_value == 1
+    assert trainer.cumulative_rewards == {12: 1.0}
+    assert trainer.episode_steps == {11: 1}
+    trainer.policy.sess.close()
+
+
+def make_continuous_trainer(dummy_config, tmpdir):
+    tf.reset_default_graph()
+    brain_params = BrainParameters(
+        brain_name="RealFakeBrain",
+        vector_observation_space_size=3,
+        num_stacked_vector_observations=1,
+        camera_resolutions=[],
+        vector_action_space_size=[2],
+        vector_action_space_type=1,
+        vector_action_descriptions=[""],
+    )
+    dummy_config["summary_path"] = str(tmpdir)
+    dummy_config["model_path"] = str(tmpdir)
+    dummy_config["normalize"] = False
+    return PPOTrainer(brain_params, 0, dummy_config, True, False, 0, "0")
+
+
+def fill_update_buffer(update_buffer, n_experiences):
+    update_buffer["vector_obs"].set(np.random.rand(n_experiences, 3))
+    update_buffer["actions"].set(np.random.rand(n_experiences, 2))
+    update_buffer["actions_pre"].set(np.random.rand(n_experiences, 2))
+    update_buffer["random_normal_epsilon"].set(np.random.rand(n_experiences, 2))
+    update_buffer["action_probs"].set(np.random.rand(n_experiences, 2))
+    update_buffer["masks"].set(np.ones(n_experiences))
+    update_buffer["discounted_returns"].set(np.random.rand(n_experiences))
+    update_buffer["value_estimates"].set(np.random.rand(n_experiences))
+    update_buffer["advantages"].set(np.random.rand(n_experiences))
+
+
+def test_trainer_start_policy_update(dummy_config, tmpdir):
+    trainer = make_continuous_trainer(dummy_config, tmpdir)
+    policy = trainer.policy
+    fill_update_buffer(trainer.training_buffer.update_buffer, 64)
+    trainer.cumulative_returns_since_policy_update = [1.0]
+    brain_info = make_brain_info([0, 1], [False, False], 0.0)
+    value_before = policy.get_value_estimates([(brain_info, 0)])
+
+    trainer.start_policy_update()
+    assert trainer.is_updating_policy
+    # The experiences are collected in a new update buffer during the update, and
+    # the policy acts with its previous weights.
+    assert len(trainer.training_buffer.update_buffer["actions"]) == 0
+    assert policy.get_value_estimates([(brain_info, 0)]) == value_before
+    trainer.policy_update_staleness = 3
+    trainer.finish_policy_update()
+
+    assert not trainer.is_updating_policy
+    assert policy.get_value_estimates([(brain_info, 0)]) != value_before
+    assert trainer.stats["Policy/Update Staleness"] == [3]
+    assert len(trainer.stats["Losses/Value Loss"]) == 1
+    assert len(trainer.stats["Losses/Policy Loss"]) == 1
+    trainer.finish_policy_update()
+    assert trainer.stats["Policy/Update Staleness"] == [3]
+    policy.sess.close()
+
+
+def test_ppo_policy_defers_normalizer_updates(dummy_config, tmpdir):
+    brain_params = BrainParameters(
+        brain_name="RealFakeBrain",
+        vector_observation_space_size=3,
+        num_stacked_vector_observations=1,
+        camera_resolutions=[],
+        vector_action_space_size=[2],
+        vector_action_space_type=1,
+        vector_action_descriptions=[""],
+    )
+    dummy_config["model_path"] = str(tmpdir)
+    brain_infos = [
+        make_brain_info([0, 1], [False, False], 0.0),
+        make_brain_info([2, 5], [False, False], 0.0),
+    ]
+    policies = []
+    for defer in [False, True]:
+        tf.reset_default_graph()
+        policy = PPOPolicy(0, brain_params, dummy_config, True, False)
+        normalizer = [policy.model.running_mean, policy.model.running_variance]
+        if defer:
+            policy.freeze_inference_weights()
+        for brain_info in brain_infos:
+            policy.evaluate(brain_info)
+            policy.increment_step()
+        if defer:
+            # The normalizer is only updated once the weights are released.
+            np.testing.assert_array_equal(
+                policy.sess.run(policy.model.running_mean), np.zeros(3)
+            )
+            policy.release_inference_weights()
+        policies.append(policy.sess.run(normalizer))
+        policy.sess.close()
+    for inline, deferred in zip(*policies):
+        np.testing.assert_array_almost_equal(deferred, inline)
+    assert policies[0][0].any()
+
+
+def test_ppo_policy_get_update_feed_dicts(dummy_config, tmpdir):
+    trainer = make_continuous_trainer(dummy_config, tmpdir)
+    policy = trainer.policy
+    update_buffer = trainer.training_buffer.update_buffer
+    fill_update_buffer(update_buffer, 100)
+    expected = list(policy.get_update_feed_dicts(update_buffer, 32, 3))
+    prefetched = list(policy.get_update_feed_dicts(update_buffer, 32, 3, 2))
+    assert len(prefetched) == 3
+    for expected_feed_dict, feed_dict in zip(expected, prefetched):
+        assert feed_dict.keys() == expected_feed_dict.keys()
+        for node, value in feed_dict.items():
+            assert value.dtype == node.dtype.as_numpy_dtype
+            np.testing.assert_array_almost_equal(value, expected_feed_dict[node])
+    np.testing.assert_array_almost_equal(
+        prefetched[1][policy.model.vector_in], update_buffer["vector_obs"][32:64]
+    )
+    policy.sess.close()
+
+
+def test_ppo_policy_save_model(dummy_config, tmpdir):
+    dummy_config["keep_checkpoints"] = 2
+    trainer = make_continuous_trainer(dummy_config, tmpdir)
+    policy = trainer.policy
+    with mock.patch("tensorflow.train.write_graph") as write_graph:
+        for steps in [10, 20, 30]:
+            policy.update_reward(float(steps))
+            policy.save_model(steps)
+            # The checkpoint holds the variables as they were when it was taken.
+            policy.model.last_reward.load(-1.0, policy.sess)
+        policy.wait_for_saves()
+    write_graph.assert_called_once()
+    ckpt = tf.train.get_checkpoint_state(str(tmpdir))
+    assert ckpt.model_checkpoint_path == str(tmpdir) + "/model-30.cptk"
+    assert [os.path.basename(path) for path in ckpt.all_model_checkpoint_paths] == [
+        "model-20.cptk",
+        "model-30.cptk",
+    ]
+    assert not tmpdir.join("model-10.cptk.index").exists()
+    reader = tf.train.NewCheckpointReader(ckpt.model_checkpoint_path)
+    assert reader.get_tensor("last_reward") == 30.0
+    policy.sess.close()
+
+
+def test_ppo_policy_export_model_uint8_visual(dummy_config, tmpdir):
+    tf.reset_default_graph()
+    brain_params = BrainParameters(
+        brain_name="RealFakeBrain",
+        vector_observation_space_size=3,
+        num_stacked_vector_observations=1,
+        camera_resolutions=[{"height": 40, "width": 30, "blackAndWhite": False}],
+        vector_action_space_size=[2],
+        vector_action_space_type=0,
+        vector_action_descriptions=["", ""],
+    )
+    dummy_config["model_path"] = str(tmpdir)
+    dummy_config["uint8_visual"] = True
+    policy = PPOPolicy(0, brain_params, dummy_config, False, False)
+    assert policy.model.visual_in[0].dtype == tf.uint8
+    policy.save_model(10)
+    with mock.patch("mlagents.trainers.tensorflow_to_barracuda.convert"):
+        policy.export_model()
+
+    graph_def = tf.GraphDef()
+    with open(str(tmpdir.join("frozen_graph_def.pb")), "rb") as frozen_graph:
+        graph_def.ParseFromString(frozen_graph.read())
+    nodes = {node.name: node for node in graph_def.node}
+    # Unity feeds visual observations as floats in [0, 1].
+    assert nodes["visual_observation_0"].attr["dtype"].type == tf.float32
+    assert not any(
+        node.op == "Cast" and node.attr["SrcT"].type == tf.uint8
+        for node in graph_def.node
+    )
+    policy.sess.close()
+
+
 def test_rl_functions():
     rewards = np.array([0.0, 0.0, 0.0, 1.0])
     gamma = 0.9
@@ -426,5 +760,45 @@ def test_rl_functions():
     np.testing.assert_array_almost_equal(returns, np.array([0.729, 0.81, 0.9, 1.0]))
 
 
+@pytest.mark.parametrize("length", [1, 5, 64, 65, 300])
+@pytest.mark.parametrize("gamma", [0.0, 0.9, 0.99, 1.0])
+def test_discount_rewards_batch(length, gamma):
+    np.random.seed(length)
+    rewards = np.random.randn(3, length)
+    value_next = np.random.randn(3)
+    returns = discount_rewards_batch(rewards, gamma, value_next)
+    for i in range(3):
+        np.testing.assert_allclose(
+            returns[i], discount_rewards(rewards[i], gamma, value_next[i]), atol=1e-9
+        )
+
+
+@pytest.mark.parametrize("lambd", [0.0, 0.95, 1.0])
+def test_get_gae_batch(lambd):
+    np.random.seed(0)
+    lengths = [0, 1, 7, 64, 65, 200, 1001]
+    rewards = [np.random.randn(length) for length in lengths]
+    value_estimates = [np.random.randn(length).astype(np.float32) for length in lengths]
+    value_next = [np.float32(x) for x in np.random.randn(len(lengths))]
+    value_next[0] = 0.0
+    advantages = get_gae_batch(rewards, value_estimates, value_next, 0.99, lambd)
+    assert len(advantages) == len(lengths)
+    for i in range(len(lengths)):
+        if lengths[i] == 0:
+            assert len(advantages[i]) == 0
+            continue
+        expected = get_gae(
+            rewards[i], value_estimates[i], value_next[i], gamma=0.99, lambd=lambd
+        )
+        assert advantages[i].dtype == expected.dtype
+        np.testing.assert_allclose(advantages[i], expected, atol=1e-9)
+    # Trajectories of the same length can also be passed as a padded array.
+    padded = get_gae_batch(
+        np.ones((2, 3)), np.zeros((2, 3)), [0.0, 1.0], gamma=0.5, lambd=1.0
+    )
+    np.testing.assert_allclose(padded, [[1.75, 1.5, 1.0], [1.875, 1.75, 1.5]])
+    assert get_gae_batch([], [], []) == []
+
+
 if __name__ == "__main__":
     pytest.main()
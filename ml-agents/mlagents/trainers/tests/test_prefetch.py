@@ -0,0 +1,37 @@
+import time
+
+import pytest
+
+from mlagents.trainers.prefetch import prefetch
+
+
+def test_prefetch():
+    assert list(prefetch(range(10), 3)) == list(range(10))
+    assert list(prefetch([], 3)) == []
+
+
+def test_prefetch_raises_errors():
+    def items():
+        yield 0
+        raise ValueError("error")
+
+    prefetched = prefetch(items(), 2)
+    assert next(prefetched) == 0
+    with pytest.raises(ValueError):
+        next(prefetched)
+
+
+def test_prefetch_stops_with_consumer():
+    made = []
+
+    def items():
+        for i in range(100):
+            made.append(i)
+            yield i
+
+    prefetched = prefetch(items(), 2)
+    assert next(prefetched) == 0
+    prefetched.close()
+    time.sleep(0.5)
+    # The item taken, those in the queue and the one blocked on it.
+    assert len(made) <= 4
@@ -7,6 +7,7 @@ import pytest
 
 from mlagents.trainers import ActionInfo
 from mlagents.trainers import TrainerMetrics
+from mlagents.trainers.trainer import Trainer
 from mlagents.trainers.trainer_controller import TrainerController
 from mlagents.trainers.ppo.trainer import PPOTrainer
 from mlagents.trainers.bc.offline_trainer import OfflineBCTrainer
@@ -222,6 +223,7 @@ def test_initialize_trainer_parameters_uses_defaults(BrainInfoMock):
     expected_config["summary_path"] = tc.summaries_dir + "/test_run_id_testbrain"
     expected_config["model_path"] = tc.model_path + "/testbrain"
     expected_config["keep_checkpoints"] = tc.keep_checkpoints
+    expected_config["uint8_visual"] = tc.uint8_visual
 
     assert_bc_trainer_constructed(
         OfflineBCTrainer, full_config, tc, brain_info_mock, expected_config
@@ -238,6 +240,7 @@ def test_initialize_trainer_parameters_override_defaults(BrainInfoMock):
     expected_config["summary_path"] = tc.summaries_dir + "/test_run_id_testbrain"
     expected_config["model_path"] = tc.model_path + "/testbrain"
     expected_config["keep_checkpoints"] = tc.keep_checkpoints
+    expected_config["uint8_visual"] = tc.uint8_visual
 
     # Override value from specific brain config
     expected_config["normalize"] = False
@@ -257,6 +260,7 @@ def test_initialize_online_bc_trainer(BrainInfoMock):
     expected_config["summary_path"] = tc.summaries_dir + "/test_run_id_testbrain"
     expected_config["model_path"] = tc.model_path + "/testbrain"
     expected_config["keep_checkpoints"] = tc.keep_checkpoints
+    expected_config["uint8_visual"] = tc.uint8_visual
 
     assert_bc_trainer_constructed(
         OnlineBCTrainer, full_config, tc, brain_info_mock, expected_config
@@ -273,6 +277,7 @@ def test_initialize_ppo_trainer(BrainInfoMock):
     expected_config["summary_path"] = tc.summaries_dir + "/test_run_id_testbrain"
     expected_config["model_path"] = tc.model_path + "/testbrain"
     expected_config["keep_checkpoints"] = tc.keep_checkpoints
+    expected_config["uint8_visual"] = tc.uint8_visual
 
     assert_ppo_trainer_constructed(full_config, tc, brain_info_mock, expected_config)
 
@@ -432,3 +437,125 @@ def test_take_step_adds_experiences_to_trainer_and_trains():
     trainer_mock.update_policy.assert_called_once()
     trainer_mock.write_summary.assert_called_once()
     trainer_mock.increment_step_and_update_last_reward.assert_called_once()
+
+
+def test_take_step_with_min_ready_envs_steps_ready_environments():
+    tc, trainer_mock = trainer_controller_with_take_step_mocks()
+    tc.min_ready_envs = 2
+
+    curr_info_mock = MagicMock()
+    brain_info_mock = MagicMock()
+    curr_info_mock.__getitem__ = MagicMock(return_value=brain_info_mock)
+
+    env_mock = MagicMock()
+    env_step_output_mock = MagicMock()
+    env_mock.step_ready = MagicMock(return_value=env_step_output_mock)
+
+    action_output_mock = ActionInfo(
+        "action", "memory", "actiontext", "value", {"some": "output"}
+    )
+    trainer_mock.get_action = MagicMock(return_value=action_output_mock)
+
+    tc.take_step(env_mock, curr_info_mock)
+    env_mock.step.assert_not_called()
+    env_mock.step_ready.assert_called_once_with(
+        vector_action={"testbrain": action_output_mock.action},
+        memory={"testbrain": action_output_mock.memory},
+        text_action={"testbrain": action_output_mock.text},
+        value={"testbrain": action_output_mock.value},
+        min_workers=2,
+    )
+    trainer_mock.add_experiences.assert_called_once_with(
+        curr_info_mock, env_step_output_mock, action_output_mock.outputs
+    )
+
+
+def test_take_step_with_async_update_starts_background_update():
+    tc, trainer_mock = trainer_controller_with_take_step_mocks()
+    tc.async_update = True
+    trainer_mock.is_ready_update = MagicMock(return_value=True)
+    trainer_mock.is_updating_policy = False
+
+    curr_info_mock = MagicMock()
+    env_mock = MagicMock()
+    action_output_mock = ActionInfo(
+        "action", "memory", "actiontext", "value", {"some": "output"}
+    )
+    trainer_mock.get_action = MagicMock(return_value=action_output_mock)
+
+    tc.take_step(env_mock, curr_info_mock)
+    trainer_mock.start_policy_update.assert_called_once()
+    trainer_mock.update_policy.assert_not_called()
+    trainer_mock.finish_policy_update.assert_not_called()
+
+
+def test_take_step_with_async_update_bounds_staleness():
+    tc, trainer_mock = trainer_controller_with_take_step_mocks()
+    tc.async_update = True
+    tc.max_update_staleness = 2
+    trainer_mock.is_ready_update = MagicMock(return_value=False)
+    trainer_mock.is_updating_policy = True
+    trainer_mock.policy_update_done = False
+    trainer_mock.policy_update_staleness = 0
+
+    curr_info_mock = MagicMock()
+    env_mock = MagicMock()
+    action_output_mock = ActionInfo(
+        "action", "memory", "actiontext", "value", {"some": "output"}
+    )
+    trainer_mock.get_action = MagicMock(return_value=action_output_mock)
+
+    tc.take_step(env_mock, curr_info_mock)
+    assert trainer_mock.policy_update_staleness == 1
+    trainer_mock.finish_policy_update.assert_not_called()
+    tc.take_step(env_mock, curr_info_mock)
+    assert trainer_mock.policy_update_staleness == 2
+    trainer_mock.finish_policy_update.assert_called_once()
+
+
+def test_trainer_without_background_update(tmpdir):
+    # The controller reads the staleness of the update of any trainer.
+    brain = MagicMock()
+    brain.brain_name = "testbrain"
+    trainer = Trainer(brain, {"summary_path": str(tmpdir)}, True, "0")
+    trainer.update_policy = MagicMock()
+
+    trainer.start_policy_update()
+    trainer.update_policy.assert_called_once()
+    assert not trainer.is_updating_policy
+    assert trainer.policy_update_done
+    assert trainer.policy_update_staleness == 0
+
+
+def test_take_step_gets_actions_of_all_brains():
+    tc, trainer_mock = trainer_controller_with_take_step_mocks()
+    other_trainer_mock = MagicMock()
+    other_trainer_mock.get_step = 0
+    other_trainer_mock.get_max_steps = 5
+    tc.trainers["otherbrain"] = other_trainer_mock
+
+    brain_info_mocks = {"testbrain": MagicMock(), "otherbrain": MagicMock()}
+    curr_info_mock = MagicMock()
+    curr_info_mock.__getitem__ = MagicMock(side_effect=brain_info_mocks.__getitem__)
+    env_mock = MagicMock()
+
+    action_output_mock = ActionInfo(
+        "action", "memory", "actiontext", "value", {"some": "output"}
+    )
+    other_action_output_mock = ActionInfo(
+        "other_action", "other_memory", "other_text", "other_value", {}
+    )
+    trainer_mock.get_action = MagicMock(return_value=action_output_mock)
+    other_trainer_mock.get_action = MagicMock(return_value=other_action_output_mock)
+
+    tc.take_step(env_mock, curr_info_mock)
+    trainer_mock.get_action.assert_called_once_with(brain_info_mocks["testbrain"])
+    other_trainer_mock.get_action.assert_called_once_with(
+        brain_info_mocks["otherbrain"]
+    )
+    env_mock.step.assert_called_once_with(
+        vector_action={"testbrain": "action", "otherbrain": "other_action"},
+        memory={"testbrain": "memory", "otherbrain": "other_memory"},
+        text_action={"testbrain": "actiontext", "otherbrain": "other_text"},
+        value={"testbrain": "value", "otherbrain": "other_value"},
+    )
@@ -45,6 +45,9 @@ class Trainer(object):
         )
         self.summary_writer = tf.summary.FileWriter(self.summary_path)
         self.policy = None
+        # The number of steps the policy acted for with its previous weights while
+        # an update started by start_policy_update runs.
+        self.policy_update_staleness = 0
 
     def __str__(self):
         return """{} Trainer""".format(self.__class__)
@@ -156,16 +159,48 @@ class Trainer(object):
         """
         raise UnityTrainerException("The update_model method was not implemented.")
 
+    def start_policy_update(self):
+        """
+        Starts an update of the policy with the experiences collected so far. Trainers
+        which can update in the background return before the update is done, and
+        finish_policy_update completes it. Others update the policy before returning.
+        """
+        self.update_policy()
+
+    @property
+    def is_updating_policy(self):
+        """
+        :return: Whether an update started by start_policy_update is yet to be
+        finished.
+        """
+        return False
+
+    @property
+    def policy_update_done(self):
+        """
+        :return: Whether the update started by start_policy_update is done, so that
+        finish_policy_update does not wait.
+        """
+        return True
+
+    def finish_policy_update(self):
+        """
+        Waits for the update started by start_policy_update, if any, and completes it.
+        """
+        pass
+
     def save_model(self):
         """
         Saves the model
         """
+        self.finish_policy_update()
         self.policy.save_model(self.get_step)
 
     def export_model(self):
         """
         Exports the model
         """
+        self.finish_policy_update()
         self.policy.export_model()
 
     def write_training_metrics(self):
@@ -6,6 +6,7 @@ import os
 import logging
 import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from typing import *
 
 import numpy as np
@@ -15,7 +16,7 @@ from time import time
 from mlagents.envs import AllBrainInfo, BrainParameters
 from mlagents.envs.base_unity_environment import BaseUnityEnvironment
 from mlagents.envs.exception import UnityEnvironmentException
-from mlagents.trainers import Trainer
+from mlagents.trainers import ActionInfo, Trainer
 from mlagents.trainers.ppo.trainer import PPOTrainer
 from mlagents.trainers.bc.offline_trainer import OfflineBCTrainer
 from mlagents.trainers.bc.online_trainer import OnlineBCTrainer
@@ -37,6 +38,10 @@ class TrainerController(object):
         external_brains: Dict[str, BrainParameters],
         training_seed: int,
         fast_simulation: bool,
+        uint8_visual: bool = False,
+        min_ready_envs: int = 0,
+        async_update: bool = False,
+        max_update_staleness: int = 0,
     ):
         """
         :param model_path: Path to save the model.
@@ -50,6 +55,13 @@ class TrainerController(object):
         :param lesson: Start learning from this lesson.
         :param external_brains: dictionary of external brain names to BrainInfo objects.
         :param training_seed: Seed to use for Numpy and Tensorflow random number generation.
+        :param uint8_visual: Whether visual observations are provided as uint8 pixels.
+        :param min_ready_envs: If positive, step the environments asynchronously,
+        waiting only for this many environments at each step.
+        :param async_update: Whether to update the policies on background threads,
+        while the environments keep stepping with the previous weights.
+        :param max_update_staleness: If positive, the number of steps after which the
+        environments wait for an update running in the background to finish.
         """
 
         self.model_path = model_path
@@ -70,6 +82,12 @@ class TrainerController(object):
         self.seed = training_seed
         self.training_start_time = time()
         self.fast_simulation = fast_simulation
+        self.uint8_visual = uint8_visual
+        self.min_ready_envs = min_ready_envs
+        self.async_update = async_update
+        self.max_update_staleness = max_update_staleness
+        # Threads on which the policies of several brains are evaluated.
+        self._inference_pool = None
         np.random.seed(self.seed)
         tf.set_random_seed(self.seed)
 
@@ -140,6 +158,7 @@ class TrainerController(object):
                 basedir=self.model_path, name=brain_name
             )
             trainer_parameters["keep_checkpoints"] = self.keep_checkpoints
+            trainer_parameters["uint8_visual"] = self.uint8_visual
             if brain_name in trainer_config:
                 _brain_key = brain_name
                 while not isinstance(trainer_config[_brain_key], dict):
@@ -259,10 +278,37 @@ class TrainerController(object):
                 self._save_model_when_interrupted(steps=self.global_step)
             pass
         env.close()
+        if self._inference_pool is not None:
+            self._inference_pool.shutdown()
+            self._inference_pool = None
         if self.train_model:
             self._write_training_metrics()
             self._export_graph()
 
+    def _get_actions(self, curr_info: AllBrainInfo) -> Dict[str, ActionInfo]:
+        """
+        Decides the actions of all brains. The policies of several brains are
+        evaluated concurrently, as TensorFlow releases the GIL while it runs them.
+        :param curr_info: The current BrainInfo of each brain.
+        :return: Dict from the name of each brain to its ActionInfo.
+        """
+        if len(self.trainers) <= 1:
+            return {
+                brain_name: trainer.get_action(curr_info[brain_name])
+                for brain_name, trainer in self.trainers.items()
+            }
+        if self._inference_pool is None:
+            self._inference_pool = ThreadPoolExecutor(
+                max_workers=len(self.trainers), thread_name_prefix="inference"
+            )
+        futures = {
+            brain_name: self._inference_pool.submit(
+                trainer.get_action, curr_info[brain_name]
+            )
+            for brain_name, trainer in self.trainers.items()
+        }
+        return {brain_name: future.result() for brain_name, future in futures.items()}
+
     def take_step(self, env: BaseUnityEnvironment, curr_info: AllBrainInfo):
         if self.meta_curriculum:
             # Get the sizes of the reward buffers.
@@ -293,20 +339,30 @@ class TrainerController(object):
         take_action_text = {}
         take_action_value = {}
         take_action_outputs = {}
-        for brain_name, trainer in self.trainers.items():
-            action_info = trainer.get_action(curr_info[brain_name])
+        for brain_name, action_info in self._get_actions(curr_info).items():
             take_action_vector[brain_name] = action_info.action
             take_action_memories[brain_name] = action_info.memory
             take_action_text[brain_name] = action_info.text
             take_action_value[brain_name] = action_info.value
             take_action_outputs[brain_name] = action_info.outputs
         time_start_step = time()
-        new_info = env.step(
-            vector_action=take_action_vector,
-            memory=take_action_memories,
-            text_action=take_action_text,
-            value=take_action_value,
-        )
+        if self.min_ready_envs > 0:
+            # Only the agents of the environments which are ready are in
+            # new_info; the other environments keep stepping in the background.
+            new_info = env.step_ready(
+                vector_action=take_action_vector,
+                memory=take_action_memories,
+                text_action=take_action_text,
+                value=take_action_value,
+                min_workers=self.min_ready_envs,
+            )
+        else:
+            new_info = env.step(
+                vector_action=take_action_vector,
+                memory=take_action_memories,
+                text_action=take_action_text,
+                value=take_action_value,
+            )
         delta_time_step = time() - time_start_step
         for brain_name, trainer in self.trainers.items():
             if brain_name in self.trainer_metrics:
@@ -315,14 +371,25 @@ class TrainerController(object):
                 curr_info, new_info, take_action_outputs[brain_name]
             )
             trainer.process_experiences(curr_info, new_info)
+            if trainer.is_updating_policy:
+                # The policy acted at this step with its weights from before the
+                # update running in the background.
+                trainer.policy_update_staleness += 1
+                if trainer.policy_update_done or (
+                    self.max_update_staleness > 0
+                    and trainer.policy_update_staleness >= self.max_update_staleness
+                ):
+                    trainer.finish_policy_update()
             if (
                 trainer.is_ready_update()
                 and self.train_model
                 and trainer.get_step <= trainer.get_max_steps
             ):
                 # Perform gradient descent with experience buffer
-
-                trainer.update_policy()
+                if self.async_update:
+                    trainer.start_policy_update()
+                else:
+                    trainer.update_policy()
             # Write training statistics to Tensorboard.
             delta_train_start = time() - self.training_start_time
             if self.meta_curriculum is not None:
@@ -108,7 +108,9 @@ class TrainerMetrics:
                 self.brain_name,
                 self.delta_policy_update,
                 delta_train_start,
-                self.delta_last_experience_collection,
+                # No experience was collected yet if an update running in the
+                # background is finished right after the previous one.
+                self.delta_last_experience_collection or 0.0,
                 self.last_buffer_length,
                 self.last_mean_return,
             )